@@ -7,12 +7,56 @@ from flask import Flask, render_template, request, jsonify, session, send_file
 import os
 import json
 import uuid
-from datetime import datetime
-from evaluator import BenchmarkEvaluator
+import gzip
+import hashlib
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from werkzeug.http import is_resource_modified
+import serialization
+from evaluator import (BenchmarkEvaluator, write_results, build_chart_payload, write_chart_payload,
+                       write_session_table)
+from scheduler import TaskCancelled
+from results_index import ResultsIndex
+from recompute import recompute_folder
+from task_registry import TaskRegistry, file_lock, request_key
 from translations import get_translation, SUPPORTED_LANGUAGES
+from validator import validate_file, format_error
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+
+
+def load_secret_key(path):
+    """
+    所有 worker 进程共享的 session 密钥：优先取 PERSONASTEER_SECRET_KEY，
+    否则读取 path，文件不存在时由第一个进程生成 (os.link 原子创建，不会被并发覆盖)
+    """
+    key = os.environ.get('PERSONASTEER_SECRET_KEY')
+    if key:
+        return key
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(os.urandom(32).hex().encode())
+        os.chmod(tmp_path, 0o600)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+app.secret_key = load_secret_key(os.environ.get('PERSONASTEER_SECRET_KEY_FILE', '.secret_key'))
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['RESULTS_FOLDER'] = 'results'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
@@ -24,6 +68,13 @@ os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
 # Initialize evaluator
 evaluator = BenchmarkEvaluator()
 
+# Shared task state for multi-process deployments (results/tasks.db)
+task_registry = TaskRegistry(os.path.join(app.config['RESULTS_FOLDER'], 'tasks.db'))
+
+# Cross-task results index (results/index.db); pick up result files written before it existed
+results_index = ResultsIndex.for_folder(app.config['RESULTS_FOLDER'])
+threading.Thread(target=results_index.sync, args=(app.config['RESULTS_FOLDER'],), daemon=True).start()
+
 
 @app.before_request
 def before_request():
@@ -48,6 +99,346 @@ def set_language(lang):
     return jsonify({'success': True, 'lang': lang})
 
 
+def create_validation_pool():
+    """
+    Long-lived process pool for upload validation, created once per server process (None: validate in
+    the request thread). Workers come from a forkserver (spawn where unavailable), never from forking the
+    threaded server, which could copy held locks into the children.
+    """
+    workers = int(os.environ.get('PERSONASTEER_VALIDATION_WORKERS', min(4, os.cpu_count() or 1)))
+    # __mp_main__: this module was re-imported as the main script (python app.py) inside a pool worker
+    if workers <= 1 or __name__ == '__mp_main__':
+        return None
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # the fork server only needs the validator, not the web app
+        context.set_forkserver_preload(['validator'])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+validation_pool = create_validation_pool()
+
+
+def validate_upload(filepath):
+    """
+    Validate an uploaded JSONL file with strict rules
+
+    Returns the validator report (sessions, methods, errors with line numbers, error_count, truncated).
+    Files larger than one chunk are checked in parallel in validation_pool.
+    """
+    return validate_file(filepath, executor=validation_pool)
+
+
+# ============================================================================
+# Content-addressed upload storage
+# uploads/<file_id>.jsonl      文件内容 (file_id = sha256 前 16 位)
+# uploads/<file_id>.meta.json  校验摘要 + 该文件已完成的评测任务
+# ============================================================================
+def _upload_meta_path(file_id):
+    return os.path.join(app.config['UPLOAD_FOLDER'], f"{file_id}.meta.json")
+
+
+def load_upload_meta(file_id):
+    """Load the metadata of a content-addressed upload, or None"""
+    meta_path = _upload_meta_path(file_id)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_upload_meta(meta):
+    """Atomically write upload metadata"""
+    meta_path = _upload_meta_path(meta['file_id'])
+    tmp_path = f"{meta_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def file_id_from_filename(filename):
+    """Return the content hash id for a content-addressed filename, else None"""
+    stem, ext = os.path.splitext(filename)
+    if ext == '.jsonl' and load_upload_meta(stem) is not None:
+        return stem
+    return None
+
+
+def _same_judge_config(task, judge_model, scoring, history):
+    """Same judge, scoring mode and history strategy (tasks recorded before these existed used llm / full)"""
+    return (task['judge_model'] == judge_model and task.get('scoring', 'llm') == scoring
+            and task.get('history', 'full') == history)
+
+
+def find_cached_task(meta, methods, judge_model, scoring='llm', history='full'):
+    """Find a completed task on the same file with the same methods, judge, scoring mode and history strategy"""
+    for task in reversed(meta.get('tasks', [])):
+        if task.get('mode', 'full') != 'full':
+            continue  # adaptive / preview runs cover only part of the data
+        if sorted(task['methods']) == sorted(methods) and _same_judge_config(task, judge_model, scoring, history):
+            result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task['task_id']}_results.json")
+            if serialization.exists(result_path):
+                return task['task_id'], result_path
+    return None
+
+
+def find_preview_task(meta, methods, judge_model, scoring='llm', history='full'):
+    """Find the latest preview on the same file whose sampled judgments a full run can reuse"""
+    for task in reversed(meta.get('tasks', [])):
+        if task.get('mode') != 'preview' or not _same_judge_config(task, judge_model, scoring, history):
+            continue
+        if set(task['methods']) <= set(methods):
+            result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task['task_id']}_results.json")
+            if serialization.exists(result_path):
+                return task['task_id']
+    return None
+
+
+def record_task(file_id, task_id, methods, judge_model, mode='full', scoring='llm', history='full'):
+    """Remember a completed task on its upload so identical requests can reuse it"""
+    with file_lock(_upload_meta_path(file_id)):
+        meta = load_upload_meta(file_id)
+        if meta is None:
+            return
+        meta.setdefault('tasks', []).append({
+            'task_id': task_id,
+            'methods': list(methods),
+            'judge_model': judge_model,
+            'scoring': scoring,
+            'history': history,
+            'mode': mode,
+            'completed_at': datetime.now().isoformat()
+        })
+        save_upload_meta(meta)
+
+
+# ============================================================================
+# Results delivery
+# 结果 / 图表文件解码后的 JSON 字节按 (文件, mtime, size) 缓存在进程内 LRU 中 (无需重复解析)，
+# 压缩变体按需生成后一并缓存；LRU 按响应体 (含压缩变体) 的总字节数淘汰。
+# 响应带 ETag / Last-Modified，条件请求直接返回 304
+# ============================================================================
+RESULTS_CACHE_MAX_BYTES = 256 * 1024 * 1024   # 缓存的响应体总字节数上限
+RESULTS_CACHE_MAX_BODY = 32 * 1024 * 1024     # 超过此大小的响应体不缓存
+COMPRESS_MIN_BYTES = 1024
+
+_results_cache = OrderedDict()
+_results_cache_bytes = 0
+_results_cache_lock = threading.Lock()
+
+SESSION_PAGE_MAX = 500
+SESSION_TABLE_ENTRIES = 8
+_session_tables = OrderedDict()
+_session_tables_lock = threading.Lock()
+
+
+def _choose_encoding():
+    """按 Accept-Encoding 选择响应压缩方式 (br 需要可选的 brotli 包)"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+def _file_signature(path):
+    """(实际文件, ETag, 修改时间)；文件 (含压缩变体) 不存在时返回 None"""
+    actual = serialization.find(path)
+    if actual is None:
+        return None
+    st = os.stat(actual)
+    return actual, f"{st.st_mtime_ns:x}-{st.st_size:x}", datetime.fromtimestamp(int(st.st_mtime), timezone.utc)
+
+
+def _evict_results_cache():
+    """按 LRU 淘汰，直到总字节数不超过 RESULTS_CACHE_MAX_BYTES (调用方持有 _results_cache_lock)"""
+    global _results_cache_bytes
+    while _results_cache_bytes > RESULTS_CACHE_MAX_BYTES and _results_cache:
+        _, evicted = _results_cache.popitem(last=False)
+        _results_cache_bytes -= evicted['size']
+
+
+def _cached_body(path, signature, build):
+    """取缓存的响应体 (各编码)；签名变化时调用 build(actual_path) 重新生成"""
+    global _results_cache_bytes
+    with _results_cache_lock:
+        entry = _results_cache.get(path)
+        if entry is not None and entry['etag'] == signature[1]:
+            _results_cache.move_to_end(path)
+            return entry
+    body = build(signature[0])
+    entry = {'etag': signature[1], 'bodies': {'identity': body}, 'size': len(body)}
+    if entry['size'] <= RESULTS_CACHE_MAX_BODY:
+        with _results_cache_lock:
+            stale = _results_cache.pop(path, None)
+            if stale is not None:
+                _results_cache_bytes -= stale['size']
+            _results_cache[path] = entry
+            _results_cache_bytes += entry['size']
+            _evict_results_cache()
+    return entry
+
+
+def _cached_variant(path, entry, encoding):
+    """响应体的压缩变体：按需生成，条目仍在缓存中时计入缓存字节数"""
+    global _results_cache_bytes
+    body = entry['bodies'].get(encoding)
+    if body is not None:
+        return body
+    body = _compress(entry['bodies']['identity'], encoding)
+    with _results_cache_lock:
+        if encoding not in entry['bodies']:
+            entry['bodies'][encoding] = body
+            entry['size'] += len(body)
+            if _results_cache.get(path) is entry:
+                _results_cache_bytes += len(body)
+                _evict_results_cache()
+    return body
+
+
+def _with_raw_json(fields, **raw):
+    """在 fields 的 JSON 对象中追加已编码的 JSON 字段 (不解析原始字节)"""
+    body = serialization.dumps(fields)[:-1]
+    for key, value in raw.items():
+        body += (b',' if len(body) > 1 else b'') + serialization.dumps(key) + b':' + value
+    return body + b'}'
+
+
+def send_cached_json(path, build):
+    """
+    发送 path 对应的 JSON 响应：支持 ETag / If-None-Match、Last-Modified / If-Modified-Since 与 gzip / br 压缩
+    """
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    encoding = _choose_encoding()
+    etag = signature[1] if encoding == 'identity' else f"{signature[1]}-{encoding}"
+    response = app.response_class(mimetype='application/json')
+    response.set_etag(etag)
+    response.last_modified = signature[2]
+    response.cache_control.no_cache = True   # 轮询时每次都重新校验
+    response.vary.add('Accept-Encoding')
+    # 小于 COMPRESS_MIN_BYTES 的响应体不压缩，其 ETag 不带编码后缀
+    for tag in (etag, signature[1]):
+        if not is_resource_modified(request.environ, etag=tag, last_modified=signature[2]):
+            response.set_etag(tag)
+            response.status_code = 304
+            return response
+
+    entry = _cached_body(path, signature, build)
+    if len(entry['bodies']['identity']) < COMPRESS_MIN_BYTES:
+        encoding = 'identity'
+        response.set_etag(signature[1])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.set_data(_cached_variant(path, entry, encoding))
+    return response
+
+
+def chart_payload_path(task_id):
+    return os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_charts.json")
+
+
+def ensure_chart_payload(task_id):
+    """图表数据在任务完成时写出；更早的任务在首次请求时补建。返回是否可用"""
+    if serialization.exists(chart_payload_path(task_id)):
+        return True
+    result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_results.json")
+    if not serialization.exists(result_path):
+        return False
+    write_chart_payload(serialization.load(result_path), app.config['RESULTS_FOLDER'])
+    return True
+
+
+def session_table_path(task_id):
+    return os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_session_table.json")
+
+
+def ensure_session_table(task_id):
+    """会话明细表在任务完成时写出；缺失或比结果文件旧时由结果补建。返回是否可用"""
+    result_path = serialization.find(os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_results.json"))
+    table_path = serialization.find(session_table_path(task_id))
+    if result_path is None:
+        return table_path is not None
+    if table_path is None or os.path.getmtime(table_path) < os.path.getmtime(result_path):
+        write_session_table(serialization.load(result_path), app.config['RESULTS_FOLDER'])
+    return True
+
+
+def load_session_table(task_id):
+    """解析后的会话明细表 (进程内 LRU，按文件签名失效)，附带各排序方式的行序缓存"""
+    signature = _file_signature(session_table_path(task_id))
+    if signature is None:
+        return None
+    with _session_tables_lock:
+        entry = _session_tables.get(task_id)
+        if entry is not None and entry['etag'] == signature[1]:
+            _session_tables.move_to_end(task_id)
+            return entry
+    entry = {'etag': signature[1], 'table': serialization.load(signature[0]), 'orders': {}}
+    with _session_tables_lock:
+        _session_tables[task_id] = entry
+        while len(_session_tables) > SESSION_TABLE_ENTRIES:
+            _session_tables.popitem(last=False)
+    return entry
+
+
+def session_order(entry, sort, descending):
+    """按 sort (某方法的平均分，或 session_id / rounds) 排序的行下标；未评测的会话排在最后"""
+    key = (sort, descending)
+    order = entry['orders'].get(key)
+    if order is None:
+        rows = entry['table']['rows']
+        if sort in ('session_id', 'rounds'):
+            order = sorted(range(len(rows)), key=lambda i: rows[i][sort], reverse=descending)
+        else:
+            column = entry['table']['methods'].index(sort)
+            scored = [i for i in range(len(rows)) if rows[i]['scores'][column] is not None]
+            order = sorted(scored, key=lambda i: rows[i]['scores'][column], reverse=descending)
+            order += [i for i in range(len(rows)) if rows[i]['scores'][column] is None]
+        entry['orders'][key] = order
+    return order
+
+
+def stored_task_response(task_id, message, include_results=True):
+    """已完成任务的 /evaluate 响应 (结果与图表数据直接拼接，不解析结果文件)"""
+    ensure_chart_payload(task_id)
+    raw = {'charts': serialization.read_bytes(chart_payload_path(task_id))}
+    if include_results:
+        raw['results'] = serialization.read_bytes(
+            os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_results.json"))
+    body = _with_raw_json({'success': True, 'cached': True, 'task_id': task_id, 'message': message}, **raw)
+    return app.response_class(body, mimetype='application/json')
+
+
+@app.after_request
+def compress_response(response):
+    """压缩其他较大的 JSON 响应 (如 /evaluate 返回的完整结果)"""
+    if (response.direct_passthrough or response.status_code != 200 or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = _choose_encoding()
+    response.vary.add('Accept-Encoding')
+    if encoding != 'identity':
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload"""
@@ -64,84 +455,120 @@ def upload_file():
     if not file.filename.endswith('.jsonl'):
         return jsonify({'success': False, 'error': t['invalid_format']})
     
-    # Generate unique filename
-    file_id = str(uuid.uuid4())[:8]
-    filename = f"{file_id}_{file.filename}"
+    # Stream to a temporary file while hashing the content
+    tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".{uuid.uuid4().hex}.upload")
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as out:
+        for chunk in iter(lambda: file.stream.read(1 << 20), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    
+    file_id = digest.hexdigest()[:16]
+    filename = f"{file_id}.jsonl"
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
     
-    # Validate file format with strict rules
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            if len(lines) == 0:
-                raise ValueError("Empty file / 空文件")
-            
-            detected_methods = set()
-            
-            for line_num, line in enumerate(lines, 1):
-                if not line.strip():
-                    continue
-                    
-                try:
-                    session_data = json.loads(line)
-                except json.JSONDecodeError as e:
-                    raise ValueError(f"Line {line_num}: Invalid JSON / 无效JSON - {str(e)}")
-                
-                # Check required top-level fields
-                required_fields = ['session_id', 'user_profile', 'rounds']
-                for field in required_fields:
-                    if field not in session_data:
-                        raise ValueError(f"Line {line_num}: Missing required field '{field}' / 缺少必填字段 '{field}'")
-                
-                # Validate session_id
-                if not isinstance(session_data['session_id'], str) or len(session_data['session_id']) == 0:
-                    raise ValueError(f"Line {line_num}: 'session_id' must be non-empty string / 'session_id' 必须为非空字符串")
-                
-                # Validate user_profile
-                if not isinstance(session_data['user_profile'], str) or len(session_data['user_profile']) < 10:
-                    raise ValueError(f"Line {line_num}: 'user_profile' must be string with at least 10 chars / 'user_profile' 至少10个字符")
-                
-                # Validate rounds
-                rounds = session_data['rounds']
-                if not isinstance(rounds, list) or len(rounds) == 0:
-                    raise ValueError(f"Line {line_num}: 'rounds' must be non-empty array / 'rounds' 必须为非空数组")
-                
-                for r_idx, round_data in enumerate(rounds, 1):
-                    # Check round fields
-                    if 'round' not in round_data:
-                        raise ValueError(f"Line {line_num}, Round {r_idx}: Missing 'round' field / 缺少 'round' 字段")
-                    if 'user_message' not in round_data:
-                        raise ValueError(f"Line {line_num}, Round {r_idx}: Missing 'user_message' field / 缺少 'user_message' 字段")
-                    if 'responses' not in round_data:
-                        raise ValueError(f"Line {line_num}, Round {r_idx}: Missing 'responses' field / 缺少 'responses' 字段")
-                    
-                    # Validate responses
-                    responses = round_data['responses']
-                    if not isinstance(responses, dict) or len(responses) == 0:
-                        raise ValueError(f"Line {line_num}, Round {r_idx}: 'responses' must be non-empty object / 'responses' 必须为非空对象")
-                    
-                    # Track methods for consistency check
-                    current_methods = set(responses.keys())
-                    if not detected_methods:
-                        detected_methods = current_methods
-                    elif current_methods != detected_methods:
-                        raise ValueError(f"Line {line_num}, Round {r_idx}: Inconsistent methods. Expected {detected_methods}, got {current_methods} / 方法不一致")
-            
-            method_list = list(detected_methods)
-        
+    # Identical content was uploaded before: reuse its validation summary
+    meta = load_upload_meta(file_id)
+    if meta is not None and os.path.exists(filepath):
+        os.remove(tmp_path)
+        with file_lock(_upload_meta_path(file_id)):
+            meta = load_upload_meta(file_id)
+            if file.filename not in meta['original_names']:
+                meta['original_names'].append(file.filename)
+                save_upload_meta(meta)
         return jsonify({
-            'success': True, 
+            'success': True,
+            'cached': True,
             'file_id': file_id,
             'filename': filename,
-            'sessions': len([l for l in lines if l.strip()]),
-            'methods': method_list,
-            'message': t['upload_success']
+            'sessions': meta['sessions'],
+            'methods': meta['methods'],
+            'previous_tasks': meta.get('tasks', []),
+            'message': t['upload_cached']
         })
     
+    # Validate file format with strict rules
+    try:
+        report = validate_upload(tmp_path)
     except Exception as e:
-        os.remove(filepath)
+        os.remove(tmp_path)
         return jsonify({'success': False, 'error': f"{t['parse_error']}: {str(e)}"})
+    if report['errors']:
+        os.remove(tmp_path)
+        return jsonify({
+            'success': False,
+            'error': t['parse_errors'].format(count=report['error_count']),
+            'errors': [format_error(e) for e in report['errors']],
+            'error_count': report['error_count'],
+            'truncated': report['truncated']
+        })
+    session_count, method_list = report['sessions'], report['methods']
+    
+    os.replace(tmp_path, filepath)
+    with file_lock(_upload_meta_path(file_id)):
+        # A concurrent upload of the same content (or a task being recorded) may have written the
+        # metadata since the check above: merge into it instead of dropping its names and tasks
+        meta = load_upload_meta(file_id) or {}
+        names = meta.get('original_names', [])
+        meta.update({
+            'file_id': file_id,
+            'sha256': digest.hexdigest(),
+            'original_names': names + [file.filename] if file.filename not in names else names,
+            'sessions': session_count,
+            'methods': method_list,
+            'uploaded_at': meta.get('uploaded_at') or datetime.now().isoformat(),
+            'tasks': meta.get('tasks', [])
+        })
+        save_upload_meta(meta)
+    
+    return jsonify({
+        'success': True, 
+        'cached': False,
+        'file_id': file_id,
+        'filename': filename,
+        'sessions': session_count,
+        'methods': method_list,
+        'previous_tasks': meta['tasks'],
+        'message': t['upload_success']
+    })
+
+
+def _seed(value):
+    """Random seed from a request: an integer, a string or absent"""
+    if value is not None and not isinstance(value, (int, str)):
+        raise ValueError(f"invalid seed: {value!r}")
+    return value
+
+
+def parse_adaptive_options(options, methods):
+    """Validate and cast the "adaptive" request field (None when absent); raises ValueError/TypeError"""
+    if not options:
+        return None
+    if not isinstance(options, dict) or options.get('baseline') not in methods:
+        raise ValueError("adaptive needs an object with a baseline among the methods")
+    parsed = {
+        'baseline': options['baseline'],
+        'alpha': float(options.get('alpha', 0.05)),
+        'precision': float(options['precision']) if options.get('precision') is not None else None,
+        'min_sessions': int(options.get('min_sessions', 10)),
+        'seed': _seed(options.get('seed'))
+    }
+    if not 0 < parsed['alpha'] < 1 or (parsed['precision'] is not None and parsed['precision'] <= 0) \
+            or parsed['min_sessions'] < 1:
+        raise ValueError("adaptive options out of range")
+    return parsed
+
+
+def parse_preview_options(options):
+    """Validate and cast the "preview" request field (None when absent); raises ValueError/TypeError"""
+    if not options:
+        return None
+    if not isinstance(options, dict):
+        raise ValueError("preview needs an object")
+    parsed = {'per_round': int(options.get('per_round', 5)), 'seed': _seed(options.get('seed'))}
+    if parsed['per_round'] < 1:
+        raise ValueError("preview.per_round must be positive")
+    return parsed
 
 
 @app.route('/evaluate', methods=['POST'])
@@ -153,6 +580,9 @@ def evaluate():
     data = request.json
     filename = data.get('filename')
     methods = data.get('methods', [])
+    # The web UI renders from the chart payload and pages session rows from /results/<task_id>/sessions,
+    # so it asks for the response without the full results
+    include_results = data.get('include_results', True)
     
     if not filename or not methods:
         return jsonify({'success': False, 'error': t['missing_params']})
@@ -161,36 +591,122 @@ def evaluate():
     if not os.path.exists(filepath):
         return jsonify({'success': False, 'error': t['file_not_found']})
     
-    # Create evaluation task
-    task_id = str(uuid.uuid4())[:8]
+    # Adaptive mode: stop once method rankings vs. the baseline are settled.
+    # Preview mode: stratified (session, round) sample with estimated curves.
+    # Scheduling: weight of this task's share of judge calls, and an optional cap on its concurrent calls.
+    # All options are checked and cast here, before a task is claimed.
+    try:
+        adaptive = parse_adaptive_options(data.get('adaptive'), methods)
+        preview = parse_preview_options(data.get('preview'))
+        priority = float(data.get('priority', 1.0))
+        max_concurrency = int(data['max_concurrency']) if data.get('max_concurrency') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': t['missing_params']})
+    if priority <= 0:
+        return jsonify({'success': False, 'error': t['missing_params']})
+    mode = 'adaptive' if adaptive else 'preview' if preview else 'full'
+    
+    # Same file, methods and judge already evaluated: return the stored results
+    file_id = file_id_from_filename(filename)
+    if file_id and mode == 'full':
+        cached = find_cached_task(load_upload_meta(file_id), methods, evaluator.judge_model,
+                                  evaluator.scoring, evaluator.history_spec)
+        if cached:
+            return stored_task_response(cached[0], t['eval_cached'], include_results)
+    
+    # Incremental evaluation: merge into a prior task, judging only new/changed responses.
+    # A full run on a previewed file reuses the preview's sampled judgments.
+    base_results = None
+    base_task_id = data.get('base_task_id')
+    if not base_task_id and file_id and mode == 'full':
+        base_task_id = find_preview_task(load_upload_meta(file_id), methods, evaluator.judge_model,
+                                         evaluator.scoring, evaluator.history_spec)
+    if base_task_id:
+        base_path = os.path.join(app.config['RESULTS_FOLDER'], f"{base_task_id}_results.json")
+        if not serialization.exists(base_path):
+            return jsonify({'success': False, 'error': t['base_task_not_found']})
+        base_results = serialization.load(base_path)
+    
+    # Create evaluation task. Identical requests run once across all worker processes:
+    # a run already in flight on another worker is awaited and its results returned;
+    # a run whose worker died is taken over and resumes from its checkpoint.
     results_folder = app.config['RESULTS_FOLDER']
+    key = request_key(file=file_id or filename, methods=sorted(methods), judge_model=evaluator.judge_model,
+                      scoring=evaluator.scoring, history=evaluator.history_spec,
+                      mode=mode, preview=preview, adaptive=adaptive, base_task_id=base_task_id)
+    while True:
+        task_id, owned = task_registry.claim(key, str(uuid.uuid4())[:8],
+                                             {'filename': filename, 'methods': methods, 'mode': mode})
+        if owned:
+            break
+        status = task_registry.wait(task_id)
+        if status['status'] == 'done':
+            return stored_task_response(task_id, t['eval_complete'], include_results)
+        if status['status'] == 'failed':
+            return jsonify({'success': False, 'task_id': task_id, 'error': f"{t['eval_error']}: {status['error']}"})
+        if status['status'] == 'cancelled':
+            return jsonify({'success': False, 'cancelled': True, 'task_id': task_id, 'error': t['eval_cancelled']})
     
+    evaluator.scheduler.register(task_id, priority, max_concurrency)
     try:
-        # Run evaluation with incremental saving
-        results = evaluator.evaluate_file(
-            filepath, methods, task_id, 
-            results_folder=results_folder
-        )
-        
-        # Save final results
-        result_path = os.path.join(results_folder, f"{task_id}_results.json")
-        with open(result_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        with task_registry.running(task_id, on_cancel=lambda: evaluator.cancel(task_id)) as run:
+            # Run evaluation with incremental saving
+            if preview:
+                results = evaluator.evaluate_preview(
+                    filepath, methods, task_id, **preview,
+                    results_folder=results_folder,
+                    on_session=run.advance
+                )
+            elif adaptive:
+                results = evaluator.evaluate_adaptive(
+                    filepath, methods, task_id, **adaptive,
+                    results_folder=results_folder,
+                    on_session=run.advance
+                )
+            else:
+                results = evaluator.evaluate_file(
+                    filepath, methods, task_id, 
+                    results_folder=results_folder,
+                    base_results=base_results,
+                    on_session=run.advance
+                )
+            results['base_task_id'] = base_task_id
+            results['file_id'] = file_id
+            results['judge_model'] = evaluator.judge_model
+            
+            # Save final results
+            result_path = write_results(results, os.path.join(results_folder, f"{task_id}_results.json"))
+            write_chart_payload(results, results_folder)
+            write_session_table(results, results_folder)
+            try:
+                results_index.add(results, result_path)
+            except Exception as e:
+                print(f"Failed to index task {task_id}: {e}")
+            
+            if file_id:
+                record_task(file_id, task_id, list(results['methods'].keys()), evaluator.judge_model, mode,
+                            evaluator.scoring, evaluator.history_spec)
         
-        return jsonify({
+        response = {
             'success': True,
+            'cached': False,
             'task_id': task_id,
-            'results': results,
+            'charts': build_chart_payload(results),
             'message': t['eval_complete']
-        })
+        }
+        if include_results:
+            response['results'] = results
+        return jsonify(response)
+    
+    except TaskCancelled:
+        return jsonify({'success': False, 'cancelled': True, 'task_id': task_id, 'error': t['eval_cancelled']})
     
     except Exception as e:
         # 即使失败也尝试返回部分结果
         checkpoint_path = os.path.join(results_folder, f"{task_id}_checkpoint.json")
-        if os.path.exists(checkpoint_path):
+        if serialization.exists(checkpoint_path):
             try:
-                with open(checkpoint_path, 'r', encoding='utf-8') as f:
-                    partial = json.load(f)
+                partial = serialization.load(checkpoint_path)
                 return jsonify({
                     'success': False, 
                     'error': f"{t['eval_error']}: {str(e)}",
@@ -200,20 +716,179 @@ def evaluate():
             except:
                 pass
         return jsonify({'success': False, 'error': f"{t['eval_error']}: {str(e)}"})
+    
+    finally:
+        evaluator.scheduler.unregister(task_id)
+
+
+@app.route('/status/<task_id>')
+def get_status(task_id):
+    """Task status from the shared registry (answered by any worker process)"""
+    status = task_registry.get(task_id)
+    if status is None:
+        if serialization.exists(os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_results.json")):
+            return jsonify({'success': True, 'task_id': task_id, 'status': 'done'})
+        return jsonify({'success': False, 'error': 'Task not found'})
+    return jsonify({'success': True, **status})
+
+
+@app.route('/tasks/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """
+    Cooperatively cancel a running task: no new judge calls are issued, in-flight calls finish
+    and the checkpoint is kept, so resubmitting the same request resumes it.
+    The owning worker (possibly another process) picks the flag up from the registry within a second.
+    """
+    requested = task_registry.request_cancel(task_id)
+    evaluator.cancel(task_id)
+    if not requested:
+        return jsonify({'success': False, 'error': 'Task not running'})
+    return jsonify({'success': True, 'task_id': task_id})
+
+
+@app.route('/api/scheduler')
+def scheduler_status():
+    """Judge scheduler state of this worker process (capacity, per-task share and queue)"""
+    return jsonify({'success': True, **evaluator.scheduler.snapshot()})
+
+
+@app.route('/api/judge-pool')
+def judge_pool_status():
+    """Judge endpoint pool state of this worker process (health, latency, quota, calls per endpoint)"""
+    if evaluator.pool is None:
+        return jsonify({'success': True, 'enabled': False})
+    return jsonify({'success': True, 'enabled': True, **evaluator.pool.snapshot()})
 
 
 @app.route('/results/<task_id>')
 def get_results(task_id):
-    """Get evaluation results"""
+    """Get evaluation results (cached, conditional, compressed)"""
     result_path = os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_results.json")
-    
-    if not os.path.exists(result_path):
+    response = send_cached_json(
+        result_path, lambda actual: _with_raw_json({'success': True}, results=serialization.read_bytes(actual))
+    )
+    if response is None:
         return jsonify({'success': False, 'error': 'Results not found'})
-    
-    with open(result_path, 'r', encoding='utf-8') as f:
-        results = json.load(f)
-    
-    return jsonify({'success': True, 'results': results})
+    return response
+
+
+@app.route('/results/<task_id>/charts')
+def get_chart_payload(task_id):
+    """Chart-ready payload (metric cards, AL curves, radar series, table) for dashboards"""
+    if not ensure_chart_payload(task_id):
+        return jsonify({'success': False, 'error': 'Results not found'})
+    return send_cached_json(
+        chart_payload_path(task_id),
+        lambda actual: _with_raw_json({'success': True}, charts=serialization.read_bytes(actual))
+    )
+
+
+@app.route('/results/<task_id>/sessions')
+def get_session_page(task_id):
+    """
+    One page of the per-session table: ?offset=0&limit=100&sort=<method|session_id|rounds>&order=desc.
+    Rows hold each method's average score and binary alignment rate, in the order of `methods`.
+    Without sort, sessions keep their input order.
+    """
+    if not ensure_session_table(task_id):
+        return jsonify({'success': False, 'error': 'Results not found'})
+    entry = load_session_table(task_id)
+    table = entry['table']
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 1), SESSION_PAGE_MAX)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'offset and limit must be integers'}), 400
+    sort = request.args.get('sort')
+    if sort and sort not in ('session_id', 'rounds') and sort not in table['methods']:
+        return jsonify({'success': False, 'error': f'Unknown sort key: {sort}'}), 400
+    rows = table['rows']
+    if sort:
+        order = session_order(entry, sort, request.args.get('order', 'desc') == 'desc')
+        page = [rows[i] for i in order[offset:offset + limit]]
+    else:
+        page = rows[offset:offset + limit]
+    return jsonify({'success': True, 'task_id': task_id, 'methods': table['methods'],
+                    'total': len(rows), 'offset': offset, 'rows': page})
+
+
+@app.route('/api/leaderboard')
+def leaderboard():
+    """Rank (task, method) results from the index; filters: dataset, method, judge, mode, since, until"""
+    args = request.args
+    try:
+        rows = results_index.leaderboard(
+            dataset=args.get('dataset'),
+            method=args.get('method'),
+            judge_model=args.get('judge'),
+            mode=args.get('mode'),
+            since=args.get('since'),
+            until=args.get('until'),
+            sort=args.get('sort', 'AVG'),
+            descending=args.get('order', 'desc') != 'asc',
+            limit=min(int(args.get('limit', 100)), 1000),
+            offset=int(args.get('offset', 0))
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'count': len(rows), 'results': rows})
+
+
+def recompute_summary_path(task_id):
+    return os.path.join(app.config['RESULTS_FOLDER'], f"{task_id}_recompute.json")
+
+
+def run_recompute(task_id, task_ids, force, dry_run):
+    """
+    Background recompute job registered in the task registry (progress: completed_sessions counts files).
+    Runs in-process: forking a process pool from the threaded server is unsafe (the CLI recompute uses one).
+    """
+    try:
+        with task_registry.running(task_id) as run:
+            summary = recompute_folder(app.config['RESULTS_FOLDER'], task_ids=task_ids, force=force,
+                                       dry_run=dry_run, workers=1, on_file=run.advance)
+            tmp_path = recompute_summary_path(task_id) + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'task_id': task_id, **summary}, f, ensure_ascii=False)
+            os.replace(tmp_path, recompute_summary_path(task_id))
+    except Exception as e:
+        print(f"Recompute {task_id} failed: {e}")
+
+
+@app.route('/api/recompute', methods=['POST'])
+def recompute_metrics():
+    """
+    Start recomputing metrics / AL curves / radar data of finished tasks from their stored judgments
+    (no judge calls). Body: {"task_ids": [...], "force": false, "dry_run": false}; all tasks by default.
+    Returns a task_id at once: poll /status/<task_id>, then GET /api/recompute/<task_id> for the summary.
+    An identical recompute already running is joined instead of started twice.
+    """
+    data = request.get_json(silent=True) or {}
+    task_ids = data.get('task_ids')
+    if task_ids is not None and not isinstance(task_ids, list):
+        return jsonify({'success': False, 'error': 'task_ids must be a list'}), 400
+    force, dry_run = bool(data.get('force')), bool(data.get('dry_run'))
+    key = request_key(action='recompute', task_ids=sorted(task_ids) if task_ids is not None else None,
+                      force=force, dry_run=dry_run)
+    task_id, owned = task_registry.claim(key, f"recompute-{uuid.uuid4().hex[:8]}",
+                                         {'mode': 'recompute', 'task_ids': task_ids, 'force': force,
+                                          'dry_run': dry_run})
+    if owned:
+        threading.Thread(target=run_recompute, args=(task_id, task_ids, force, dry_run), daemon=True).start()
+    return jsonify({'success': True, 'task_id': task_id, 'started': owned}), 202
+
+
+@app.route('/api/recompute/<task_id>')
+def recompute_result(task_id):
+    """Summary of a finished recompute job (per-task reports); status only while it is running"""
+    status = task_registry.get(task_id)
+    if status is None or status['request'].get('mode') != 'recompute':
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    if status['status'] != 'done' or not os.path.exists(recompute_summary_path(task_id)):
+        return jsonify({'success': status['status'] in ('running', 'done'), **status})
+    with open(recompute_summary_path(task_id), encoding='utf-8') as f:
+        summary = json.load(f)
+    return jsonify({'success': summary['failed'] == 0, 'status': 'done', **summary})
 
 
 @app.route('/download_template')
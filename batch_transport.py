@@ -0,0 +1,260 @@
+"""
+PersonaSteer Benchmark - Batch Transport
+
+离线批量提交：把 chat completion 请求写成 JSONL 批处理文件，提交、轮询、
+再按 custom_id 取回结果。评估器 (evaluator.py) 与对话生成脚本
+(scripts/generate_dialogues.py) 共用此模块。
+
+批处理文件格式与 OpenAI Batch API 一致:
+    输入: {"custom_id": ..., "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+    输出: {"custom_id": ..., "response": {"status_code": 200, "body": {...}}, "error": null}
+
+传输层可插拔:
+    - OpenAIBatchTransport: OpenAI 兼容的 /files + /batches 接口
+    - LocalBatchTransport:  基于本地目录的替身，可内联处理或由 serve_spool 进程处理
+
+使用方法 / Usage (本地替身服务):
+    python batch_transport.py serve --spool batches/ --api-url http://localhost:8000/v1/chat/completions --api-key x
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import requests
+
+CHAT_ENDPOINT = '/v1/chat/completions'
+
+
+class BatchTransport:
+    """批处理传输层接口"""
+
+    def submit(self, input_path: str) -> str:
+        """提交批处理输入文件，返回 batch_id"""
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        """返回批处理状态: validating / in_progress / completed / failed / expired / cancelled"""
+        raise NotImplementedError
+
+    def download(self, batch_id: str, output_path: str) -> str:
+        """下载已完成批处理的输出文件到 output_path"""
+        raise NotImplementedError
+
+
+class OpenAIBatchTransport(BatchTransport):
+    """OpenAI 兼容的 Batch API (POST /files, POST /batches, GET /batches/{id})"""
+
+    def __init__(self, base_url: str, api_key: str, completion_window: str = '24h'):
+        self.base_url = base_url.rstrip('/')
+        self.completion_window = completion_window
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def submit(self, input_path: str) -> str:
+        with open(input_path, 'rb') as f:
+            response = self.session.post(f"{self.base_url}/files", data={'purpose': 'batch'},
+                                         files={'file': (os.path.basename(input_path), f)}, timeout=300)
+        response.raise_for_status()
+        response = self.session.post(f"{self.base_url}/batches", json={
+            'input_file_id': response.json()['id'],
+            'endpoint': CHAT_ENDPOINT,
+            'completion_window': self.completion_window
+        }, timeout=60)
+        response.raise_for_status()
+        return response.json()['id']
+
+    def _batch(self, batch_id: str) -> Dict:
+        response = self.session.get(f"{self.base_url}/batches/{batch_id}", timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def status(self, batch_id: str) -> str:
+        return self._batch(batch_id)['status']
+
+    def download(self, batch_id: str, output_path: str) -> str:
+        output_file_id = self._batch(batch_id).get('output_file_id')
+        with open(output_path, 'wb') as f:
+            if output_file_id:
+                response = self.session.get(f"{self.base_url}/files/{output_file_id}/content",
+                                            stream=True, timeout=300)
+                response.raise_for_status()
+                for chunk in response.iter_content(1 << 20):
+                    f.write(chunk)
+        return output_path
+
+
+class LocalBatchTransport(BatchTransport):
+    """
+    基于本地目录的批处理替身
+
+    spool_dir/<batch_id>/input.jsonl 为提交的请求，处理完成后写入 output.jsonl。
+    传入 responder (body -> 响应 body) 时提交即内联处理；否则等待 serve_spool 进程处理。
+    """
+
+    def __init__(self, spool_dir: str, responder: Callable[[Dict], Dict] = None):
+        self.spool_dir = spool_dir
+        self.responder = responder
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def submit(self, input_path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        batch_dir = os.path.join(self.spool_dir, batch_id)
+        os.makedirs(batch_dir)
+        shutil.copyfile(input_path, os.path.join(batch_dir, 'input.jsonl'))
+        if self.responder is not None:
+            process_batch_dir(batch_dir, self.responder)
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        batch_dir = os.path.join(self.spool_dir, batch_id)
+        if os.path.exists(os.path.join(batch_dir, 'output.jsonl')):
+            return 'completed'
+        return 'in_progress'
+
+    def download(self, batch_id: str, output_path: str) -> str:
+        shutil.copyfile(os.path.join(self.spool_dir, batch_id, 'output.jsonl'), output_path)
+        return output_path
+
+
+def process_batch_dir(batch_dir: str, responder: Callable[[Dict], Dict], workers: int = 8):
+    """处理本地批处理目录：逐条调用 responder，原子写入 output.jsonl"""
+    with open(os.path.join(batch_dir, 'input.jsonl'), 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+
+    def handle(line):
+        try:
+            body = responder(line['body'])
+            return {'id': f"resp_{uuid.uuid4().hex[:12]}", 'custom_id': line['custom_id'],
+                    'response': {'status_code': 200, 'body': body}, 'error': None}
+        except Exception as e:
+            return {'id': f"resp_{uuid.uuid4().hex[:12]}", 'custom_id': line['custom_id'],
+                    'response': None, 'error': {'message': str(e)}}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outputs = list(executor.map(handle, lines))
+
+    tmp_path = os.path.join(batch_dir, 'output.jsonl.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for output in outputs:
+            f.write(json.dumps(output, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, os.path.join(batch_dir, 'output.jsonl'))
+
+
+def http_responder(api_url: str, api_key: str) -> Callable[[Dict], Dict]:
+    """把批处理请求转发到一个同步 chat completion 接口的 responder"""
+    session = requests.Session()
+    session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def respond(body: Dict) -> Dict:
+        response = session.post(api_url, json=body, timeout=120)
+        response.raise_for_status()
+        return response.json()
+
+    return respond
+
+
+def serve_spool(spool_dir: str, responder: Callable[[Dict], Dict], poll_interval: float = 2.0,
+                once: bool = False):
+    """持续处理 spool_dir 中尚未完成的批处理 (本地替身服务)"""
+    os.makedirs(spool_dir, exist_ok=True)
+    while True:
+        for name in sorted(os.listdir(spool_dir)):
+            batch_dir = os.path.join(spool_dir, name)
+            if os.path.exists(os.path.join(batch_dir, 'input.jsonl')) and \
+                    not os.path.exists(os.path.join(batch_dir, 'output.jsonl')):
+                print(f"Processing {name}...")
+                process_batch_dir(batch_dir, responder)
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
+def run_batch(transport: BatchTransport, requests_by_id: Dict[str, Dict], workdir: str,
+              poll_interval: float = 30.0, timeout: Optional[float] = None,
+              name: str = 'batch') -> Dict[str, Optional[str]]:
+    """
+    写入批处理文件 → 提交 → 轮询 → 取回结果
+
+    Args:
+        requests_by_id: {custom_id: chat completion 请求 body}
+        workdir: 保存输入 / 输出批处理文件的目录
+    Returns:
+        {custom_id: 消息内容}；失败的请求为 None
+    """
+    if not requests_by_id:
+        return {}
+    os.makedirs(workdir, exist_ok=True)
+    input_path = os.path.join(workdir, f"{name}_input.jsonl")
+    with open(input_path, 'w', encoding='utf-8') as f:
+        for custom_id, body in requests_by_id.items():
+            f.write(json.dumps({'custom_id': custom_id, 'method': 'POST',
+                                'url': CHAT_ENDPOINT, 'body': body}, ensure_ascii=False) + '\n')
+
+    batch_id = transport.submit(input_path)
+    print(f"Submitted {len(requests_by_id)} requests as {batch_id}")
+
+    started = time.time()
+    while True:
+        status = transport.status(batch_id)
+        if status == 'completed':
+            break
+        if status in ('failed', 'expired', 'cancelled'):
+            raise RuntimeError(f"Batch {batch_id} ended with status '{status}'")
+        if timeout is not None and time.time() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} not completed after {timeout}s")
+        time.sleep(poll_interval)
+
+    output_path = transport.download(batch_id, os.path.join(workdir, f"{name}_output.jsonl"))
+    return parse_batch_output(output_path, requests_by_id.keys())
+
+
+def parse_batch_output(output_path: str, custom_ids) -> Dict[str, Optional[str]]:
+    """按 custom_id 解析批处理输出文件"""
+    contents = {custom_id: None for custom_id in custom_ids}
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get('response') or {}
+            if record.get('error') or response.get('status_code') != 200:
+                continue
+            try:
+                contents[record['custom_id']] = response['body']['choices'][0]['message']['content']
+            except (KeyError, IndexError, TypeError):
+                continue
+    return contents
+
+
+def make_transport(kind: str, spool_dir: str = None, base_url: str = None,
+                   api_key: str = None) -> BatchTransport:
+    """按名称构造传输层: 'openai' 或 'local'"""
+    if kind == 'openai':
+        return OpenAIBatchTransport(base_url, api_key)
+    if kind == 'local':
+        return LocalBatchTransport(spool_dir)
+    raise ValueError(f"Unknown batch transport: {kind}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local batch stand-in server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    p = subparsers.add_parser('serve', help='Fulfil batches in a spool directory via a chat completion endpoint')
+    p.add_argument('--spool', type=str, required=True, help='Spool directory used by LocalBatchTransport')
+    p.add_argument('--api-url', type=str, required=True, help='Chat completion endpoint URL')
+    p.add_argument('--api-key', type=str, required=True, help='API key')
+    p.add_argument('--poll-interval', type=float, default=2.0)
+    p.add_argument('--once', action='store_true', help='Process pending batches once and exit')
+    args = parser.parse_args()
+    serve_spool(args.spool, http_responder(args.api_url, args.api_key),
+                poll_interval=args.poll_interval, once=args.once)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,550 @@
+"""
+PersonaSteer Benchmark - Command Line Interface
+
+无需 Flask 的命令行评测入口，适用于批处理流水线 / 定时任务。
+逐会话结果以 JSONL 流式写到 stdout，最后一行为汇总结果；进度日志写到 stderr。
+
+使用方法 / Usage:
+    python cli.py evaluate data.jsonl --methods Base Ours > out.jsonl
+    cat data.jsonl | python cli.py evaluate - --concurrency 16 --cache judge_cache.jsonl
+    python cli.py evaluate data.jsonl --resume 1a2b3c4d    # Ctrl-C 协作式取消后从断点续评
+    python cli.py evaluate data_v2.jsonl --base-task 1a2b3c4d    # 增量评测：只评审新增/变化的响应
+    python cli.py evaluate data.jsonl --adaptive-baseline Base --precision 2  # 名次确定即停止
+    python cli.py evaluate data.jsonl --preview 5      # 每轮抽样 5 个会话的快速预览
+    python cli.py evaluate data.jsonl --batch openai   # 离线批处理：提交批处理文件并轮询结果
+    python cli.py evaluate huge.jsonl --stream         # 流式评测：内存占用与会话数量无关
+    python cli.py evaluate data.jsonl --hedge-budget 0.05   # 慢于 p95 的评审请求发送对冲请求 (最多 5% 额外调用)
+    python cli.py evaluate data.jsonl --judge-pool judges.json  # 多个评审网关，按延迟与配额路由
+    python cli.py evaluate data.jsonl --stream-judge   # 流式评审：解析出结论即停止生成
+    python cli.py evaluate data.jsonl --scoring prescreen   # 明显不合格的响应由本地规则判定，不调用评审模型
+    python cli.py evaluate sweep.jsonl --scoring heuristic  # 完全离线的启发式近似评分
+    python cli.py agreement data.jsonl --task-id 1a2b3c4d   # 启发式评分与已有 LLM 评审结果的一致性
+    python cli.py evaluate long.jsonl --history window:8    # 评审提示词只带最近 8 轮历史 (长会话)
+    python cli.py drift --task-id 5e6f7a8b --baseline 1a2b3c4d   # 历史策略与完整历史的分数漂移和 token 节省
+    python cli.py validate data.jsonl                  # 格式校验，列出所有错误 (带行号)
+    python cli.py leaderboard --method Ours --sort Slope   # 跨任务排行榜 (读取 results/index.db)
+    python cli.py recompute                            # 指标定义变化后，由已保存的评分重算所有任务的指标
+
+多节点工作队列 / Work queue:
+    python cli.py queue-submit data.jsonl --db queue.db --methods Base Ours
+    python cli.py queue-worker --db queue.db --concurrency 8      # 在每台机器上运行
+    python cli.py queue-aggregate --db queue.db --task-id 1a2b3c4d
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import signal
+import sys
+import uuid
+
+import serialization
+from evaluator import (BenchmarkEvaluator, JudgeCache, load_sessions, parse_max_tokens, write_results,
+                       write_chart_payload)
+from heuristics import SCORING_MODES, agreement_report
+from history import drift_report, parse_history_strategy
+from judge_pool import JudgePool
+from scheduler import TaskCancelled
+from results_index import ResultsIndex, file_digest
+from validator import validate_file, format_error
+
+
+def _write_line(stream, record: dict):
+    stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+    stream.flush()
+
+
+def _detect_methods(session: dict) -> list:
+    """从首个会话的第一轮响应中读取方法名"""
+    rounds = session.get('rounds', session.get('conversations', []))
+    if rounds and isinstance(rounds[0].get('responses'), dict):
+        return list(rounds[0]['responses'].keys())
+    return []
+
+
+def _index_results(results: dict, result_path: str, results_folder: str, compression: str = None):
+    """写出图表数据并把已完成任务写入结果目录的索引；索引失败不影响评测结果"""
+    write_chart_payload(results, results_folder, compression)
+    try:
+        ResultsIndex.for_folder(results_folder).add(results, result_path)
+    except Exception as e:
+        print(f"Failed to index task {results.get('task_id')}: {e}", file=sys.stderr)
+
+
+def _check_compress(args) -> bool:
+    try:
+        serialization.check_compression(args.compress)
+        return True
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return False
+
+
+def cmd_evaluate(args) -> int:
+    if not _check_compress(args):
+        return 1
+    if args.batch and args.input == '-':
+        print("--batch needs a file input (sessions are read twice)", file=sys.stderr)
+        return 1
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    sessions = load_sessions(source)
+
+    methods = args.methods
+    if not methods:
+        # 预读首个会话探测方法名，再拼回会话流
+        first = next(sessions, None)
+        if first is None:
+            print("No sessions found in input", file=sys.stderr)
+            return 1
+        methods = _detect_methods(first)
+        sessions = itertools.chain([first], sessions)
+        if not methods:
+            print("Could not detect methods; pass --methods explicitly", file=sys.stderr)
+            return 1
+
+    try:
+        judge_max_tokens = parse_max_tokens(','.join(args.judge_max_tokens)) if args.judge_max_tokens else None
+        if args.history:
+            parse_history_strategy(args.history)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    task_id = args.resume or args.task_id or str(uuid.uuid4())[:8]
+    os.makedirs(args.results_folder, exist_ok=True)
+
+    evaluator = BenchmarkEvaluator(
+        judge_model=args.judge_model,
+        max_workers=args.concurrency,
+        judge_concurrency=args.judge_concurrency,
+        judge_timeout=args.judge_timeout,
+        hedge_budget=args.hedge_budget,
+        hedge_quantile=args.hedge_quantile,
+        judge_pool=JudgePool.from_file(args.judge_pool) if args.judge_pool else None,
+        stream_judge=args.stream_judge or None,
+        judge_max_tokens=judge_max_tokens,
+        scoring=args.scoring,
+        history=args.history,
+        cache=JudgeCache(args.cache) if args.cache else None,
+        compression=args.compress
+    )
+
+    base_results = None
+    if args.base_task:
+        base_results = serialization.load(os.path.join(args.results_folder, f"{args.base_task}_results.json"))
+
+    out = sys.stdout
+
+    def on_session(session_id, session_results):
+        _write_line(out, {'type': 'session', 'task_id': task_id,
+                          'session_id': session_id, 'methods': session_results})
+
+    print(f"Task {task_id}: evaluating methods {methods}", file=sys.stderr)
+    # 首次 Ctrl-C / SIGTERM 协作式取消 (不再发出新的评审调用，保留断点)，再次 Ctrl-C 立即中断
+    def on_signal(signum, frame):
+        if evaluator.scheduler.is_cancelled(task_id):
+            raise KeyboardInterrupt
+        print(f"Cancelling task {task_id}, waiting for in-flight judge calls...", file=sys.stderr)
+        evaluator.cancel(task_id)
+
+    evaluator.scheduler.track(task_id)
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    # 评估器的进度日志改写到 stderr，保证 stdout 只包含 JSONL
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.batch:
+                from batch_transport import make_transport
+                from evaluator import BASE_URL_OPENAI, API_KEY
+                transport = make_transport(args.batch, spool_dir=os.path.join(args.batch_dir, 'spool'),
+                                           base_url=BASE_URL_OPENAI, api_key=API_KEY)
+                results = evaluator.evaluate_batch(
+                    args.input, methods, task_id, transport, workdir=args.batch_dir,
+                    results_folder=args.results_folder, on_session=on_session,
+                    base_results=base_results, poll_interval=args.batch_poll
+                )
+            elif args.preview:
+                results = evaluator.evaluate_preview(
+                    sessions, methods, task_id, per_round=args.preview, seed=args.seed,
+                    results_folder=args.results_folder, on_session=on_session
+                )
+            elif args.adaptive_baseline:
+                results = evaluator.evaluate_adaptive(
+                    sessions, methods, task_id, baseline=args.adaptive_baseline,
+                    alpha=args.alpha, precision=args.precision, min_sessions=args.min_sessions,
+                    seed=args.seed, results_folder=args.results_folder, on_session=on_session
+                )
+            else:
+                results = evaluator.evaluate_sessions(
+                    sessions, methods, task_id,
+                    results_folder=args.results_folder, on_session=on_session,
+                    base_results=base_results, stream=args.stream
+                )
+    except TaskCancelled:
+        print(f"Task {task_id} cancelled; resume with --resume {task_id}", file=sys.stderr)
+        return 130
+
+    results['base_task_id'] = args.base_task
+    results['judge_model'] = args.judge_model
+
+    if source is not sys.stdin:
+        source.close()
+        results['file_id'] = file_digest(args.input)
+
+    result_path = args.output or os.path.join(args.results_folder, f"{task_id}_results.json")
+    result_path = write_results(results, result_path, args.compress)
+    print(f"Results saved to {result_path}", file=sys.stderr)
+    _index_results(results, result_path, args.results_folder, args.compress)
+
+    # 流式评测：会话明细已写入结果文件 (并已逐行输出)，summary 只包含汇总指标
+    sessions_file = results.pop('sessions_file', None)
+    if sessions_file:
+        os.remove(sessions_file)
+
+    _write_line(out, {'type': 'summary', 'task_id': task_id, 'results': results})
+    return 0
+
+
+def cmd_validate(args) -> int:
+    report = validate_file(args.input, workers=args.workers or os.cpu_count() or 1, max_errors=args.max_errors)
+    for error in report['errors']:
+        print(format_error(error), file=sys.stderr)
+    if report['truncated']:
+        print(f"... {report['error_count'] - len(report['errors'])} more errors", file=sys.stderr)
+    _write_line(sys.stdout, report)
+    return 1 if report['errors'] else 0
+
+
+def cmd_agreement(args) -> int:
+    if not args.results and not args.task_id:
+        print("Pass --task-id or --results", file=sys.stderr)
+        return 1
+    result_path = args.results or os.path.join(args.results_folder, f"{args.task_id}_results.json")
+    if not serialization.exists(result_path):
+        print(f"Results not found: {result_path}", file=sys.stderr)
+        return 1
+    report = agreement_report(load_sessions(args.input), serialization.load(result_path))
+    if not report['rounds']:
+        print("No LLM-judged rounds of this task match the input sessions", file=sys.stderr)
+        return 1
+    _write_line(sys.stdout, report)
+    return 0
+
+
+def cmd_drift(args) -> int:
+    reports = []
+    for task_id in (args.task_id, args.baseline):
+        path = os.path.join(args.results_folder, f"{task_id}_results.json")
+        if not serialization.exists(path):
+            print(f"Results not found: {path}", file=sys.stderr)
+            return 1
+        reports.append(serialization.load(path))
+    report = drift_report(*reports)
+    if not report['rounds']:
+        print("The two tasks have no judged rounds in common", file=sys.stderr)
+        return 1
+    _write_line(sys.stdout, report)
+    return 0
+
+
+def cmd_recompute(args) -> int:
+    from recompute import recompute_folder
+    if not os.path.isdir(args.results_folder):
+        print(f"Results folder not found: {args.results_folder}", file=sys.stderr)
+        return 1
+    summary = recompute_folder(args.results_folder, task_ids=args.task_id, force=args.force,
+                               dry_run=args.dry_run, workers=args.workers)
+    for report in summary.pop('tasks'):
+        if report['status'] in ('skipped', 'failed'):
+            print(f"{report['task_id']}: {report['status']}: {report['error']}", file=sys.stderr)
+        _write_line(sys.stdout, {'type': 'task', **report})
+    _write_line(sys.stdout, {'type': 'summary', **summary})
+    return 1 if summary['failed'] else 0
+
+
+def cmd_leaderboard(args) -> int:
+    index = ResultsIndex.for_folder(args.results_folder)
+    if args.sync:
+        print(f"Indexed {index.sync(args.results_folder)} result files", file=sys.stderr)
+    try:
+        rows = index.leaderboard(dataset=args.dataset, method=args.method, judge_model=args.judge_model,
+                                 mode=args.mode, since=args.since, until=args.until, sort=args.sort,
+                                 descending=not args.ascending, limit=args.limit)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    for row in rows:
+        _write_line(sys.stdout, row)
+    return 0
+
+
+def _open_queue(args):
+    from work_queue import WorkQueue
+    return WorkQueue(args.db, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts,
+                     wal=not args.no_wal)
+
+
+def cmd_queue_submit(args) -> int:
+    methods = args.methods or _detect_methods(next(load_sessions(args.input), {}))
+    if not methods:
+        print("Could not detect methods; pass --methods explicitly", file=sys.stderr)
+        return 1
+    try:
+        # 评审配置在提交时确定 (含 PERSONASTEER_SCORING / PERSONASTEER_HISTORY 默认值)，worker 与汇总按它评测
+        settings = BenchmarkEvaluator(judge_model=args.judge_model, scoring=args.scoring,
+                                      history=args.history).settings
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    task_id = args.task_id or str(uuid.uuid4())[:8]
+    n_items = _open_queue(args).enqueue_file(args.input, methods, task_id, settings)
+    print(f"Task {task_id}: enqueued {n_items} items for methods {methods}", file=sys.stderr)
+    print(task_id)
+    return 0
+
+
+def cmd_queue_worker(args) -> int:
+    from work_queue import run_worker
+    evaluator = BenchmarkEvaluator(
+        judge_model=args.judge_model,
+        judge_concurrency=args.concurrency,
+        judge_pool=JudgePool.from_file(args.judge_pool) if args.judge_pool else None,
+        cache=JudgeCache(args.cache) if args.cache else None
+    )
+    done = run_worker(
+        _open_queue(args), evaluator, worker_id=args.worker_id, task_id=args.task_id,
+        concurrency=args.concurrency, exit_when_idle=not args.follow
+    )
+    print(f"Worker finished: {done} items completed", file=sys.stderr)
+    return 0
+
+
+def cmd_queue_status(args) -> int:
+    _write_line(sys.stdout, {'task_id': args.task_id, **_open_queue(args).progress(args.task_id)})
+    return 0
+
+
+def cmd_queue_aggregate(args) -> int:
+    if not _check_compress(args):
+        return 1
+    queue = _open_queue(args)
+    if not queue.is_finished(args.task_id) and not args.partial:
+        print(f"Task {args.task_id} is not finished: {queue.progress(args.task_id)}", file=sys.stderr)
+        return 1
+    results = queue.aggregate(args.task_id, BenchmarkEvaluator())
+    os.makedirs(args.results_folder, exist_ok=True)
+    result_path = args.output or os.path.join(args.results_folder, f"{args.task_id}_results.json")
+    result_path = write_results(results, result_path, args.compress)
+    print(f"Results saved to {result_path}", file=sys.stderr)
+    _index_results(results, result_path, args.results_folder, args.compress)
+    _write_line(sys.stdout, {'type': 'summary', 'task_id': args.task_id, 'results': results})
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='PersonaSteer Benchmark command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_compress_arg(p):
+        p.add_argument('--compress', type=str, default=None, choices=list(serialization.SUFFIXES),
+                       help='Compression for results and checkpoints (default: $PERSONASTEER_COMPRESSION or none); '
+                            'adds a .gz / .zst suffix')
+
+    p = subparsers.add_parser('evaluate', help='Evaluate a JSONL dialogue file with LLM-as-a-Judge')
+    p.add_argument('input', type=str,
+                   help='Path to sessions JSONL file, or - to read from stdin')
+    p.add_argument('--methods', type=str, nargs='+', default=None,
+                   help='Methods to evaluate (default: all methods in the first session)')
+    p.add_argument('--judge-model', type=str, default='gpt-4o-mini',
+                   help='Judge model name')
+    p.add_argument('--concurrency', type=int, default=8,
+                   help='Number of sessions evaluated concurrently')
+    p.add_argument('--judge-concurrency', type=int, default=None,
+                   help='Maximum concurrent judge API calls (default: PERSONASTEER_JUDGE_CONCURRENCY or --concurrency)')
+    p.add_argument('--judge-timeout', type=float, default=None,
+                   help='Timeout in seconds for each judge call (default: PERSONASTEER_JUDGE_TIMEOUT or 60)')
+    p.add_argument('--hedge-budget', type=float, default=None,
+                   help='Send a duplicate of judge calls slower than the latency quantile, '
+                        'at most this fraction of extra calls (e.g. 0.05; default: PERSONASTEER_HEDGE_BUDGET, 0 = off)')
+    p.add_argument('--hedge-quantile', type=float, default=0.95,
+                   help='Latency quantile after which a hedged request is sent')
+    p.add_argument('--judge-pool', type=str, default=None, metavar='JSON',
+                   help='Judge endpoint pool config file (default: PERSONASTEER_JUDGE_POOL)')
+    p.add_argument('--stream-judge', action='store_true',
+                   help='Stream judge responses and stop generation once the verdict is parsed '
+                        '(default: PERSONASTEER_JUDGE_STREAM)')
+    p.add_argument('--judge-max-tokens', type=str, nargs='+', default=None, metavar='KIND=N',
+                   help='Per-prompt max_tokens, e.g. alignment=400 binary=300 '
+                        '(default: PERSONASTEER_JUDGE_MAX_TOKENS; tuned limits with --stream-judge, else 600)')
+    p.add_argument('--scoring', type=str, default=None, choices=list(SCORING_MODES),
+                   help='llm: judge every response; prescreen: score obviously bad responses (empty, duplicate, '
+                        'echo, markdown tutorial) locally; heuristic: offline approximate scoring, no API calls '
+                        '(default: PERSONASTEER_SCORING or llm)')
+    p.add_argument('--history', type=str, default=None, metavar='STRATEGY',
+                   help='Conversation history in judge prompts: full, window[:N] (last N rounds), '
+                        'budget[:TOKENS] (recent rounds within a token budget) or summary[:N] '
+                        '(older rounds folded into a rolling summary) (default: PERSONASTEER_HISTORY or full)')
+    p.add_argument('--cache', type=str, default=None,
+                   help='Path to a persistent judge response cache (JSONL)')
+    p.add_argument('--results-folder', type=str, default='results',
+                   help='Folder for checkpoints and final results')
+    p.add_argument('--task-id', type=str, default=None,
+                   help='Task ID (default: random)')
+    p.add_argument('--resume', type=str, default=None, metavar='TASK_ID',
+                   help='Resume an interrupted task from its checkpoint')
+    p.add_argument('--base-task', type=str, default=None, metavar='TASK_ID',
+                   help='Prior task in --results-folder to build on; only new or changed responses are judged')
+    # 评测模式互斥：自适应 / 预览 / 批处理，均未指定时为完整评测
+    mode = p.add_mutually_exclusive_group()
+    mode.add_argument('--adaptive-baseline', type=str, default=None, metavar='METHOD',
+                   help='Adaptive mode: judge sessions in random order and stop once every method '
+                        'is settled against this baseline')
+    p.add_argument('--alpha', type=float, default=0.05, help='Adaptive mode: significance level')
+    p.add_argument('--precision', type=float, default=None,
+                   help='Adaptive mode: target confidence interval half-width in score points')
+    p.add_argument('--min-sessions', type=int, default=10,
+                   help='Adaptive mode: minimum sessions before stopping')
+    mode.add_argument('--preview', type=int, default=None, metavar='N',
+                   help='Preview mode: judge N sampled sessions per round index and estimate the AL curve')
+    p.add_argument('--seed', type=int, default=None, help='Random seed for adaptive / preview sampling')
+    mode.add_argument('--batch', type=str, default=None, choices=['openai', 'local'],
+                   help='Batch mode: submit all judge requests as one batch file via this transport '
+                        '(local: a spool directory served by "python batch_transport.py serve")')
+    p.add_argument('--batch-dir', type=str, default='batches',
+                   help='Batch mode: folder for batch input/output files and the local spool')
+    p.add_argument('--batch-poll', type=float, default=30.0,
+                   help='Batch mode: seconds between status polls')
+    p.add_argument('--stream', action='store_true',
+                   help='Streaming mode: spill per-session results to disk and keep only running aggregates '
+                        'in memory (resume with --resume)')
+    p.add_argument('--output', type=str, default=None,
+                   help='Path for the final results JSON (default: <results-folder>/<task_id>_results.json)')
+    add_compress_arg(p)
+    p.set_defaults(func=cmd_evaluate)
+
+    p = subparsers.add_parser('validate', help='Check a JSONL dialogue file and list every format error')
+    p.add_argument('input', type=str, help='Path to sessions JSONL file')
+    p.add_argument('--workers', type=int, default=None, help='Validation processes (default: CPU count)')
+    p.add_argument('--max-errors', type=int, default=100, help='Maximum number of errors to report')
+    p.set_defaults(func=cmd_validate)
+
+    p = subparsers.add_parser('agreement',
+                              help='Compare heuristic scores with the LLM judgments of a finished task')
+    p.add_argument('input', type=str, help='Path to the sessions JSONL file the task evaluated')
+    p.add_argument('--task-id', type=str, default=None, help='Task whose results to compare against')
+    p.add_argument('--results', type=str, default=None, help='Path to a results JSON (instead of --task-id)')
+    p.add_argument('--results-folder', type=str, default='results', help='Folder holding <task_id>_results.json')
+    p.set_defaults(func=cmd_agreement)
+
+    p = subparsers.add_parser('drift',
+                              help='Compare a task judged with a history strategy against a full-history '
+                                   'baseline task (score drift and token savings)')
+    p.add_argument('--task-id', type=str, required=True, help='Task judged with a history strategy')
+    p.add_argument('--baseline', type=str, required=True, metavar='TASK_ID',
+                   help='Task judged on the same data with full history')
+    p.add_argument('--results-folder', type=str, default='results', help='Folder holding <task_id>_results.json')
+    p.set_defaults(func=cmd_drift)
+
+    p = subparsers.add_parser('recompute',
+                              help='Recompute metrics, AL curves and radar data of finished tasks from their '
+                                   'stored judgments (no judge calls)')
+    p.add_argument('--results-folder', type=str, default='results', help='Folder holding the results files')
+    p.add_argument('--task-id', type=str, nargs='+', default=None, help='Only these tasks (default: all)')
+    p.add_argument('--force', action='store_true',
+                   help='Also recompute results already at the current metrics version')
+    p.add_argument('--dry-run', action='store_true', help='Report what would change without writing files')
+    p.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    p.set_defaults(func=cmd_recompute)
+
+    p = subparsers.add_parser('leaderboard', help='Rank methods across finished tasks from the results index')
+    p.add_argument('--results-folder', type=str, default='results', help='Folder holding results and index.db')
+    p.add_argument('--sync', action='store_true',
+                   help='First index result files that are new or changed since they were last indexed')
+    p.add_argument('--dataset', type=str, default=None, help='Dataset hash (upload file_id)')
+    p.add_argument('--method', type=str, default=None)
+    p.add_argument('--judge-model', type=str, default=None)
+    p.add_argument('--mode', type=str, default=None, choices=['full', 'preview', 'adaptive', 'heuristic'])
+    p.add_argument('--since', type=str, default=None, help='Completed at or after (ISO date/time)')
+    p.add_argument('--until', type=str, default=None, help='Completed at or before (ISO date/time)')
+    p.add_argument('--sort', type=str, default='AVG',
+                   choices=['AVG', 'Slope', 'Intercept', 'R2', 'binary_rate', 'completed_at'])
+    p.add_argument('--ascending', action='store_true')
+    p.add_argument('--limit', type=int, default=20)
+    p.set_defaults(func=cmd_leaderboard)
+
+    def add_queue_args(p):
+        p.add_argument('--db', type=str, required=True, help='Path to the work queue SQLite database')
+        p.add_argument('--lease-seconds', type=float, default=120, help='Lease duration for work items')
+        p.add_argument('--max-attempts', type=int, default=3,
+                       help='Leases per work item before it is marked failed (errors or expired leases)')
+        p.add_argument('--no-wal', action='store_true',
+                       help='Use a rollback journal instead of WAL (required on network filesystems)')
+
+    p = subparsers.add_parser('queue-submit', help='Split a dialogue file into work queue items')
+    p.add_argument('input', type=str, help='Path to sessions JSONL file')
+    p.add_argument('--methods', type=str, nargs='+', default=None,
+                   help='Methods to evaluate (default: all methods in the first session)')
+    p.add_argument('--task-id', type=str, default=None, help='Task ID (default: random)')
+    p.add_argument('--judge-model', type=str, default='gpt-4o-mini', help='Judge model name')
+    p.add_argument('--scoring', type=str, default=None, choices=list(SCORING_MODES),
+                   help='Scoring mode of the task (default: PERSONASTEER_SCORING or llm)')
+    p.add_argument('--history', type=str, default=None, metavar='STRATEGY',
+                   help='History strategy of the task (default: PERSONASTEER_HISTORY or full)')
+    add_queue_args(p)
+    p.set_defaults(func=cmd_queue_submit)
+
+    p = subparsers.add_parser('queue-worker', help='Lease and evaluate work queue items')
+    p.add_argument('--task-id', type=str, default=None, help='Only lease items of this task')
+    p.add_argument('--worker-id', type=str, default=None, help='Worker ID (default: host-pid)')
+    p.add_argument('--judge-model', type=str, default='gpt-4o-mini',
+                   help='Judge model for tasks submitted without recorded settings')
+    p.add_argument('--concurrency', type=int, default=4, help='Items evaluated concurrently')
+    p.add_argument('--cache', type=str, default=None, help='Path to a persistent judge response cache')
+    p.add_argument('--judge-pool', type=str, default=None, metavar='JSON',
+                   help='Judge endpoint pool config file (default: PERSONASTEER_JUDGE_POOL)')
+    p.add_argument('--follow', action='store_true', help='Keep polling for new items instead of exiting when idle')
+    add_queue_args(p)
+    p.set_defaults(func=cmd_queue_worker)
+
+    p = subparsers.add_parser('queue-status', help='Show work queue progress of a task')
+    p.add_argument('--task-id', type=str, required=True)
+    add_queue_args(p)
+    p.set_defaults(func=cmd_queue_status)
+
+    p = subparsers.add_parser('queue-aggregate', help='Aggregate finished work items into final results')
+    p.add_argument('--task-id', type=str, required=True)
+    p.add_argument('--partial', action='store_true', help='Aggregate even if items are still pending')
+    p.add_argument('--results-folder', type=str, default='results', help='Folder for final results')
+    p.add_argument('--output', type=str, default=None, help='Path for the final results JSON')
+    add_compress_arg(p)
+    add_queue_args(p)
+    p.set_defaults(func=cmd_queue_aggregate)
+
+    return parser
+
+
+def _evaluate_mode_error(args) -> str:
+    """evaluate 的部分选项只在某些模式下生效：组合不支持时返回错误信息 (而不是静默忽略)，否则返回空字符串"""
+    mode = '--batch' if args.batch else '--preview' if args.preview else \
+        '--adaptive-baseline' if args.adaptive_baseline else None
+    if args.stream and mode:
+        return f"--stream applies to full evaluation only, not to {mode}"
+    if args.base_task and mode in ('--preview', '--adaptive-baseline'):
+        return f"--base-task is not supported with {mode}"
+    return ''
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.func is cmd_evaluate:
+        error = _evaluate_mode_error(args)
+        if error:
+            parser.error(f"evaluate: {error}")
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,14 +4,30 @@ PersonaSteer Benchmark - Evaluator Module
 评估目标：衡量模型响应与用户画像/性格的对齐程度 AL(k)
 """
 
+import copy
+import hashlib
 import json
+import math
+import os
+import random
 import re
+import threading
 import time
+from array import array
+from collections import OrderedDict, deque
 import numpy as np
-from scipy import stats
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable, Tuple
 import openai
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+
+import serialization
+from hedging import HedgePolicy, judge_timeout_from_env, percentile, run_in_thread
+from heuristics import (BREAKDOWN_KEYS, HEURISTIC_SCORER, SCORING_MODES, extract_features, heuristic_score,
+                        prescreen, round_response)
+from history import (NO_HISTORY, SUMMARY_MAX_TOKENS, SummaryStore, budget_history, estimate_tokens,
+                     format_round, parse_history_strategy, rolling_summary, window_history)
+from judge_pool import JudgePool
+from scheduler import JudgeScheduler, TaskCancelled
 
 # ============================================================================
 # API Configuration
@@ -165,6 +181,695 @@ Please make a strict judgment based on all the above evaluation criteria. If eve
 '''
 
 
+# ============================================================================
+# 评审输出格式：生成上限与必需字段
+# ============================================================================
+
+DEFAULT_JUDGE_MAX_TOKENS = 600
+# 按格式收紧的生成上限 (流式评审默认使用)：评分格式为 2-3 句理由 + 6 行分数，二元格式只需 \boxed{0|1}
+TUNED_JUDGE_MAX_TOKENS = {'alignment': 400, 'binary': 300}
+
+# 各格式的必需字段；数字之后须跟非数字字符，避免流式输出在 "18" 的 "1" 处误判为已完整
+VERDICT_PATTERNS = {
+    'alignment': [re.compile(r'\\boxed\{\d+\}')] + [
+        re.compile(rf'{dim}[:\s]*\d+\D', re.IGNORECASE)
+        for dim in ('Style', 'Content', 'Naturalness', 'Personalization', 'Conversation')
+    ],
+    'binary': [re.compile(r'boxed\{[01]\}')]
+}
+
+
+def verdict_complete(kind: str, text: str) -> bool:
+    """评审输出是否已包含该格式的全部必需字段"""
+    return all(pattern.search(text) for pattern in VERDICT_PATTERNS[kind])
+
+
+def read_judge_stream(stream, kind: Optional[str]) -> Tuple[str, bool]:
+    """
+    逐块读取流式评审响应，必需字段齐全后立即关闭连接 (不再生成后续 token)
+
+    Returns:
+        (已生成的文本, 是否提前结束)
+    """
+    parts = []
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            # 字段都以 '}' 或换行结尾，只在这些位置检查
+            if kind is not None and ('}' in delta or '\n' in delta) and verdict_complete(kind, ''.join(parts)):
+                return ''.join(parts), True
+    finally:
+        stream.close()
+    return ''.join(parts), False
+
+
+def parse_max_tokens(spec: Optional[str]) -> Dict[str, int]:
+    """'alignment=400,binary=300' -> {'alignment': 400, 'binary': 300}"""
+    limits = {}
+    for item in (spec or '').replace(' ', ',').split(','):
+        if not item:
+            continue
+        kind, _, value = item.partition('=')
+        if kind not in VERDICT_PATTERNS or not value.isdigit():
+            raise ValueError(f"Invalid judge max_tokens '{item}' (expected alignment=N or binary=N)")
+        limits[kind] = int(value)
+    return limits
+
+
+def load_sessions(source) -> Iterator[Dict]:
+    """
+    逐行惰性读取 JSONL 会话
+
+    Args:
+        source: 文件路径，或已打开的文本流 (如 sys.stdin)
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from load_sessions(f)
+        return
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_spilled_sessions(spill_path: str, method: str) -> Iterator[Dict[str, Any]]:
+    """从流式评测的 spill 文件逐个读出某方法的会话结果 (final_results 中 sessions 的结构)"""
+    with open(spill_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = serialization.loads(line)
+            result = record['methods'].get(method)
+            if result and result['scores']:
+                yield {'session_id': record['session_id'], **result}
+
+
+def write_results(results: Dict[str, Any], path: str, compression: str = None) -> str:
+    """
+    写出最终结果 (紧凑 JSON，可压缩，见 serialization.py)，返回实际写入的文件路径
+
+    流式评测的结果 (含 sessions_file) 不在内存中保存会话明细，这里逐会话从 spill 文件读出写入，
+    输出结构与普通评测相同。
+    """
+    spill_path = results.get('sessions_file')
+    if not spill_path:
+        return serialization.save(results, path, compression)
+    # 按原键顺序逐段写出，methods 中每个方法的 sessions 在其余字段之后逐会话写入
+    dumps = serialization.dumps
+    with serialization.open_write(path, compression) as f:
+        f.write(b'{')
+        items = [(key, value) for key, value in results.items() if key != 'sessions_file']
+        for n, (key, value) in enumerate(items):
+            f.write((b',' if n else b'') + dumps(key) + b':')
+            if key != 'methods':
+                f.write(dumps(value))
+                continue
+            f.write(b'{')
+            for m, (method, data) in enumerate(value.items()):
+                fields = dumps({k: v for k, v in data.items() if k != 'sessions'})
+                f.write((b',' if m else b'') + dumps(method) + b':' + fields[:-1])
+                f.write((b',' if len(fields) > 2 else b'') + b'"sessions":[')
+                for i, session in enumerate(iter_spilled_sessions(spill_path, method)):
+                    f.write((b',' if i else b'') + dumps(session))
+                f.write(b']}')
+            f.write(b'}')
+        f.write(b'}')
+    return path + serialization.SUFFIXES[serialization.check_compression(compression)]
+
+
+# 指标定义的版本：calculate_metrics / _generate_radar_data / AL 曲线 / 二元对齐率的算法变化时递增，
+# 已有任务可用 recompute.py 按新定义重算 (不重新评审)；没有 metrics_version 的早期结果视为 0
+METRICS_VERSION = 3   # 2: 预览结果的 Slope / R2 等改为 curve_metrics (由估计的 AL 曲线计算)
+                      # 3: AL(k) 按轮次编号分组 (此前完整评测按会话内第 k 个评分)；预览的 N_k 按方法统计
+
+RADAR_DIMENSIONS = ['AVG', 'Slope', 'R2', 'Consistency', 'Improvement']
+TABLE_METRICS = ['AVG', 'Slope', 'R2', 'Improvement']
+
+
+def build_chart_payload(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    图表数据 (指标卡片、AL 曲线、雷达图、对比表)，前端直接渲染，无需遍历完整的 methods 结构
+    """
+    methods = results.get('methods', {})
+    names = list(methods)
+    estimate = bool(results.get('estimate'))
+
+    best_method = None
+    for method in names:
+        if best_method is None or methods[method]['metrics'].get('AVG', 0) > methods[best_method]['metrics'].get('AVG', 0):
+            best_method = method
+
+    # 预览结果只估计 AVG，其余表格指标取自估计 AL 曲线上的 curve_metrics (curve_based 中列出)
+    table_metrics = {m: {**methods[m].get('curve_metrics', {}), **methods[m]['metrics']} for m in names}
+    curve_based = [key for key in TABLE_METRICS
+                   if any(key in methods[m].get('curve_metrics', {}) and key not in methods[m]['metrics']
+                          for m in names)]
+    table_best = {
+        key: max((table_metrics[m].get(key) or 0 for m in names), default=0) for key in TABLE_METRICS
+    }
+    max_rounds = max((len(methods[m].get('al_curve', [])) for m in names), default=0)
+    radar_data = results.get('radar_data', {})
+
+    return {
+        'task_id': results.get('task_id'),
+        'total_sessions': results.get('total_sessions', 0),
+        'estimate': estimate,
+        'curve_based': curve_based,
+        'methods': names,
+        'best_method': best_method,
+        'cards': [{
+            'method': method,
+            'AVG': methods[method]['metrics'].get('AVG', 0),
+            'error': (methods[method].get('metrics_error') or {}).get('AVG') if estimate else None,
+            'best': method == best_method
+        } for method in names],
+        'al_curve': {
+            'labels': [f"Turn {k}" for k in range(1, max_rounds + 1)],
+            'series': [{'method': method, 'data': methods[method].get('al_curve', [])} for method in names]
+        },
+        'radar': {
+            'dimensions': RADAR_DIMENSIONS,
+            'series': [{'method': method, 'data': [radar_data[method].get(d, 0) for d in RADAR_DIMENSIONS]}
+                       for method in radar_data]
+        },
+        'table': [{
+            'method': method,
+            **{key: table_metrics[method].get(key) or 0 for key in TABLE_METRICS},
+            'binary_alignment_rate': methods[method].get('binary_alignment_rate', 0),
+            'best': [key for key in TABLE_METRICS if (table_metrics[method].get(key) or 0) == table_best[key]]
+        } for method in names]
+    }
+
+
+def write_chart_payload(results: Dict[str, Any], results_folder: str, compression: str = None) -> str:
+    """任务完成时写出 <task_id>_charts.json，返回实际写入的文件路径"""
+    path = os.path.join(results_folder, f"{results['task_id']}_charts.json")
+    return serialization.save(build_chart_payload(results), path, compression)
+
+
+def build_session_table(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    会话明细表：每个会话一行 (评测轮次数、各方法的平均分与二元对齐率，按 methods 顺序排列，未评测为 None)，
+    结果页按页加载，不需要传输逐轮 details
+    """
+    names = list(results.get('methods', {}))
+    spill_path = results.get('sessions_file')
+    rows: Dict[str, Dict[str, Any]] = {}
+    for i, method in enumerate(names):
+        sessions = iter_spilled_sessions(spill_path, method) if spill_path else \
+            results['methods'][method].get('sessions', [])
+        for s in sessions:
+            row = rows.get(s['session_id'])
+            if row is None:
+                row = rows[s['session_id']] = {'session_id': s['session_id'], 'rounds': 0,
+                                               'scores': [None] * len(names), 'binary': [None] * len(names)}
+            if s['scores']:
+                row['rounds'] = max(row['rounds'], len(s['scores']))
+                row['scores'][i] = round(sum(s['scores']) / len(s['scores']), 2)
+                row['binary'][i] = round(sum(s['binary']) / len(s['binary']) * 100, 1)
+    return {'task_id': results.get('task_id'), 'methods': names, 'rows': list(rows.values())}
+
+
+def write_session_table(results: Dict[str, Any], results_folder: str, compression: str = None) -> str:
+    """写出 <task_id>_session_table.json，返回实际写入的文件路径"""
+    path = os.path.join(results_folder, f"{results['task_id']}_session_table.json")
+    return serialization.save(build_session_table(results), path, compression)
+
+
+class JudgeCache:
+    """
+    评审结果持久化缓存 (JSONL 追加写入)
+
+    以 (judge_model, prompt, 生成参数) 的哈希为键，保存评审模型的原始输出，
+    重复评测同一份数据时直接命中缓存，不再调用 API。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry['key']] = entry['response']
+                    except (json.JSONDecodeError, KeyError):
+                        continue  # 忽略写入中断产生的残缺行
+
+    @staticmethod
+    def make_key(model: str, prompt: str, **params) -> str:
+        payload = json.dumps([model, prompt, params], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+
+    def put(self, key: str, response: str):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = response
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TaskContext:
+    """
+    单个评测任务的运行时状态
+
+    - memo: 任务内去重表 (LRU，最多 memo_limit 条)，相同 (prompt, 评审参数) 只调用一次评审模型；
+            memo_limit=None 时不淘汰 (批处理预先填入的结果必须全部保留)
+    - stats: 评审调用统计 (请求数 / 实际 API 调用数 / 去重与缓存命中数 / 增量复用轮次 / 重试、超时与对冲次数 /
+             流式提前结束与截断重评次数 / 生成字符数 / 预筛命中与启发式评分轮次 /
+             送入评审的历史 token 数与完整历史下的 token 数 / 历史摘要调用次数)；
+             api_calls 按逻辑请求计数 (每个未被去重 / 缓存 / 合并的请求记一次)，失败重试 (retries)、
+             端点池故障转移 (endpoints) 与对冲请求 (hedges_launched) 另行统计
+    - latencies: 每个实际评审请求的延迟 (对冲时为先返回者)；unhedged_latencies 为首发请求自身的延迟
+    - endpoints: 使用端点池时各端点的调用数 / 失败数 / 累计延迟
+    - collect: 非 None 时为收集模式，未命中的评审请求只记录 {key: 请求体} 而不实际调用 (批处理)
+    """
+
+    MEMO_LIMIT = 100_000
+
+    def __init__(self, task_id: str, memo_limit: Optional[int] = MEMO_LIMIT):
+        self.task_id = task_id
+        self.memo: "OrderedDict[str, str]" = OrderedDict()
+        self.memo_limit = memo_limit
+        self.collect: Optional[Dict[str, str]] = None
+        self.stats = {'requests': 0, 'api_calls': 0, 'dedup_hits': 0,
+                      'coalesced': 0, 'cache_hits': 0, 'reused_rounds': 0,
+                      'retries': 0, 'timeouts': 0, 'hedges_launched': 0, 'hedges_won': 0,
+                      'early_stops': 0, 'truncated_retries': 0, 'generated_chars': 0,
+                      'prescreened': 0, 'heuristic_rounds': 0, 'failed_rounds': 0,
+                      'history_tokens': 0, 'history_tokens_full': 0, 'summary_calls': 0}
+        self.latencies = array('d')
+        self.unhedged_latencies = array('d')
+        self.endpoints: Dict[str, List[float]] = {}
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + n
+
+    def record_latency(self, seconds: float, unhedged: Optional[float] = None):
+        """记录一个请求的延迟；unhedged 为首发请求的延迟 (对冲胜出时首发请求返回后才可得)"""
+        with self.lock:
+            if seconds is not None:
+                self.latencies.append(seconds)
+            if unhedged is not None:
+                self.unhedged_latencies.append(unhedged)
+
+    def record_endpoint(self, name: str, latency: Optional[float], error: Optional[BaseException]):
+        """端点池每次尝试的回调：成功时 latency 为延迟，失败时 error 为异常"""
+        with self.lock:
+            entry = self.endpoints.setdefault(name, [0, 0, 0.0])   # calls, errors, latency_sum
+            if error is None:
+                entry[0] += 1
+                entry[2] += latency
+            else:
+                entry[1] += 1
+            if isinstance(error, openai.APITimeoutError):
+                self.stats['timeouts'] += 1
+
+    def recall(self, key: str) -> Optional[str]:
+        with self.lock:
+            value = self.memo.get(key)
+            if value is not None:
+                self.memo.move_to_end(key)
+            return value
+
+    def remember(self, key: str, value: str):
+        with self.lock:
+            self.memo[key] = value
+            self.memo.move_to_end(key)
+            if self.memo_limit is not None and len(self.memo) > self.memo_limit:
+                self.memo.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            stats = dict(self.stats)
+            p50, p99 = percentile(self.latencies, 0.5), percentile(self.latencies, 0.99)
+            unhedged_p99 = percentile(self.unhedged_latencies, 0.99)
+            endpoints = {name: list(entry) for name, entry in self.endpoints.items()}
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        # requests = api_calls + dedup_hits + cache_hits + coalesced
+        stats['calls_saved'] = stats['requests'] - stats['api_calls']
+        if stats['history_tokens_full']:
+            stats['history_token_savings'] = round(1 - stats['history_tokens'] / stats['history_tokens_full'], 4)
+        if p99 is not None:
+            stats['latency_p50'] = round(p50, 3)
+            stats['latency_p99'] = round(p99, 3)
+        if p99 is not None and unhedged_p99 is not None:
+            # 任务结束时仍未返回的落败请求不计入，unhedged p99 因此偏低，改善幅度是保守估计
+            stats['latency_p99_unhedged'] = round(unhedged_p99, 3)
+            stats['p99_improvement'] = round(unhedged_p99 - p99, 3)
+        if endpoints:
+            stats['endpoints'] = {name: {
+                'calls': calls,
+                'errors': errors,
+                'avg_latency': round(latency_sum / calls, 3) if calls else None,
+                'throughput': round(calls / elapsed, 3)   # 每秒成功调用数
+            } for name, (calls, errors, latency_sum) in endpoints.items()}
+        return stats
+
+
+class MethodResults:
+    """
+    单个方法的紧凑评测结果 (按列存储)
+
+    每轮评分存入定长数组列 (分数 / 二元 / 轮次 / 5 维细分 / 8 字节指纹)，会话边界记录在 offsets 中，
+    少数本地评分轮次的来源 (source) 稀疏存放在 sources 中，
+    避免为每一轮保存一个 dict 及其细分 dict。只在序列化时 (iter_sessions / to_dict / write_json)
+    还原为 {'session_id', 'scores', 'binary', 'details': [...]} 结构。
+    """
+
+    __slots__ = ('session_ids', 'offsets', 'scores', 'binary', 'rounds',
+                 'breakdowns', 'fingerprints', 'reasoning', 'sources')
+
+    def __init__(self):
+        self.session_ids: List[str] = []
+        self.offsets = array('l', [0])      # 第 i 个会话的评分位于 [offsets[i], offsets[i+1])
+        self.scores = array('h')
+        self.binary = array('b')
+        self.rounds = array('h')
+        self.breakdowns = array('b')        # 每轮 len(BREAKDOWN_KEYS) 个值，-1 表示缺失
+        self.fingerprints = bytearray()     # 每轮 8 字节，全 0 表示缺失
+        self.reasoning: List[Optional[str]] = []
+        self.sources: Dict[int, str] = {}   # 轮次下标 -> 本地评分来源
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+    def add_session(self, session_id: str, scores: List[int], binary: List[int], details: List[Dict]):
+        for idx, (score, b, detail) in enumerate(zip(scores, binary, details)):
+            self.scores.append(score)
+            self.binary.append(b)
+            self.rounds.append(detail.get('round', idx + 1))
+            breakdown = detail.get('breakdown') or {}
+            self.breakdowns.extend(breakdown.get(k, -1) for k in BREAKDOWN_KEYS)
+            fingerprint = detail.get('fingerprint')
+            self.fingerprints += bytes.fromhex(fingerprint) if fingerprint else bytes(8)
+            self.reasoning.append(detail.get('reasoning'))
+            if detail.get('source'):
+                self.sources[len(self.scores) - 1] = detail['source']
+        self.session_ids.append(session_id)
+        self.offsets.append(len(self.scores))
+
+    def _detail(self, i: int) -> Dict[str, Any]:
+        detail = {'round': self.rounds[i], 'score': self.scores[i]}
+        values = self.breakdowns[i * len(BREAKDOWN_KEYS):(i + 1) * len(BREAKDOWN_KEYS)]
+        if any(v >= 0 for v in values):
+            detail['breakdown'] = {k: v for k, v in zip(BREAKDOWN_KEYS, values) if v >= 0}
+        detail['binary'] = self.binary[i]
+        if self.reasoning[i] is not None:
+            detail['reasoning'] = self.reasoning[i]
+        fingerprint = self.fingerprints[i * 8:(i + 1) * 8]
+        if any(fingerprint):
+            detail['fingerprint'] = fingerprint.hex()
+        if i in self.sources:
+            detail['source'] = self.sources[i]
+        return detail
+
+    def iter_sessions(self) -> Iterator[Dict[str, Any]]:
+        """逐个还原会话结果 (JSON 结构)"""
+        for n, session_id in enumerate(self.session_ids):
+            start, end = self.offsets[n], self.offsets[n + 1]
+            yield {
+                'session_id': session_id,
+                'scores': self.scores[start:end].tolist(),
+                'binary': self.binary[start:end].tolist(),
+                'details': [self._detail(i) for i in range(start, end)]
+            }
+
+    def round_means(self) -> List[float]:
+        """按轮次编号 (detail['round']，对话中的第 k 轮) 求平均，即 AL(k) 曲线；与预览的分层估计使用同一 k"""
+        sums, counts = {}, {}
+        for k, score in zip(self.rounds, self.scores):
+            sums[k] = sums.get(k, 0) + score
+            counts[k] = counts.get(k, 0) + 1
+        return [sums[k] / counts[k] for k in sorted(sums)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'all_scores': self.scores.tolist(),
+            'all_binary': self.binary.tolist(),
+            'sessions': list(self.iter_sessions())
+        }
+
+    def write_json(self, f):
+        """把 to_dict() 的结构逐会话写入二进制流，不在内存中构建完整对象"""
+        f.write(b'{"all_scores":' + serialization.dumps(self.scores.tolist()))
+        f.write(b',"all_binary":' + serialization.dumps(self.binary.tolist()))
+        f.write(b',"sessions":[')
+        for n, session in enumerate(self.iter_sessions()):
+            f.write((b',' if n else b'') + serialization.dumps(session))
+        f.write(b']}')
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MethodResults':
+        results = cls()
+        for s in data.get('sessions', []):
+            results.add_session(s['session_id'], s['scores'], s['binary'], s.get('details', []))
+        return results
+
+
+class RunningMetrics:
+    """
+    calculate_metrics 的增量版本：只保存求和量 (n, Σk, Σk², Σy, Σy², Σky, 最小/最大/首/末值)，
+    以及按轮次编号的 AL(k) 求和与二元计数；内存占用与会话数量无关。
+    """
+
+    __slots__ = ('n', 'sum_k', 'sum_k2', 'sum_y', 'sum_y2', 'sum_ky', 'min', 'max', 'first', 'last',
+                 'binary_sum', 'round_sums', 'round_counts')
+
+    def __init__(self):
+        self.n = self.sum_k = self.sum_k2 = self.sum_y = self.sum_y2 = self.sum_ky = 0
+        self.min = self.max = self.first = self.last = None
+        self.binary_sum = 0
+        self.round_sums: Dict[int, float] = {}
+        self.round_counts: Dict[int, int] = {}
+
+    def add_session(self, scores: List[int], binary: List[int], rounds: List[int]):
+        """rounds: 各评分的轮次编号 (details 中的 round)"""
+        for y, round_number in zip(scores, rounds):
+            self.n += 1
+            k = self.n  # 与 calculate_metrics 一致：k 为展开后分数列表中的序号
+            self.sum_k += k
+            self.sum_k2 += k * k
+            self.sum_y += y
+            self.sum_y2 += y * y
+            self.sum_ky += k * y
+            self.min = y if self.min is None else min(self.min, y)
+            self.max = y if self.max is None else max(self.max, y)
+            if self.first is None:
+                self.first = y
+            self.last = y
+            self.round_sums[round_number] = self.round_sums.get(round_number, 0) + y
+            self.round_counts[round_number] = self.round_counts.get(round_number, 0) + 1
+        self.binary_sum += sum(binary)
+
+    def metrics(self) -> Dict[str, float]:
+        """与 calculate_metrics(完整分数列表) 相同的指标"""
+        n = self.n
+        avg = self.sum_y / n
+        if n > 1:
+            # 线性回归的中心化平方和 (乘以 n 后为整数运算，避免大 n 时的精度损失)
+            sxx = n * self.sum_k2 - self.sum_k ** 2
+            sxy = n * self.sum_ky - self.sum_k * self.sum_y
+            syy = n * self.sum_y2 - self.sum_y ** 2
+            b = sxy / sxx
+            a = (self.sum_y - b * self.sum_k) / n
+            r_den = math.sqrt(sxx) * math.sqrt(max(syy, 0))
+            r = max(-1.0, min(1.0, sxy / r_den)) if r_den > 0 else 0.0
+            r2 = r ** 2
+        else:
+            b = 0.0
+            a = float(self.first)
+            r2 = 0.0
+        
+        al_min, al_max = float(self.min), float(self.max)
+        al_range = al_max - al_min
+        n_al_avg = (avg - al_min) / al_range if al_range > 0 else 0.5
+        
+        if n >= 2:
+            improvement = float(self.last - self.first)
+            improvement_rate = improvement / self.first * 100 if self.first > 0 else 0
+        else:
+            improvement = 0.0
+            improvement_rate = 0.0
+        
+        return {
+            'AVG': round(avg, 2),
+            'Slope': round(b, 4),
+            'Intercept': round(a, 2),
+            'R2': round(r2, 4),
+            'N_AL_Avg': round(n_al_avg, 4),
+            'AL_Min': round(al_min, 2),
+            'AL_Max': round(al_max, 2),
+            'Improvement': round(improvement, 2),
+            'Improvement_Rate': round(improvement_rate, 2)
+        }
+
+    def al_curve(self) -> List[float]:
+        return [round(self.round_sums[k] / self.round_counts[k], 2) for k in sorted(self.round_sums)]
+
+
+class StreamingResults:
+    """
+    流式评测结果：每个会话的完整结果按完成顺序追加到 spill 文件 (JSONL)，内存中只保留 RunningMetrics
+    与已完成的 session_id 集合。
+
+    spill 文件同时充当断点 (与 checkpoint 的 completed_sessions 语义相同)：恢复时读入全部记录计入统计量，
+    按 session_id 集合跳过已完成的会话；评测出错的会话不写入 spill，恢复时只重新评测这些会话，
+    其结果追加在末尾。末尾不完整的行 (写入中途退出) 被截断。
+    """
+
+    def __init__(self, spill_path: str, methods: List[str]):
+        self.spill_path = spill_path
+        self.methods = methods
+        self.aggregates = {method: RunningMetrics() for method in methods}
+        self.completed = 0
+        self._done = set()
+        self._writer = None
+        if os.path.exists(spill_path):
+            self._load()
+            print(f"Resuming from {spill_path}: {self.completed} sessions already completed")
+
+    def _load(self):
+        valid = 0
+        with open(self.spill_path, 'r+', encoding='utf-8') as f:
+            for line in iter(f.readline, ''):
+                try:
+                    record = serialization.loads(line) if line.endswith('\n') else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    break
+                self._done.add(record['session_id'])
+                self._accumulate(record['methods'])
+                valid = f.tell()
+            f.truncate(valid)
+
+    def skip(self, session_id: str) -> bool:
+        """断点恢复：session_id 已在 spill 中时返回 True (统计量在打开时已计入)"""
+        return session_id in self._done
+
+    def _accumulate(self, session_results: Dict[str, Dict]):
+        for method in self.methods:
+            result = session_results.get(method)
+            if result and result['scores']:
+                self.aggregates[method].add_session(result['scores'], result['binary'],
+                                                    [detail['round'] for detail in result['details']])
+        self.completed += 1
+
+    def add(self, session_id: str, session_results: Dict[str, Dict]):
+        if self._writer is None:
+            self._writer = open(self.spill_path, 'a', encoding='utf-8')
+        self._writer.write(serialization.dumps({'session_id': session_id, 'methods': session_results})
+                           .decode('utf-8') + '\n')
+        self._writer.flush()
+        self._done.add(session_id)
+        self._accumulate(session_results)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+
+
+class SequentialComparison:
+    """
+    序贯配对比较：候选方法 vs 基线方法
+
+    以会话为单位计算配对差值 d = mean(候选得分) - mean(基线得分)，在线更新均值/方差 (Welford)。
+    每评测一个会话都检查一次停止条件，普通的 t 区间在这种反复检查下会虚高显著率
+    (两方法无差异时约 1/3 的运行会提前停止并报告显著)，因此改用随时有效 (anytime-valid) 的
+    渐近置信序列 (Waudby-Smith et al., "Time-uniform central limit theory")：
+        half_width = sqrt(2 (n s² ρ² + 1) / (n² ρ²) · log(sqrt(n s² ρ² + 1) / alpha))
+    在任意停止时刻都以 1 - alpha 的概率覆盖真实差值。ρ 按计划的最大会话数 max_sessions 调优
+    (该处区间最窄)；p 值为与之对应的随时有效 p 值。多个候选方法时对 alpha 做 Bonferroni 校正。
+    """
+
+    SEQUENTIAL_METHOD = 'asymptotic confidence sequence'
+
+    def __init__(self, baseline: str, candidates: List[str], alpha: float = 0.05,
+                 precision: Optional[float] = None, min_sessions: int = 10,
+                 max_sessions: Optional[int] = None):
+        self.baseline = baseline
+        self.candidates = candidates
+        self.alpha = alpha
+        self.precision = precision
+        self.min_sessions = min_sessions
+        self.max_sessions = max(max_sessions or 0, min_sessions, 2)
+        # ρ² 使 n = max_sessions 处的边界最紧
+        log_term = -2 * math.log(self._corrected_alpha())
+        self._rho2 = (log_term + math.log(log_term + 1)) / self.max_sessions
+        self._acc = {m: [0, 0.0, 0.0] for m in candidates}  # n, mean, M2
+
+    def _corrected_alpha(self) -> float:
+        return self.alpha / max(1, len(self.candidates))
+
+    def add(self, session_results: Dict[str, Dict]):
+        """加入一个会话的评测结果 (evaluate_session 的返回格式)"""
+        base_scores = session_results.get(self.baseline, {}).get('scores')
+        if not base_scores:
+            return
+        base_mean = sum(base_scores) / len(base_scores)
+        for method in self.candidates:
+            scores = session_results.get(method, {}).get('scores')
+            if not scores:
+                continue
+            diff = sum(scores) / len(scores) - base_mean
+            acc = self._acc[method]
+            acc[0] += 1
+            delta = diff - acc[1]
+            acc[1] += delta / acc[0]
+            acc[2] += delta * (diff - acc[1])
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        alpha = self._corrected_alpha()
+        result = {}
+        for method, (n, mean, m2) in self._acc.items():
+            if n < 2:
+                result[method] = {'n': n, 'mean_diff': round(mean, 3), 'ci_low': None, 'ci_high': None,
+                                  'half_width': None, 'p_value': None, 'significant': False}
+                continue
+            scale = n * (m2 / (n - 1)) * self._rho2 + 1
+            half_width = math.sqrt(2 * scale / (n * n * self._rho2) * math.log(math.sqrt(scale) / alpha))
+            p_value = min(1.0, math.sqrt(scale) * math.exp(-mean * mean * n * n * self._rho2 / (2 * scale)))
+            result[method] = {
+                'n': n,
+                'mean_diff': round(mean, 3),
+                'ci_low': round(mean - half_width, 3),
+                'ci_high': round(mean + half_width, 3),
+                'half_width': round(half_width, 3),
+                'p_value': round(p_value, 6),
+                'significant': p_value < alpha
+            }
+        return result
+
+    def settled(self) -> bool:
+        """每个候选方法都已显著，或置信区间半宽达到精度目标"""
+        summary = self.summary()
+        for method in self.candidates:
+            comp = summary[method]
+            if comp['n'] < self.min_sessions:
+                return False
+            precise = self.precision is not None and comp['half_width'] is not None \
+                and comp['half_width'] <= self.precision
+            if not (comp['significant'] or precise):
+                return False
+        return True
+
+
 class BenchmarkEvaluator:
     """
     PersonaSteer Benchmark 评估器
@@ -174,21 +879,188 @@ class BenchmarkEvaluator:
     2. 二元判断 (0/1): 用于严格对齐率
     """
     
-    def __init__(self, judge_model: str = "gpt-4o-mini"):
+    def __init__(self, judge_model: str = "gpt-4o-mini", max_workers: int = 8,
+                 cache: Optional[JudgeCache] = None, compression: Optional[str] = None,
+                 judge_concurrency: Optional[int] = None, judge_timeout: Optional[float] = None,
+                 hedge_budget: Optional[float] = None, hedge_quantile: float = 0.95,
+                 judge_pool: Optional[JudgePool] = None, stream_judge: Optional[bool] = None,
+                 judge_max_tokens: Optional[Dict[str, int]] = None, scoring: Optional[str] = None,
+                 history: Optional[str] = None):
         self.judge_model = judge_model
-        self.max_workers = 8
+        # 评分方式 (默认取 PERSONASTEER_SCORING)：llm 全部由评审模型打分；prescreen 先用本地规则
+        # 判定明显不合格的响应，其余交给评审模型；heuristic 完全离线的启发式近似评分
+        self.scoring = scoring or os.environ.get('PERSONASTEER_SCORING') or 'llm'
+        if self.scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{self.scoring}' (expected one of {', '.join(SCORING_MODES)})")
+        # 评审提示词中的历史策略 (默认取 PERSONASTEER_HISTORY)：full / window:N / budget:TOKENS / summary:N，
+        # 见 history.py；启发式评分不读取历史，始终为 full
+        self.history = parse_history_strategy(
+            'full' if self.scoring == 'heuristic' else history or os.environ.get('PERSONASTEER_HISTORY'))
+        name, n = self.history
+        self.history_spec = name if name == 'full' else f"{name}:{n}"
+        self._summaries = SummaryStore()
+        # 流式评审：必需字段齐全后立即停止生成 (默认取 PERSONASTEER_JUDGE_STREAM)
+        if stream_judge is None:
+            stream_judge = os.environ.get('PERSONASTEER_JUDGE_STREAM', '').lower() in ('1', 'true', 'yes')
+        self.stream_judge = stream_judge
+        # 各提示词格式的生成上限：显式指定 > PERSONASTEER_JUDGE_MAX_TOKENS > 流式评审时的收紧上限 > 600
+        if judge_max_tokens is None:
+            judge_max_tokens = parse_max_tokens(os.environ.get('PERSONASTEER_JUDGE_MAX_TOKENS')) or \
+                (dict(TUNED_JUDGE_MAX_TOKENS) if stream_judge else {})
+        self.judge_max_tokens = judge_max_tokens
+        self.max_workers = max_workers
+        self.cache = cache
+        # 多端点评审池 (默认取 PERSONASTEER_JUDGE_POOL)；未配置时使用单个 client
+        self.pool = judge_pool if judge_pool is not None else JudgePool.from_env()
+        # 尾延迟控制：单次调用超时 (默认 PERSONASTEER_JUDGE_TIMEOUT)；
+        # hedge_budget > 0 时启用对冲请求 (None 时取 PERSONASTEER_HEDGE_BUDGET，0 为关闭)
+        self.judge_timeout = judge_timeout or judge_timeout_from_env()
+        if hedge_budget is None:
+            self.hedge = HedgePolicy.from_env()
+        else:
+            self.hedge = HedgePolicy(hedge_budget, hedge_quantile) if hedge_budget > 0 else None
+        # 全局评审调度：所有任务共享 judge_concurrency 个并发调用槽位 (加权公平、可取消)
+        # 默认取 PERSONASTEER_JUDGE_CONCURRENCY，未设置时等于端点池总并发 (无端点池时为 max_workers)
+        self.scheduler = JudgeScheduler(
+            judge_concurrency or int(os.environ.get('PERSONASTEER_JUDGE_CONCURRENCY', 0))
+            or (self.pool.capacity if self.pool is not None else max_workers)
+        )
+        # checkpoint 文件的压缩方式 (none / gzip / zstd)，默认取 PERSONASTEER_COMPRESSION
+        self.compression = serialization.check_compression(compression)
+        # 跨任务的在途请求表 (single-flight)：并发任务中相同的评审请求只发送一次
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
     
-    def call_llm_judge(self, prompt: str, max_retries: int = 3) -> str:
-        """调用 LLM API 进行评估 (使用 OpenAI SDK)"""
+    @property
+    def settings(self) -> Dict[str, str]:
+        """决定评分结果的评审配置 (工作队列在提交任务时记录，worker 与汇总按它评测)"""
+        return {'judge_model': self.judge_model, 'scoring': self.scoring, 'history': self.history_spec}
+    
+    def configured(self, judge_model: Optional[str] = None, scoring: Optional[str] = None,
+                   history: Optional[str] = None) -> 'BenchmarkEvaluator':
+        """
+        按给定评审配置派生的评估器；未指定的项沿用当前值。
+        派生实例与原实例共享调度器、缓存、端点池与在途请求表。
+        """
+        if (judge_model or self.judge_model, scoring or self.scoring, history or self.history_spec) == \
+                (self.judge_model, self.scoring, self.history_spec):
+            return self
+        derived = copy.copy(self)
+        derived.judge_model = judge_model or self.judge_model
+        derived.scoring = scoring or self.scoring
+        if derived.scoring not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode '{derived.scoring}' (expected one of {', '.join(SCORING_MODES)})")
+        derived.history = parse_history_strategy(
+            'full' if derived.scoring == 'heuristic' else history or self.history_spec)
+        name, n = derived.history
+        derived.history_spec = name if name == 'full' else f"{name}:{n}"
+        return derived
+    
+    def call_llm_judge(self, prompt: str, max_retries: int = 3,
+                       ctx: Optional[TaskContext] = None, kind: Optional[str] = None) -> str:
+        """
+        调用 LLM API 进行评估 (使用 OpenAI SDK)
+        
+        kind 为提示词格式 ('alignment' / 'binary')，决定生成上限与流式评审的必需字段；
+        收紧的上限截断了结论时按默认上限重新评审一次。
+        """
+        max_tokens = self.judge_max_tokens.get(kind, DEFAULT_JUDGE_MAX_TOKENS)
+        content = self._judge(prompt, {'max_tokens': max_tokens, 'temperature': 0.1}, max_retries, ctx, kind)
+        if kind is not None and content and max_tokens < DEFAULT_JUDGE_MAX_TOKENS \
+                and not verdict_complete(kind, content):
+            if ctx is not None:
+                ctx.count('truncated_retries')
+            content = self._judge(prompt, {'max_tokens': DEFAULT_JUDGE_MAX_TOKENS, 'temperature': 0.1},
+                                  max_retries, ctx, kind)
+        return content
+    
+    def _judge(self, prompt: str, params: Dict[str, Any], max_retries: int,
+               ctx: Optional[TaskContext], kind: Optional[str], collect: bool = True) -> str:
+        """
+        去重顺序：任务内 memo → 持久化缓存 → 跨任务在途请求合并 → 实际调用
+
+        collect=False 的请求在批处理收集阶段也实时调用 (后续评审提示词依赖其结果，如历史摘要)
+        """
+        key = JudgeCache.make_key(self.judge_model, prompt, **params)
+        if ctx is not None:
+            ctx.count('requests')
+            memo = ctx.recall(key)
+            if memo is not None:
+                ctx.count('dedup_hits')
+                return memo
+        
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                if ctx is not None:
+                    ctx.count('cache_hits')
+                    ctx.remember(key, cached)
+                return cached
+        
+        if collect and ctx is not None and ctx.collect is not None:
+            ctx.collect[key] = self._judge_body(prompt, params)
+            return ""
+        
+        content = self._single_flight(key, lambda: self._request_judge(prompt, params, max_retries, ctx, kind), ctx)
+        if self.cache is not None:
+            self.cache.put(key, content)
+        if ctx is not None:
+            ctx.remember(key, content)
+        return content
+    
+    def _single_flight(self, key: str, fn: Callable[[], str], ctx: Optional[TaskContext]) -> str:
+        """相同 key 的并发请求只执行一次，其余调用方等待并共享结果"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not leader:
+            if ctx is not None:
+                ctx.count('coalesced')
+            try:
+                return future.result()
+            except TaskCancelled:
+                # 发起请求的任务被取消：本任务未取消时自行重新发起
+                if ctx is not None and self.scheduler.is_cancelled(ctx.task_id):
+                    raise
+                if ctx is not None:
+                    ctx.count('coalesced', -1)   # 没有共享到结果，改由下面的调用计数
+                return self._single_flight(key, fn, ctx)
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def _judge_body(self, prompt: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """评审请求体 (实时调用与批处理文件共用)"""
+        return {'model': self.judge_model, 'messages': [{"role": "user", "content": prompt}], **params}
+    
+    def _request_judge(self, prompt: str, params: Dict[str, Any], max_retries: int,
+                       ctx: Optional[TaskContext], kind: Optional[str] = None) -> str:
+        """实际发送评审请求 (带指数退避重试；每次尝试有超时，启用时对慢请求发送对冲请求)"""
+        body = self._judge_body(prompt, params)
+        if ctx is not None:
+            ctx.count('api_calls')
         for attempt in range(max_retries):
+            if attempt and ctx is not None:
+                ctx.count('retries')
             try:
-                response = client.chat.completions.create(
-                    model=self.judge_model,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=600,
-                    temperature=0.1
-                )
-                return response.choices[0].message.content
+                if self.hedge is not None:
+                    return self._hedged_call(body, ctx, kind)
+                content, latency = self._timed_call(body, ctx, kind)
+                if ctx is not None:
+                    ctx.record_latency(latency, latency)
+                return content
             except Exception as e:
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)
@@ -197,18 +1069,113 @@ class BenchmarkEvaluator:
                     raise e
         return ""
     
+    def _timed_call(self, body: Dict[str, Any], ctx: Optional[TaskContext], kind: Optional[str] = None,
+                    started: Optional[threading.Event] = None):
+        """
+        占用一个调度槽位发送一次请求，返回 (内容, 延迟秒数)；started 在请求真正发出时置位
+        
+        流式评审时逐块读取，kind 格式的必需字段齐全后立即关闭连接。
+        """
+        reader = None
+        if self.stream_judge:
+            def reader(stream):
+                content, early = read_judge_stream(stream, kind)
+                if early and ctx is not None:
+                    ctx.count('early_stops')
+                return content
+        
+        # 退避等待期间不占用槽位
+        with self.scheduler.slot(ctx.task_id if ctx is not None else None):
+            if started is not None:
+                started.set()
+            start = time.monotonic()
+            if self.pool is not None:
+                # 端点池内部完成路由、故障转移与超时统计
+                content, _ = self.pool.complete(body, self.judge_timeout, reader=reader,
+                                                on_attempt=ctx.record_endpoint if ctx is not None else None)
+            else:
+                try:
+                    if reader is not None:
+                        content = reader(client.chat.completions.create(**body, stream=True,
+                                                                        timeout=self.judge_timeout))
+                    else:
+                        response = client.chat.completions.create(**body, timeout=self.judge_timeout)
+                        content = response.choices[0].message.content
+                except openai.APITimeoutError:
+                    # 超时作用于每次 HTTP 尝试；SDK 自身的重试仍然全部超时才会到这里
+                    if ctx is not None:
+                        ctx.count('timeouts')
+                    raise
+            latency = time.monotonic() - start
+        if ctx is not None:
+            ctx.count('generated_chars', len(content or ''))
+        if self.hedge is not None:
+            self.hedge.latencies.add(latency)
+        return content, latency
+    
+    def _hedged_call(self, body: Dict[str, Any], ctx: Optional[TaskContext], kind: Optional[str] = None) -> str:
+        """
+        对冲请求：首发请求超过 p95 延迟仍未返回且预算允许时，再发送一个相同请求，取先成功返回者
+        
+        两个请求各自占用调度槽位；落败的请求在后台跑完 (受超时限制)，其结果被丢弃。
+        """
+        started = threading.Event()
+        primary = run_in_thread(self._timed_call, body, ctx, kind, started)
+        # 从首发请求真正发出 (拿到槽位) 时开始计时，排队时间不触发对冲
+        primary.add_done_callback(lambda _: started.set())
+        started.wait()
+        start = time.monotonic()
+        self.hedge.record_request()
+        delay = self.hedge.delay()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.hedge.try_acquire():
+            content, latency = primary.result()
+            if ctx is not None:
+                ctx.record_latency(latency, latency)
+            return content
+        
+        if ctx is not None:
+            ctx.count('hedges_launched')
+            # 首发请求最终返回 (或失败) 时记录其自身延迟，用于估计不对冲时的 p99
+            primary.add_done_callback(lambda _: ctx.record_latency(None, time.monotonic() - start))
+        hedge = run_in_thread(self._timed_call, body, ctx, kind)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None:
+                if ctx is not None:
+                    if winner is hedge:
+                        ctx.count('hedges_won')
+                    ctx.record_latency(time.monotonic() - start)
+                return winner.result()[0]
+            error = next(iter(done)).exception()
+        raise error
+    
+    def cancel(self, task_id: str) -> bool:
+        """
+        协作式取消：立即停止为该任务发放评审调用，评测循环停止提交新会话，
+        保留断点后抛出 TaskCancelled (用相同 task_id 续评)。返回任务是否在本进程中运行
+        """
+        return self.scheduler.cancel(task_id)
+    
     def build_history_string(self, conversations: List[Dict], up_to_round: int, 
-                               current_method: str = None) -> str:
+                               current_method: str = None, ctx: Optional[TaskContext] = None,
+                               strategy: Optional[Tuple[str, int]] = None) -> str:
         """
         构建对话历史字符串
         
         格式遵循评估提示词要求:
         You: <用户消息>, Other: <AI响应>, ...
+        
+        strategy 默认为评估器的历史策略 (self.history)；summary 策略的摘要调用计入 ctx
         """
         if up_to_round <= 0:
-            return "(No previous conversation)"
+            return NO_HISTORY
         
         history_parts = []
+        user_messages = []
         for i, conv in enumerate(conversations[:up_to_round]):
             user_msg = conv.get('user_message', conv.get('user', ''))
             # 获取助手响应 - 支持多种格式
@@ -228,13 +1195,32 @@ class BenchmarkEvaluator:
             else:
                 assistant_msg = ''
             
-            history_parts.append(f"You: \"{user_msg}\", Other: \"{assistant_msg}\"")
+            history_parts.append(format_round(user_msg, assistant_msg))
+            user_messages.append(user_msg)
         
+        name, n = strategy or self.history
+        if name == 'window':
+            return window_history(history_parts, n)
+        if name == 'budget':
+            return budget_history(history_parts, n)
+        if name == 'summary' and up_to_round >= 2 * n:
+            # 最近 n 到 2n-1 轮保留原文，之前的轮次 (n 的整数倍) 折叠为滚动摘要
+            folded = (up_to_round - n) // n * n
+            summary = rolling_summary(user_messages, folded, n, self._summaries, self.judge_model,
+                                      lambda prompt: self._summarize(prompt, ctx))
+            return ", ".join([f"[Summary of rounds 1-{folded}: {summary}]"] + history_parts[folded:])
         return ", ".join(history_parts)
     
+    def _summarize(self, prompt: str, ctx: Optional[TaskContext]) -> str:
+        """生成一段历史摘要 (经过评审缓存；批处理收集阶段也实时调用)"""
+        if ctx is not None:
+            ctx.count('summary_calls')
+        return self._judge(prompt, {'max_tokens': SUMMARY_MAX_TOKENS, 'temperature': 0}, 3, ctx, None,
+                           collect=False)
+    
     def evaluate_alignment_score(self, profile: str, personality: str,
                                   history: str, user_message: str, 
-                                  response: str) -> Dict[str, Any]:
+                                  response: str, ctx: Optional[TaskContext] = None) -> Dict[str, Any]:
         """
         细粒度对齐评分 (0-100)
         
@@ -252,7 +1238,7 @@ class BenchmarkEvaluator:
         )
         
         try:
-            llm_response = self.call_llm_judge(prompt)
+            llm_response = self.call_llm_judge(prompt, ctx=ctx, kind='alignment')
             return self.parse_alignment_score(llm_response)
         except Exception as e:
             print(f"Evaluation error: {e}")
@@ -260,12 +1246,13 @@ class BenchmarkEvaluator:
                 'total': 50,
                 'breakdown': {'style': 10, 'content': 10, 'naturalness': 10, 
                              'personalization': 10, 'conversation': 10},
-                'reasoning': 'Evaluation failed'
+                'reasoning': 'Evaluation failed',
+                'failed': True
             }
     
     def evaluate_binary(self, profile: str, personality: str,
                         history: str, user_message: str, 
-                        response: str) -> Dict[str, Any]:
+                        response: str, ctx: Optional[TaskContext] = None) -> Dict[str, Any]:
         """
         二元对齐判断 (0 或 1)
         
@@ -282,11 +1269,11 @@ class BenchmarkEvaluator:
         )
         
         try:
-            llm_response = self.call_llm_judge(prompt)
+            llm_response = self.call_llm_judge(prompt, ctx=ctx, kind='binary')
             return self.parse_binary_result(llm_response)
         except Exception as e:
             print(f"Binary evaluation error: {e}")
-            return {'result': 0, 'reasoning': 'Evaluation failed'}
+            return {'result': 0, 'reasoning': 'Evaluation failed', 'failed': True}
     
     def parse_alignment_score(self, response: str) -> Dict[str, Any]:
         """解析细粒度评分结果"""
@@ -401,10 +1388,12 @@ class BenchmarkEvaluator:
         # 线性回归: argmin_{b,a} Σ(b×k + a - AL(k))²
         # 求解得到斜率 b (Slope) 和截距 a (Intercept)
         if len(al) > 1:
+            from scipy import stats  # 延迟导入，缩短命令行启动时间
             slope, intercept, r_value, p_value, std_err = stats.linregress(k, al)
             b = float(slope)        # 斜率 - 改进趋势
             a = float(intercept)    # 截距 - 初始水平
-            r2 = float(r_value ** 2)  # R² - 拟合优度
+            # R² - 拟合优度；AL 恒定时 r 无定义，与 RunningMetrics 一致记为 0
+            r2 = float(r_value ** 2) if np.isfinite(r_value) else 0.0
         else:
             b = 0.0
             a = float(al[0]) if len(al) > 0 else 0.0
@@ -443,8 +1432,69 @@ class BenchmarkEvaluator:
             'Improvement_Rate': round(improvement_rate, 2)  # 改进率 %
         }
     
-    def evaluate_session(self, session: Dict, methods: List[str]) -> Dict[str, Any]:
-        """评估单个会话的所有方法"""
+    def round_fingerprint(self, profile: str, personality: str, history: str,
+                          user_message: str, response: str, scorer: Optional[str] = None,
+                          history_spec: str = 'full') -> str:
+        """
+        评审输入指纹：输入不变 (且评审模型不变) 时可直接复用历史评分
+
+        history 为原始完整历史 (不经过历史策略，不含评审模型生成的摘要)，history_spec 为历史策略：
+        同一输入在任何进程中得到相同指纹。full 策略的指纹与引入历史策略之前的结果兼容。
+        scorer 默认为评审模型；启发式评分的轮次使用 HEURISTIC_SCORER，不会被当作 LLM 评分复用
+        """
+        fields = [scorer or self.judge_model, profile, personality, history, user_message, response]
+        if history_spec != 'full':
+            fields.append(history_spec)
+        payload = json.dumps(fields, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def index_prior_results(results: Dict[str, Any]) -> Dict[str, Dict[str, Dict[int, Dict]]]:
+        """
+        把历史任务结果整理为 {session_id: {method: {round: detail}}}，用于增量评测
+
+        评审失败后记为默认分数的轮次 (source 为 failed；旧结果中 reasoning 为 'Evaluation failed') 不复用
+        """
+        index = {}
+        for method, data in results.get('methods', {}).items():
+            for s in data.get('sessions', []):
+                rounds = index.setdefault(s['session_id'], {}).setdefault(method, {})
+                for detail in s.get('details', []):
+                    if detail.get('fingerprint') and detail.get('source') != 'failed' \
+                            and detail.get('reasoning') != 'Evaluation failed':
+                        rounds[detail['round']] = detail
+        return index
+    
+    def _reusable(self, prior_detail: Dict, fingerprint: str, local_fingerprint: Optional[str]) -> bool:
+        """
+        历史评分能否直接复用：评审模型的评分需指纹一致；本地评分在 heuristic 模式下指纹一致即可，
+        prescreen 模式下只复用预筛命中 (source 为 heuristic:<规则>) 的轮次，其余轮次仍需评审
+        """
+        prior_fingerprint = prior_detail.get('fingerprint')
+        if prior_fingerprint == fingerprint:
+            return True
+        if local_fingerprint is None or prior_fingerprint != local_fingerprint:
+            return False
+        return self.scoring == 'heuristic' or str(prior_detail.get('source', '')).startswith('heuristic:')
+    
+    def _judgeable(self, response: Optional[str]) -> bool:
+        """该响应是否参与评测 (缺失的响应跳过；llm 评分下空响应也跳过)"""
+        return response is not None and (bool(response) or self.scoring != 'llm')
+
+    def evaluate_session(self, session: Dict, methods: List[str],
+                         ctx: Optional[TaskContext] = None,
+                         prior: Optional[Dict[str, Dict[int, Dict]]] = None,
+                         only_rounds: Optional[set] = None) -> Dict[str, Any]:
+        """
+        评估单个会话的所有方法
+        
+        prior: 该会话的历史评分 {method: {round: detail}}；
+               指纹一致的轮次直接复用，只评审新增方法或内容有变化的响应
+        only_rounds: 只评测这些轮次 (0-based 下标)，用于抽样预览
+
+        scoring 为 prescreen / heuristic 时空响应也记 0 分 (llm 模式下跳过空响应)，
+        本地评分的轮次在 details 中带 source (heuristic 或 heuristic:<预筛规则>)
+        """
         profile = session.get('user_profile', session.get('profile', ''))
         personality = session.get('user_personality', session.get('personality', ''))
         rounds = session.get('rounds', session.get('conversations', []))
@@ -453,55 +1503,105 @@ class BenchmarkEvaluator:
         
         for method in methods:
             for r_idx, round_data in enumerate(rounds):
+                if only_rounds is not None and r_idx not in only_rounds:
+                    continue
+                
                 # 获取用户消息
                 user_msg = round_data.get('user_message', round_data.get('user', ''))
                 
                 # 获取该方法的响应
-                if 'responses' in round_data:
-                    response = round_data['responses'].get(method, '')
-                elif 'assistant' in round_data:
-                    # ALOE 格式
-                    if isinstance(round_data['assistant'], dict):
-                        chosen = round_data.get('chosen', 'preferred')
-                        response = round_data['assistant'].get(chosen, '')
-                    else:
-                        response = round_data['assistant']
-                else:
+                response = round_response(round_data, method)
+                if not self._judgeable(response):
                     continue
                 
-                if not response:
+                # 原始完整历史 (传入当前方法以获取正确的响应历史)；按历史策略构建的评审历史
+                # (summary 策略需要调用评审模型生成摘要) 只在确定需要评审调用时才构建
+                full_history = self.build_history_string(rounds, r_idx, method, strategy=('full', 0))
+                
+                # 输入未变化的轮次直接复用历史评分
+                fingerprint = self.round_fingerprint(profile, personality, full_history, user_msg, response,
+                                                     history_spec=self.history_spec)
+                local_fingerprint = None
+                if self.scoring != 'llm':
+                    local_fingerprint = self.round_fingerprint(profile, personality, full_history, user_msg,
+                                                               response, scorer=HEURISTIC_SCORER)
+                prior_detail = prior.get(method, {}).get(r_idx + 1) if prior else None
+                if prior_detail and self._reusable(prior_detail, fingerprint, local_fingerprint):
+                    results[method]['scores'].append(prior_detail['score'])
+                    results[method]['binary'].append(prior_detail['binary'])
+                    results[method]['details'].append(prior_detail)
+                    if ctx is not None:
+                        ctx.count('reused_rounds')
                     continue
                 
-                # 构建历史 (传入当前方法以获取正确的响应历史)
-                history = self.build_history_string(rounds, r_idx, method)
+                # 本地评分：预筛命中的明显不合格响应 (prescreen) 或全部轮次 (heuristic) 不调用评审模型
+                if self.scoring != 'llm':
+                    previous = [round_response(r, method) or '' for r in rounds[:r_idx]]
+                    features = extract_features(profile, personality, user_msg, response, previous)
+                    rule = prescreen(features)
+                    if rule or self.scoring == 'heuristic':
+                        verdict = heuristic_score(features, rule)
+                        if ctx is not None:
+                            ctx.count('prescreened' if rule else 'heuristic_rounds')
+                            if rule:
+                                ctx.count(f'prescreen_{rule}')
+                        results[method]['scores'].append(verdict['total'])
+                        results[method]['binary'].append(verdict['binary'])
+                        results[method]['details'].append({
+                            'round': r_idx + 1,
+                            'score': verdict['total'],
+                            'breakdown': verdict['breakdown'],
+                            'binary': verdict['binary'],
+                            'reasoning': verdict['reasoning'],
+                            'fingerprint': local_fingerprint,
+                            'source': f'heuristic:{rule}' if rule else 'heuristic'
+                        })
+                        continue
+                
+                history = full_history if self.history[0] == 'full' else \
+                    self.build_history_string(rounds, r_idx, method, ctx)
+                if ctx is not None:
+                    ctx.count('history_tokens', estimate_tokens(history))
+                    ctx.count('history_tokens_full', estimate_tokens(full_history))
                 
                 # 合并 profile 和 personality 为统一格式
                 profile_info = f"{profile}; Personality: {personality}"
                 
                 # 细粒度评分
                 score_result = self.evaluate_alignment_score(
-                    profile, personality, history, user_msg, response
+                    profile, personality, history, user_msg, response, ctx=ctx
                 )
                 
                 # 二元评估 (使用新提示词格式)
                 binary_result = self.evaluate_binary(
-                    profile_info, personality, history, user_msg, response
+                    profile_info, personality, history, user_msg, response, ctx=ctx
                 )
                 
                 results[method]['scores'].append(score_result['total'])
                 results[method]['binary'].append(binary_result['result'])
-                results[method]['details'].append({
+                detail = {
                     'round': r_idx + 1,
                     'score': score_result['total'],
                     'breakdown': score_result['breakdown'],
                     'binary': binary_result['result'],
-                    'reasoning': score_result['reasoning']
-                })
+                    'reasoning': score_result['reasoning'],
+                    'fingerprint': fingerprint
+                }
+                if score_result.get('failed') or binary_result.get('failed'):
+                    # 评审失败的默认分数不带指纹，之后的增量评测 / 预览复用时会重新评审
+                    del detail['fingerprint']
+                    detail['source'] = 'failed'
+                    if ctx is not None:
+                        ctx.count('failed_rounds')
+                results[method]['details'].append(detail)
         
         return results
     
     def evaluate_file(self, filepath: str, methods: List[str], task_id: str, 
-                       results_folder: str = None) -> Dict[str, Any]:
+                       results_folder: str = None,
+                       on_session: Callable[[str, Dict], None] = None,
+                       base_results: Dict[str, Any] = None,
+                       stream: bool = False) -> Dict[str, Any]:
         """
         评估整个文件 - 支持增量保存和断点续评
         
@@ -510,113 +1610,567 @@ class BenchmarkEvaluator:
             methods: 要评测的方法列表
             task_id: 任务ID
             results_folder: 结果保存目录（用于增量保存）
+            on_session: 每完成一个会话时的回调 (session_id, session_results)
+            base_results: 历史任务结果 (增量评测)；其方法会合并进本次结果，
+                          输入未变化的轮次直接复用，不再调用评审模型
+            stream: 流式模式，见 evaluate_sessions
+        """
+        return self.evaluate_sessions(
+            load_sessions(filepath), methods, task_id,
+            results_folder=results_folder, on_session=on_session,
+            base_results=base_results, stream=stream
+        )
+    
+    def evaluate_sessions(self, sessions: Iterable[Dict], methods: List[str], task_id: str,
+                          results_folder: str = None,
+                          on_session: Callable[[str, Dict], None] = None,
+                          base_results: Dict[str, Any] = None,
+                          should_stop: Callable[[], bool] = None,
+                          round_subsets: Dict[str, set] = None,
+                          ctx: TaskContext = None,
+                          stream: bool = False) -> Dict[str, Any]:
         """
-        import os
+        评估会话流 - 会话按 max_workers 并发评测，按输入顺序合并结果
         
-        # 加载数据
-        sessions = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    sessions.append(json.loads(line))
+        sessions 可以是任意可迭代对象 (如 load_sessions 的生成器)，
+        同一时刻最多只有 2 × max_workers 个会话驻留内存。
+        should_stop: 每合并一个会话后调用，返回 True 时停止提交新会话并取消未开始的会话
+        round_subsets: {session_id: 轮次下标集合}，只评测指定轮次 (抽样预览)
+        ctx: 预先准备的任务上下文 (如已填入批处理结果的 memo)，默认新建
+        stream: 流式模式 (需要 results_folder)，内存占用与会话数量无关：
+                逐会话结果追加到 <task_id>_sessions.jsonl (同时作为断点)，内存中只保留 RunningMetrics；
+                返回的结果中 sessions 为空，sessions_file 指向 spill 文件，用 write_results 写出完整结果
+        """
+        if stream and not results_folder:
+            raise ValueError("Streaming evaluation needs a results_folder for the session spill file")
+        prior_index = {}
+        if base_results:
+            prior_index = self.index_prior_results(base_results)
+            # 合并历史任务中的方法：新旧方法共同出现在最终结果里
+            methods = list(base_results.get('methods', {}).keys()) + \
+                [m for m in methods if m not in base_results.get('methods', {})]
+            print(f"Incremental evaluation on top of task {base_results.get('task_id')}: methods {methods}")
+        streaming = None
+        if stream:
+            streaming = StreamingResults(os.path.join(results_folder, f"{task_id}_sessions.jsonl"), methods)
         
         # 中间结果文件路径
         checkpoint_path = None
-        if results_folder:
+        if results_folder and not stream:
             checkpoint_path = os.path.join(results_folder, f"{task_id}_checkpoint.json")
         
         # 尝试加载已有的中间结果（断点续评）
-        all_results = {method: {'all_scores': [], 'all_binary': [], 'sessions': []} for method in methods}
+        all_results = {method: MethodResults() for method in methods}
         completed_sessions = set()
         
-        if checkpoint_path and os.path.exists(checkpoint_path):
+        if checkpoint_path and serialization.exists(checkpoint_path):
             try:
-                with open(checkpoint_path, 'r', encoding='utf-8') as f:
-                    checkpoint = json.load(f)
-                    all_results = checkpoint.get('all_results', all_results)
-                    completed_sessions = set(checkpoint.get('completed_sessions', []))
-                    print(f"Resuming from checkpoint: {len(completed_sessions)} sessions already completed")
+                checkpoint = serialization.load(checkpoint_path)
+                all_results = {method: MethodResults.from_dict(checkpoint.get('all_results', {}).get(method, {}))
+                               for method in methods}
+                completed_sessions = set(checkpoint.get('completed_sessions', []))
+                print(f"Resuming from checkpoint: {len(completed_sessions)} sessions already completed")
             except Exception as e:
                 print(f"Failed to load checkpoint: {e}")
         
-        # 评估每个会话
-        for i, session in enumerate(sessions):
-            session_id = session.get('session_id', f'session_{i}')
-            
-            # 跳过已完成的会话
-            if session_id in completed_sessions:
-                print(f"Skipping session {i+1}/{len(sessions)} (already completed)")
-                continue
-            
-            print(f"Evaluating session {i+1}/{len(sessions)} [{session_id}]...")
-            
+        stopped = False
+        cancelled = False
+        
+        def commit(session_id: str, future):
+            """按输入顺序合并单个会话的结果"""
+            nonlocal stopped, cancelled
+            if future.cancelled():
+                return
             try:
-                session_results = self.evaluate_session(session, methods)
-                
-                for method in methods:
-                    if session_results[method]['scores']:
-                        all_results[method]['all_scores'].extend(session_results[method]['scores'])
-                        all_results[method]['all_binary'].extend(session_results[method]['binary'])
-                        all_results[method]['sessions'].append({
-                            'session_id': session_id,
-                            'scores': session_results[method]['scores'],
-                            'binary': session_results[method]['binary'],
-                            'details': session_results[method]['details']
-                        })
-                
-                completed_sessions.add(session_id)
-                
-                # 每完成一个 session 就保存中间结果
-                if checkpoint_path:
-                    self._save_checkpoint(checkpoint_path, all_results, list(completed_sessions), task_id)
-                    print(f"  ✓ Checkpoint saved ({len(completed_sessions)}/{len(sessions)} sessions)")
-                    
+                session_results = future.result()
+            except TaskCancelled:
+                # 任务已取消：未完成的会话不写入结果，并取消尚未开始的会话
+                cancelled = True
+                for _, pending_future in pending:
+                    pending_future.cancel()
+                return
             except Exception as e:
                 print(f"  ✗ Error evaluating session {session_id}: {e}")
                 # 保存已完成的结果，继续下一个 session
                 if checkpoint_path:
                     self._save_checkpoint(checkpoint_path, all_results, list(completed_sessions), task_id)
+                return
+            
+            if streaming:
+                streaming.add(session_id, session_results)
+            else:
+                for method in methods:
+                    if session_results[method]['scores']:
+                        all_results[method].add_session(
+                            session_id, session_results[method]['scores'],
+                            session_results[method]['binary'], session_results[method]['details']
+                        )
+                completed_sessions.add(session_id)
+            
+            # 每完成一个 session 就保存中间结果
+            if checkpoint_path:
+                self._save_checkpoint(checkpoint_path, all_results, list(completed_sessions), task_id)
+                print(f"  ✓ Checkpoint saved ({len(completed_sessions)} sessions)")
+            
+            if on_session:
+                on_session(session_id, session_results)
+            
+            if should_stop and not stopped and should_stop():
+                stopped = True
+                print("  ■ Stop condition met, cancelling remaining sessions")
+                for _, pending_future in pending:
+                    pending_future.cancel()
+        
+        ctx = ctx or TaskContext(task_id)
+        # 登记到调度器，此后可用 cancel(task_id) 协作式取消
+        self.scheduler.track(task_id)
+        
+        # 评估每个会话
+        total_sessions = 0
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                for i, session in enumerate(sessions):
+                    if stopped:
+                        break
+                    if self.scheduler.is_cancelled(task_id):
+                        cancelled = True
+                        for _, pending_future in pending:
+                            pending_future.cancel()
+                        break
+                    total_sessions += 1
+                    session_id = session.get('session_id', f'session_{i}')
+                    
+                    # 跳过已完成的会话
+                    if (streaming.skip(session_id) if streaming else session_id in completed_sessions):
+                        print(f"Skipping session {i+1} (already completed)")
+                        continue
+                    
+                    print(f"Evaluating session {i+1} [{session_id}]...")
+                    pending.append((session_id, executor.submit(
+                        self.evaluate_session, session, methods, ctx, prior_index.get(session_id),
+                        round_subsets.get(session_id) if round_subsets is not None else None
+                    )))
+                    
+                    # 限制在途会话数量，保证内存占用有界
+                    while len(pending) >= 2 * max(1, self.max_workers):
+                        commit(*pending.popleft())
+                
+                while pending:
+                    commit(*pending.popleft())
+        finally:
+            self.scheduler.unregister(task_id)
+        
+        if cancelled:
+            # 只合并了完整评测的会话，断点 (checkpoint / spill 文件) 保持有效
+            if streaming:
+                streaming.close()
+            elif checkpoint_path:
+                self._save_checkpoint(checkpoint_path, all_results, list(completed_sessions), task_id)
+            print(f"  ■ Task {task_id} cancelled; checkpoint kept for resuming")
+            raise TaskCancelled(task_id)
+        
+        if streaming:
+            streaming.close()
+            final_results = self.build_streamed_results(streaming, task_id, total_sessions)
+        else:
+            final_results = self.build_final_results(all_results, methods, task_id, total_sessions)
+        final_results['judge_stats'] = ctx.snapshot()
+        judge_stats = final_results['judge_stats']
+        print(f"Judge calls: {judge_stats['api_calls']} "
+              f"({judge_stats['calls_saved']} saved by deduplication/cache)")
+        if judge_stats['hedges_launched']:
+            print(f"Hedged requests: {judge_stats['hedges_launched']} launched, {judge_stats['hedges_won']} won, "
+                  f"p99 {judge_stats.get('latency_p99_unhedged')}s -> {judge_stats.get('latency_p99')}s")
+        
+        # 删除 checkpoint 文件（评估完成）
+        if checkpoint_path and serialization.exists(checkpoint_path):
+            try:
+                serialization.remove(checkpoint_path)
+                print(f"Checkpoint file removed (evaluation complete)")
+            except:
+                pass
+        
+        return final_results
+    
+    def evaluate_batch(self, filepath: str, methods: List[str], task_id: str, transport,
+                       workdir: str = 'batches', results_folder: str = None,
+                       on_session: Callable[[str, Dict], None] = None,
+                       base_results: Dict[str, Any] = None,
+                       poll_interval: float = 30.0, timeout: float = None) -> Dict[str, Any]:
+        """
+        离线批处理评估 - 所有评审请求写入一个批处理文件提交，取回后再生成结果
+        
+        1. 收集：遍历会话，记录 memo / 缓存 / 历史结果均未命中的评审请求 (不调用 API)
+        2. 提交：通过 transport (见 batch_transport.py) 提交批处理文件并轮询至完成
+        3. 导入：按 custom_id 把输出写入任务 memo 与持久化缓存，
+           再走正常的 evaluate_sessions 流程生成结果；批处理中失败的请求回退为实时调用
+        
+        Args:
+            transport: batch_transport.BatchTransport 实例
+            workdir: 批处理输入 / 输出文件目录
+        """
+        from batch_transport import run_batch
+        
+        prior_index = self.index_prior_results(base_results) if base_results else {}
+        eval_methods = methods
+        if base_results:
+            eval_methods = list(base_results.get('methods', {}).keys()) + \
+                [m for m in methods if m not in base_results.get('methods', {})]
+        
+        completed_sessions = set()
+        checkpoint_path = os.path.join(results_folder, f"{task_id}_checkpoint.json") if results_folder else None
+        if checkpoint_path and serialization.exists(checkpoint_path):
+            try:
+                completed_sessions = set(serialization.load(checkpoint_path).get('completed_sessions', []))
+            except Exception as e:
+                print(f"Failed to load checkpoint: {e}")
+        
+        ctx = TaskContext(task_id)
+        ctx.collect = {}
+        for i, session in enumerate(load_sessions(filepath)):
+            session_id = session.get('session_id', f'session_{i}')
+            if session_id not in completed_sessions:
+                self.evaluate_session(session, eval_methods, ctx, prior_index.get(session_id))
+        requests_by_id, ctx.collect = ctx.collect, None
+        print(f"Collected {len(requests_by_id)} judge requests for batch submission")
+        
+        contents = run_batch(transport, requests_by_id, os.path.join(workdir, task_id),
+                             poll_interval=poll_interval, timeout=timeout, name='judge')
+        
+        # 只保留本次评估过程的统计 (收集阶段的请求计数不计入)；批处理结果不能被 LRU 淘汰
+        ctx = TaskContext(task_id, memo_limit=None)
+        for key, content in contents.items():
+            if content is None:
                 continue
+            ctx.memo[key] = content
+            if self.cache is not None:
+                self.cache.put(key, content)
+        ctx.count('batched', len(ctx.memo))
+        failed = len(contents) - len(ctx.memo)
+        if failed:
+            print(f"  ! {failed} batch requests failed, falling back to live calls")
+        
+        return self.evaluate_sessions(
+            load_sessions(filepath), methods, task_id,
+            results_folder=results_folder, on_session=on_session,
+            base_results=base_results, ctx=ctx
+        )
+    
+    def evaluate_adaptive(self, filepath, methods: List[str], task_id: str,
+                          baseline: str, alpha: float = 0.05, precision: Optional[float] = None,
+                          min_sessions: int = 10, seed: Optional[int] = None,
+                          results_folder: str = None,
+                          on_session: Callable[[str, Dict], None] = None) -> Dict[str, Any]:
+        """
+        自适应序贯评测 - 名次一旦在统计上确定即提前停止
+        
+        会话按随机顺序评测，每完成一个会话就更新各候选方法相对 baseline 的配对差值
+        及置信区间；当所有候选方法都显著 (p < alpha) 或置信区间半宽 ≤ precision 时停止。
+        
+        Args:
+            filepath: 数据文件路径，或 load_sessions 可读取的文本流 / 会话可迭代对象
+            baseline: 基线方法 (如 "Base")，必须包含在 methods 中
+            alpha: 显著性水平 (多个候选方法时做 Bonferroni 校正)
+            precision: 目标置信区间半宽 (分数点)；None 表示只看显著性
+            min_sessions: 判断停止前至少评测的会话数
+            seed: 会话打乱顺序的随机种子 (默认由 task_id 决定，便于断点续评)
+        """
+        if baseline not in methods:
+            raise ValueError(f"Baseline method '{baseline}' must be one of {methods}")
+        
+        sessions = list(filepath if isinstance(filepath, (list, Iterator)) else load_sessions(filepath))
+        random.Random(seed if seed is not None else task_id).shuffle(sessions)
+        
+        tracker = SequentialComparison(
+            baseline, [m for m in methods if m != baseline],
+            alpha=alpha, precision=precision, min_sessions=min_sessions, max_sessions=len(sessions)
+        )
+        
+        # 断点续评：已完成会话的结果先计入统计量
+        checkpoint_path = os.path.join(results_folder, f"{task_id}_checkpoint.json") if results_folder else None
+        if checkpoint_path and serialization.exists(checkpoint_path):
+            checkpoint_results = serialization.load(checkpoint_path).get('all_results', {})
+            by_session = {}
+            for method, data in checkpoint_results.items():
+                for s in data.get('sessions', []):
+                    by_session.setdefault(s['session_id'], {})[method] = s
+            for session_results in by_session.values():
+                tracker.add(session_results)
+        
+        def track(session_id, session_results):
+            tracker.add(session_results)
+            if on_session:
+                on_session(session_id, session_results)
+        
+        final_results = self.evaluate_sessions(
+            sessions, methods, task_id, results_folder=results_folder,
+            on_session=track, should_stop=tracker.settled
+        )
+        
+        sessions_used = max((len(final_results['methods'][m]['sessions']) for m in methods), default=0)
+        final_results['total_sessions'] = sessions_used
+        final_results['adaptive'] = {
+            'baseline': baseline,
+            'alpha': alpha,
+            'precision': precision,
+            'min_sessions': min_sessions,
+            'settled': tracker.settled(),
+            'sequential_method': SequentialComparison.SEQUENTIAL_METHOD,
+            'sessions_used': sessions_used,
+            'dataset_sessions': len(sessions),
+            'fraction_used': round(sessions_used / len(sessions), 4) if sessions else 0,
+            'comparisons': tracker.summary()
+        }
+        print(f"Adaptive evaluation used {sessions_used}/{len(sessions)} sessions "
+              f"(settled: {final_results['adaptive']['settled']})")
+        return final_results
+    
+    def evaluate_preview(self, filepath, methods: List[str], task_id: str,
+                         per_round: int = 5, seed: Optional[int] = None,
+                         results_folder: str = None,
+                         on_session: Callable[[str, Dict], None] = None) -> Dict[str, Any]:
+        """
+        快速预览 - 按轮次分层抽样 (session, round) 单元格，估计 AL 曲线与指标
+        
+        每个轮次下标 k 抽取 per_round 个会话 (不足则全取)，保证每个 k 都有样本。
+        AL(k) 与完整评测一样按轮次编号分组；各方法的权重 N_k 为第 k 轮有该方法响应 (参与评测) 的会话数。
+        返回的 al_curve / metrics / binary_alignment_rate 均为估计值，附带 95% 误差范围，
+        结果标记 estimate=True。各单元格的评分带有输入指纹，之后以该任务作为
+        base_results 进行完整评测时会直接复用，不会重复评审。
+        """
+        sessions = list(filepath if isinstance(filepath, (list, Iterator)) else load_sessions(filepath))
+        rng = random.Random(seed if seed is not None else task_id)
+        
+        # 每个轮次下标的会话总体 (抽样框)，以及各方法在该轮参与评测的会话数 N_k
+        round_population: Dict[int, List[int]] = {}
+        weights = {method: {} for method in methods}
+        for s_idx, session in enumerate(sessions):
+            rounds = session.get('rounds', session.get('conversations', []))
+            for k, round_data in enumerate(rounds):
+                round_population.setdefault(k, []).append(s_idx)
+                for method in methods:
+                    if self._judgeable(round_response(round_data, method)):
+                        weights[method][k] = weights[method].get(k, 0) + 1
+        
+        # 分层抽样
+        subsets: Dict[int, set] = {}
+        for k, population in round_population.items():
+            for s_idx in rng.sample(population, min(per_round, len(population))):
+                subsets.setdefault(s_idx, set()).add(k)
+        
+        # 缺少 session_id 的会话按其在完整文件中的位置命名 (与完整评测一致)，
+        # 否则 evaluate_sessions 按抽样列表中的位置生成的 ID 对不上 round_subsets，之后的完整评测也无法复用
+        sampled_sessions = [sessions[i] if 'session_id' in sessions[i] else {**sessions[i], 'session_id': f'session_{i}'}
+                            for i in sorted(subsets)]
+        round_subsets = {
+            s['session_id']: subsets[i] for i, s in zip(sorted(subsets), sampled_sessions)
+        }
+        total_cells = sum(len(p) for p in round_population.values())
+        sampled_cells = sum(len(v) for v in subsets.values())
+        print(f"Preview: sampling {sampled_cells}/{total_cells} (session, round) cells "
+              f"from {len(sampled_sessions)} sessions")
+        
+        raw = self.evaluate_sessions(
+            sampled_sessions, methods, task_id, results_folder=results_folder,
+            on_session=on_session, round_subsets=round_subsets
+        )
         
-        # 计算最终指标
         final_results = {
             'task_id': task_id,
             'total_sessions': len(sessions),
+            'estimate': True,
+            'metrics_version': METRICS_VERSION,
+            'preview': {
+                'per_round': per_round,
+                'sampled_cells': sampled_cells,
+                'total_cells': total_cells,
+                'fraction': round(sampled_cells / total_cells, 4) if total_cells else 0,
+                # 各方法在各轮次下标的会话数 N_k (估计的权重，重算指标时使用)
+                'round_population': {method: [weights[method].get(k, 0) for k in sorted(round_population)]
+                                     for method in methods}
+            },
+            'methods': {}
+        }
+        for method in methods:
+            final_results['methods'][method] = self._estimate_from_sample(
+                raw['methods'][method]['sessions'], weights[method]
+            )
+        final_results['radar_data'] = self._generate_radar_data(final_results['methods'])
+        final_results['judge_stats'] = raw['judge_stats']
+        return final_results
+    
+    def _estimate_from_sample(self, method_sessions: List[Dict], weights: Dict[int, int]) -> Dict[str, Any]:
+        """由抽样单元格估计 AL(k)、指标与二元对齐率 (按各轮次会话数 N_k 加权)"""
+        by_round: Dict[int, List[Dict]] = {}
+        for s in method_sessions:
+            for detail in s['details']:
+                by_round.setdefault(detail['round'] - 1, []).append(detail)
+        
+        al_curve, al_error = [], []
+        avg_terms, binary_terms, total_weight = [], [], 0
+        for k in sorted(by_round):
+            scores = np.array([d['score'] for d in by_round[k]], dtype=float)
+            binary = np.array([d['binary'] for d in by_round[k]], dtype=float)
+            se = float(np.std(scores, ddof=1) / math.sqrt(len(scores))) if len(scores) > 1 else 0.0
+            binary_se = float(np.sqrt(binary.mean() * (1 - binary.mean()) / len(binary)))
+            al_curve.append(round(float(scores.mean()), 2))
+            al_error.append(round(1.96 * se, 2))
+            w = weights.get(k, 0)
+            total_weight += w
+            avg_terms.append((w, float(scores.mean()), se))
+            binary_terms.append((w, float(binary.mean()), binary_se))
+        
+        if not al_curve:
+            return {
+                'metrics': {'AVG': 0},
+                'curve_metrics': {},
+                'metrics_error': {},
+                'binary_alignment_rate': 0,
+                'binary_alignment_rate_error': 0,
+                'al_curve': [],
+                'al_curve_error': [],
+                'total_evaluations': 0,
+                'sessions': method_sessions
+            }
+        
+        def weighted(terms):
+            mean = sum(w * m for w, m, _ in terms) / total_weight
+            se = math.sqrt(sum((w / total_weight) ** 2 * e ** 2 for w, _, e in terms))
+            return mean, se
+        
+        avg, avg_se = weighted(avg_terms)
+        binary_rate, binary_se = weighted(binary_terms)
+        
+        # 只有 AVG 是完整评测指标的估计 (按 N_k 加权)。完整评测的 Slope / Intercept / R2 等基于全部逐轮评分的回归，
+        # 抽样无法估计，这里由估计的 AL 曲线计算，单独放在 curve_metrics 中
+        return {
+            'metrics': {'AVG': round(avg, 2)},
+            'curve_metrics': self.calculate_metrics(al_curve),
+            'metrics_error': {'AVG': round(1.96 * avg_se, 2)},
+            'binary_alignment_rate': round(binary_rate * 100, 2),
+            'binary_alignment_rate_error': round(1.96 * binary_se * 100, 2),
+            'al_curve': al_curve,
+            'al_curve_error': al_error,
+            'total_evaluations': sum(len(v) for v in by_round.values()),
+            'sessions': method_sessions
+        }
+    
+    def build_final_results(self, all_results: Dict[str, MethodResults], methods: List[str], task_id: str,
+                            total_sessions: int) -> Dict[str, Any]:
+        """由逐会话评分汇总出最终结果 (指标、AL 曲线、二元对齐率、雷达图)"""
+        final_results = {
+            'task_id': task_id,
+            'total_sessions': total_sessions,
+            'scoring': self.scoring,
+            'history': self.history_spec,
+            'metrics_version': METRICS_VERSION,
             'methods': {}
         }
         
         for method in methods:
-            scores = all_results[method]['all_scores']
-            binary = all_results[method]['all_binary']
-            method_sessions = all_results[method]['sessions']
-            
-            if scores and method_sessions:
-                metrics = self.calculate_metrics(scores)
-                
-                # 计算每轮的 AL(k) 曲线
-                max_rounds = max((len(s['scores']) for s in method_sessions), default=0)
-                al_curve = []
-                for r in range(max_rounds):
-                    round_scores = [
-                        s['scores'][r] if r < len(s['scores']) else None
-                        for s in method_sessions
-                    ]
-                    round_scores = [s for s in round_scores if s is not None]
-                    if round_scores:
-                        al_curve.append(round(np.mean(round_scores), 2))
-                
-                # 计算二元对齐率
-                binary_rate = sum(binary) / len(binary) * 100 if binary else 0
-                
+            method_results = all_results[method]
+            final_results['methods'][method] = {
+                **self.summarize_method(method_results),
+                # 紧凑结果只在这里还原为 JSON 结构
+                'sessions': list(method_results.iter_sessions())
+            }
+        
+        # 生成雷达图数据
+        final_results['radar_data'] = self._generate_radar_data(final_results['methods'])
+        
+        return final_results
+    
+    def summarize_method(self, method_results: MethodResults) -> Dict[str, Any]:
+        """单个方法的汇总 (不含 sessions)：指标、二元对齐率、AL(k) 曲线与评测轮次数"""
+        if not (len(method_results.scores) and len(method_results)):
+            # 没有评估结果时的默认值
+            return {
+                'metrics': {'AVG': 0, 'N_IR': 0, 'N_R2': 0},
+                'binary_alignment_rate': 0,
+                'al_curve': [],
+                'total_evaluations': 0
+            }
+        
+        metrics = self.calculate_metrics(method_results.scores.tolist())
+        
+        # 计算每轮的 AL(k) 曲线
+        al_curve = [round(mean, 2) for mean in method_results.round_means()]
+        
+        # 计算二元对齐率
+        binary = method_results.binary
+        binary_rate = sum(binary) / len(binary) * 100 if binary else 0
+        
+        return {
+            'metrics': metrics,
+            'binary_alignment_rate': round(binary_rate, 2),
+            'al_curve': al_curve,
+            'total_evaluations': len(method_results.scores)
+        }
+    
+    def recompute_results(self, results: Dict[str, Any]) -> List[str]:
+        """
+        按当前指标定义 (METRICS_VERSION) 由已保存的逐会话评分重算 metrics / al_curve /
+        binary_alignment_rate / radar_data，不调用评审模型；原地更新 results，返回数值有变化的方法
+
+        预览任务按保存的各轮次会话数 (preview.round_population) 重新加权估计；缺少该字段的早期预览结果、
+        以及没有保存逐会话二元判断的早期结果无法重算 (ValueError)。sessions 明细保持不变。
+        """
+        methods = results.get('methods', {})
+        if any('binary' not in s for data in methods.values() for s in data.get('sessions', [])):
+            raise ValueError("results predate per-session binary judgments and cannot be recomputed")
+        if results.get('estimate'):
+            population = results.get('preview', {}).get('round_population')
+            if population is None:
+                raise ValueError("preview results without preview.round_population cannot be recomputed")
+            if isinstance(population, list):
+                # 早期预览结果：所有方法共用按原始轮次数统计的 N_k
+                population = {method: population for method in methods}
+            summaries = {method: self._estimate_from_sample(data.get('sessions', []),
+                                                            dict(enumerate(population[method])))
+                         for method, data in methods.items()}
+        else:
+            summaries = {method: self.summarize_method(MethodResults.from_dict(data))
+                         for method, data in methods.items()}
+        
+        changed = []
+        for method, summary in summaries.items():
+            summary.pop('sessions', None)
+            if any(methods[method].get(key) != value for key, value in summary.items()):
+                changed.append(method)
+            methods[method].update(summary)
+        
+        radar_data = self._generate_radar_data(methods)
+        previous_radar = results.get('radar_data') or {}
+        changed += [method for method in methods
+                    if method not in changed and radar_data.get(method) != previous_radar.get(method)]
+        results['radar_data'] = radar_data
+        results['metrics_version'] = METRICS_VERSION
+        return changed
+    
+    def build_streamed_results(self, streaming: StreamingResults, task_id: str,
+                               total_sessions: int) -> Dict[str, Any]:
+        """由流式评测的累计量生成最终结果 (sessions 留在 spill 文件中)"""
+        final_results = {
+            'task_id': task_id,
+            'total_sessions': total_sessions,
+            'scoring': self.scoring,
+            'history': self.history_spec,
+            'metrics_version': METRICS_VERSION,
+            'methods': {}
+        }
+        
+        for method in streaming.methods:
+            aggregate = streaming.aggregates[method]
+            if aggregate.n:
                 final_results['methods'][method] = {
-                    'metrics': metrics,
-                    'binary_alignment_rate': round(binary_rate, 2),
-                    'al_curve': al_curve,
-                    'total_evaluations': len(scores),
-                    'sessions': method_sessions
+                    'metrics': aggregate.metrics(),
+                    'binary_alignment_rate': round(aggregate.binary_sum / aggregate.n * 100, 2),
+                    'al_curve': aggregate.al_curve(),
+                    'total_evaluations': aggregate.n,
+                    'sessions': []
                 }
             else:
-                # 没有评估结果时的默认值
                 final_results['methods'][method] = {
                     'metrics': {'AVG': 0, 'N_IR': 0, 'N_R2': 0},
                     'binary_alignment_rate': 0,
@@ -625,30 +2179,20 @@ class BenchmarkEvaluator:
                     'sessions': []
                 }
         
-        # 生成雷达图数据
         final_results['radar_data'] = self._generate_radar_data(final_results['methods'])
-        
-        # 删除 checkpoint 文件（评估完成）
-        if checkpoint_path and os.path.exists(checkpoint_path):
-            try:
-                os.remove(checkpoint_path)
-                print(f"Checkpoint file removed (evaluation complete)")
-            except:
-                pass
-        
+        final_results['sessions_file'] = streaming.spill_path
         return final_results
     
-    def _save_checkpoint(self, checkpoint_path: str, all_results: Dict, 
+    def _save_checkpoint(self, checkpoint_path: str, all_results: Dict[str, MethodResults], 
                          completed_sessions: List[str], task_id: str):
-        """保存中间结果到 checkpoint 文件"""
-        checkpoint = {
-            'task_id': task_id,
-            'all_results': all_results,
-            'completed_sessions': completed_sessions,
-            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
-        }
-        with open(checkpoint_path, 'w', encoding='utf-8') as f:
-            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+        """保存中间结果到 checkpoint 文件 (逐方法、逐会话原子写出，不构建完整的 dict)"""
+        with serialization.open_write(checkpoint_path, self.compression) as f:
+            f.write(b'{"task_id":' + serialization.dumps(task_id) + b',"all_results":{')
+            for n, (method, method_results) in enumerate(all_results.items()):
+                f.write((b',' if n else b'') + serialization.dumps(method) + b':')
+                method_results.write_json(f)
+            f.write(b'},"completed_sessions":' + serialization.dumps(completed_sessions))
+            f.write(b',"timestamp":' + serialization.dumps(time.strftime('%Y-%m-%d %H:%M:%S')) + b'}')
     
     def _generate_radar_data(self, methods_results: Dict) -> Dict:
         """
@@ -664,7 +2208,8 @@ class BenchmarkEvaluator:
         radar_data = {}
         
         for method, data in methods_results.items():
-            metrics = data.get('metrics', {})
+            # 预览结果的趋势指标只有基于估计 AL 曲线的 curve_metrics
+            metrics = {**data.get('curve_metrics', {}), **data.get('metrics', {})}
             al_curve = data.get('al_curve', [])
             binary_rate = data.get('binary_alignment_rate', 0)
             
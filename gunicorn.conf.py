@@ -0,0 +1,37 @@
+"""
+PersonaSteer Benchmark - gunicorn Configuration
+
+gunicorn 启动时自动读取当前目录下的 gunicorn.conf.py：
+
+    gunicorn wsgi:application
+
+评审调度器 (scheduler.py) 按进程存在：同一进程内的并发评测任务才会在公平调度下共享
+PERSONASTEER_JUDGE_CONCURRENCY 个评审槽位。同步 worker 每个进程同时只处理一个请求，
+调度器永远看不到相互竞争的任务，总评审并发变成 worker 数 × 槽位数，
+所有 worker 都在评测时 /status 与 /tasks/<task_id>/cancel 也无法响应。
+因此必须使用多线程 worker (gthread)，默认单进程 32 线程：
+- PERSONASTEER_WEB_THREADS：每个进程的请求线程数
+- PERSONASTEER_WEB_WORKERS：进程数；大于 1 时各进程的调度器互相独立，
+  总评审并发为 进程数 × PERSONASTEER_JUDGE_CONCURRENCY，任务之间的公平性只在进程内成立
+"""
+
+import os
+
+bind = os.environ.get('PERSONASTEER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('PERSONASTEER_WEB_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('PERSONASTEER_WEB_THREADS', 32))
+# gthread worker 的主线程在请求执行期间照常发送心跳，timeout 只用于回收卡死的进程，不限制评测时长
+timeout = 120
+
+
+def on_starting(server):
+    """拒绝同步 worker (命令行 -k sync / 未指定 --threads 时覆盖了本配置)"""
+    cfg = server.cfg
+    if cfg.worker_class_str == 'sync' and cfg.threads <= 1:
+        raise RuntimeError("PersonaSteer needs threaded workers: run with -k gthread --threads N "
+                           "(judge scheduling, /status and cancellation share one process)")
+    if cfg.workers > 1:
+        server.log.warning(
+            "%d worker processes: each has its own judge scheduler, so up to %d x PERSONASTEER_JUDGE_CONCURRENCY "
+            "judge calls run at once and fair scheduling only applies within a process", cfg.workers, cfg.workers)
@@ -0,0 +1,125 @@
+"""
+PersonaSteer Benchmark - Judge Request Hedging
+
+评审请求的尾延迟控制 (参见 Dean & Barroso, "The Tail at Scale")：
+- 每次调用都设置超时 (judge_timeout)，单个迟迟不返回的上游响应不会卡住整个会话乃至整个任务
+- 对冲请求：请求发出后超过最近延迟的 p95 仍未返回时，再发送一个相同的请求，取先成功返回者；
+  对冲请求数不超过实际请求数的 budget 比例 (默认 5%)，额外开销有上限
+- 未胜出的请求无法中途撤回，会在后台线程中跑完 (仍受超时限制)，其延迟用于估计"不对冲时"的 p99
+"""
+
+import os
+import threading
+from array import array
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+DEFAULT_JUDGE_TIMEOUT = 60.0
+
+
+def judge_timeout_from_env() -> float:
+    """单次评审调用的超时秒数 (PERSONASTEER_JUDGE_TIMEOUT，默认 60)"""
+    return float(os.environ.get('PERSONASTEER_JUDGE_TIMEOUT') or DEFAULT_JUDGE_TIMEOUT)
+
+
+def run_in_thread(fn: Callable[..., Any], *args) -> Future:
+    """在独立的守护线程中运行 fn，返回其 Future (异常包括 BaseException 均写入 Future)"""
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def percentile(values, q: float) -> Optional[float]:
+    if len(values) == 0:
+        return None
+    return float(np.percentile(values, q * 100))
+
+
+class LatencyWindow:
+    """最近 size 次成功调用的延迟 (环形缓冲)，分位数每 refresh 次写入重算一次"""
+
+    def __init__(self, size: int = 1000, refresh: int = 20):
+        self.size = size
+        self.refresh = refresh
+        self._values = array('d')
+        self._next = 0
+        self._added = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float):
+        with self._lock:
+            if len(self._values) < self.size:
+                self._values.append(seconds)
+            else:
+                self._values[self._next] = seconds
+                self._next = (self._next + 1) % self.size
+            self._added += 1
+            if self._added % self.refresh == 0:
+                self._cache.clear()
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if q not in self._cache:
+                self._cache[q] = percentile(self._values, q)
+            return self._cache[q]
+
+
+class HedgePolicy:
+    """
+    对冲策略：延迟阈值取最近成功调用延迟的 quantile 分位数 (样本少于 min_samples 时不对冲)，
+    对冲请求总数不超过 budget × 实际请求数 (所有任务共享)
+    """
+
+    def __init__(self, budget: float = 0.05, quantile: float = 0.95, min_samples: int = 20,
+                 min_delay: float = 0.0, window: int = 1000):
+        if not 0 < budget <= 1:
+            raise ValueError("hedge budget must be in (0, 1]")
+        if not 0 < quantile < 1:
+            raise ValueError("hedge quantile must be in (0, 1)")
+        self.budget = budget
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.latencies = LatencyWindow(window)
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional['HedgePolicy']:
+        """PERSONASTEER_HEDGE_BUDGET (>0 时启用) 与 PERSONASTEER_HEDGE_QUANTILE"""
+        budget = float(os.environ.get('PERSONASTEER_HEDGE_BUDGET') or 0)
+        if budget <= 0:
+            return None
+        return cls(budget, float(os.environ.get('PERSONASTEER_HEDGE_QUANTILE') or 0.95))
+
+    def delay(self) -> Optional[float]:
+        """发出对冲请求前的等待时间；None 表示样本不足，暂不对冲"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, self.latencies.quantile(self.quantile))
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_acquire(self) -> bool:
+        """预算内则登记一次对冲并返回 True"""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
@@ -0,0 +1,281 @@
+"""
+PersonaSteer Benchmark - Heuristic Scoring
+
+不调用 API 的本地评分层：
+- extract_features()：响应的长度 / Markdown 格式特征、与用户画像和用户消息的词汇重合、
+  与用户消息的相似度 (复读) 以及与该方法此前回复的相似度 (重复)
+- prescreen()：明显不合格的响应 (空响应、逐字重复此前回复、复读用户消息、长篇 Markdown 教程，
+  即 BINARY_EVAL_PROMPT 中舒芙蕾反例那样的回复) 直接判定，不再调用评审模型
+- heuristic_score()：按特征给出 5 个维度的近似分数与二元判断，用于大规模扫参时的完全离线评分
+- agreement_report()：在已有的 LLM 评审结果上计算启发式评分与评审模型的一致性
+
+启发式分数只是近似值，离线评分的结果标记为 scoring=heuristic，不与 LLM 评审结果混用。
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+SCORING_MODES = ('llm', 'prescreen', 'heuristic')
+HEURISTIC_SCORER = 'heuristic-v2'   # 启发式评分的版本 (用于评分指纹，规则变化时递增)；v2: similarity 不再返回上界
+
+BREAKDOWN_KEYS = ('style', 'content', 'naturalness', 'personalization', 'conversation')
+
+# 预筛规则阈值 (以及下面的评分参数) 是人工设定的，尚未对照真实评审模型的评分校准，
+# 使用前请先在已有的 LLM 评审结果上运行 agreement_report() 检查
+DUPLICATE_SIMILARITY = 0.95   # 与此前某条回复的相似度不低于此值视为重复
+ECHO_SIMILARITY = 0.85        # 与用户消息的相似度不低于此值视为复读
+TUTORIAL_CHARS = 500          # 长篇教程：字符数与 Markdown 标记数同时超过阈值
+TUTORIAL_MARKERS = 3
+
+# 评分参数
+IDEAL_CHARS = (40, 300)       # 聊天回复的合适长度区间
+BINARY_THRESHOLD = 60         # 启发式总分不低于此值时二元判断为 1
+
+PRESCREEN_RULES = ('empty', 'duplicate', 'echo', 'tutorial')
+
+STOPWORDS = frozenset('''
+a an the and or but if so of to in on at by for with from as into about than then that this these those
+is are was were be been being am do does did have has had i you he she it we they me him her us them my your
+his its our their mine yours what which who whom how when where why not no yes just very really too also
+can could will would should may might must shall there here all any some more most such only own same
+s t don doesn isn aren wasn weren ve ll re d m o oh hi hey hello thanks thank
+'''.split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+|[一-鿿]")
+_MARKDOWN_RES = (
+    re.compile(r'(?:^|\s)#{1,6}\s'),                # 标题
+    re.compile(r'\*\*[^*\n]+\*\*'),                 # 粗体
+    re.compile(r'(?:^|\s)\d+[.)]\s'),               # 有序列表
+    re.compile(r'(?m)^\s*[-*•]\s'),                 # 无序列表
+    re.compile(r'```'),                             # 代码块
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """小写英文单词与单个汉字"""
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def content_tokens(text: str) -> set:
+    """去掉停用词后的词集合 (英文单词至少 2 个字母，汉字逐字保留)"""
+    words = (w.strip("'") for w in tokenize(text))
+    return {w for w in words if (len(w) > 1 and w not in STOPWORDS) or '一' <= w <= '鿿'}
+
+
+def normalize(text: str) -> str:
+    """去掉标点与多余空白，用于比较回复是否相同"""
+    return ' '.join(tokenize(text))
+
+
+def similarity(a: str, b: str) -> float:
+    """SequenceMatcher 相似度 (0-1)；长度相差悬殊 (相似度上界不足 0.5) 时直接记为 0，省去逐字比较"""
+    if not a or not b:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    if matcher.real_quick_ratio() < 0.5:
+        return 0.0
+    return matcher.ratio()
+
+
+def round_response(round_data: Dict[str, Any], method: Optional[str]) -> Optional[str]:
+    """取一轮中指定方法的响应；该轮没有该方法的响应 (或没有响应字段) 时返回 None，空字符串表示空响应"""
+    if 'responses' in round_data:
+        return round_data['responses'].get(method)
+    if 'assistant' in round_data:
+        # ALOE 格式
+        if isinstance(round_data['assistant'], dict):
+            return round_data['assistant'].get(round_data.get('chosen', 'preferred'))
+        return round_data['assistant']
+    return None
+
+
+def extract_features(profile: str, personality: str, user_message: str, response: str,
+                     previous: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    提取响应特征
+
+    previous: 同一方法在此前轮次的回复 (用于检测重复)
+    """
+    text = (response or '').strip()
+    norm = normalize(text)
+    reply = content_tokens(text)
+    persona = content_tokens(f"{profile} {personality}")
+    user = content_tokens(user_message)
+    prior = [normalize(p) for p in previous if p]
+    return {
+        'chars': len(text),
+        'words': len(tokenize(text)),
+        'markdown': sum(len(pattern.findall(text)) for pattern in _MARKDOWN_RES),
+        'question': '?' in text or '？' in text,
+        'persona_hits': len(reply & persona),
+        'user_hits': len(reply & user),
+        'echo': round(similarity(normalize(user_message), norm), 4),
+        'repetition': round(max((similarity(p, norm) for p in prior), default=0.0), 4),
+        'duplicate': bool(norm) and norm in prior
+    }
+
+
+def prescreen(features: Dict[str, Any]) -> Optional[str]:
+    """明显不合格的响应返回命中的规则名 (见 PRESCREEN_RULES)，否则返回 None"""
+    if features['chars'] == 0:
+        return 'empty'
+    if features['duplicate'] or features['repetition'] >= DUPLICATE_SIMILARITY:
+        return 'duplicate'
+    if features['echo'] >= ECHO_SIMILARITY:
+        return 'echo'
+    if features['chars'] >= TUTORIAL_CHARS and features['markdown'] >= TUTORIAL_MARKERS:
+        return 'tutorial'
+    return None
+
+
+def heuristic_score(features: Dict[str, Any], rule: Optional[str] = None) -> Dict[str, Any]:
+    """
+    由特征计算近似评分，返回结构与 LLM 评审解析结果一致：
+    total (0-100)、breakdown (5 × 0-20)、binary (0/1)、reasoning
+
+    rule 为预筛命中的规则时二元判断固定为 0。
+    """
+    chars = features['chars']
+    if chars == 0:
+        breakdown = {key: 0 for key in BREAKDOWN_KEYS}
+        return {'total': 0, 'breakdown': breakdown, 'binary': 0, 'reasoning': 'heuristic: empty response'}
+    low, high = IDEAL_CHARS
+    length_fit = chars / low if chars < low else max(0.0, 1 - (chars - high) / (high * 2)) if chars > high else 1.0
+    format_fit = max(0.0, 1 - features['markdown'] / 4)
+    persona = min(1.0, features['persona_hits'] / 3)
+    topic = min(1.0, (features['persona_hits'] + features['user_hits']) / 4)
+    novelty = 1 - max(features['echo'], features['repetition'])
+    breakdown = {
+        'style': 0.5 * length_fit + 0.5 * format_fit,
+        'content': 0.3 + 0.7 * topic,
+        'naturalness': 0.6 * length_fit + 0.4 * format_fit,
+        'personalization': persona,
+        'conversation': 0.7 * novelty + 0.3 * features['question']
+    }
+    breakdown = {key: int(round(20 * value)) for key, value in breakdown.items()}
+    total = sum(breakdown.values())
+    binary = int(rule is None and total >= BINARY_THRESHOLD)
+    reasoning = f"heuristic: {rule}" if rule else \
+        f"heuristic: {chars} chars, {features['markdown']} markdown markers, " \
+        f"{features['persona_hits']} profile terms, echo {features['echo']:.2f}, " \
+        f"repetition {features['repetition']:.2f}"
+    return {'total': total, 'breakdown': breakdown, 'binary': binary, 'reasoning': reasoning}
+
+
+# ============================================================================
+# 与 LLM 评审的一致性
+# ============================================================================
+
+def _correlation(kind: str, x: Sequence[float], y: Sequence[float]) -> Optional[float]:
+    if len(x) < 3 or len(set(x)) < 2 or len(set(y)) < 2:
+        return None
+    from scipy import stats  # 延迟导入
+    fn = {'pearson': stats.pearsonr, 'spearman': stats.spearmanr, 'kendall': stats.kendalltau}[kind]
+    return round(float(fn(x, y)[0]), 4)
+
+
+def _cohen_kappa(a: Sequence[int], b: Sequence[int]) -> Optional[float]:
+    if not a:
+        return None
+    a, b = np.asarray(a), np.asarray(b)
+    observed = float(np.mean(a == b))
+    expected = float(np.mean(a) * np.mean(b) + (1 - np.mean(a)) * (1 - np.mean(b)))
+    if expected >= 1:
+        return None
+    return round((observed - expected) / (1 - expected), 4)
+
+
+def agreement_report(sessions: Iterable[Dict[str, Any]], results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    启发式评分与已有 LLM 评审结果 (任务结果文件) 的一致性
+
+    sessions 为该任务评测的数据；只比较由评审模型打分的轮次 (跳过启发式评分与评审失败的轮次)。
+    返回总分的相关系数与平均绝对误差、各维度相关系数、二元判断的一致率与 Cohen's kappa、
+    各预筛规则的命中数与精确率 (命中轮次中 LLM 也判为 0 的比例)，以及方法排名的一致性。
+    """
+    judged = {}
+    for method, data in results.get('methods', {}).items():
+        for s in data.get('sessions', []):
+            rounds = judged.setdefault(s['session_id'], {}).setdefault(method, {})
+            for detail in s.get('details', []):
+                if 'source' not in detail:
+                    rounds[detail['round']] = detail
+
+    llm_total, heur_total, llm_binary, heur_binary = [], [], [], []
+    dims = {key: ([], []) for key in BREAKDOWN_KEYS}
+    rules = {rule: {'fired': 0, 'llm_binary_0': 0, 'llm_score_sum': 0} for rule in PRESCREEN_RULES}
+    by_method: Dict[str, List[List[float]]] = {}
+
+    for i, session in enumerate(sessions):
+        methods = judged.get(session.get('session_id', f'session_{i}'))
+        if not methods:
+            continue
+        profile = session.get('user_profile', session.get('profile', ''))
+        personality = session.get('user_personality', session.get('personality', ''))
+        rounds = session.get('rounds', session.get('conversations', []))
+        for method, details in methods.items():
+            previous = []
+            for r_idx, round_data in enumerate(rounds):
+                response = round_response(round_data, method)
+                detail = details.get(r_idx + 1)
+                if response is not None and detail is not None:
+                    user_msg = round_data.get('user_message', round_data.get('user', ''))
+                    features = extract_features(profile, personality, user_msg, response, previous)
+                    rule = prescreen(features)
+                    verdict = heuristic_score(features, rule)
+                    llm_total.append(detail['score'])
+                    heur_total.append(verdict['total'])
+                    llm_binary.append(int(detail['binary']))
+                    heur_binary.append(verdict['binary'])
+                    for key in BREAKDOWN_KEYS:
+                        if key in detail.get('breakdown', {}):
+                            dims[key][0].append(detail['breakdown'][key])
+                            dims[key][1].append(verdict['breakdown'][key])
+                    if rule:
+                        rules[rule]['fired'] += 1
+                        rules[rule]['llm_binary_0'] += int(detail['binary']) == 0
+                        rules[rule]['llm_score_sum'] += detail['score']
+                    sums = by_method.setdefault(method, [0.0, 0.0, 0])
+                    sums[0] += detail['score']
+                    sums[1] += verdict['total']
+                    sums[2] += 1
+                previous.append(response or '')
+
+    n = len(llm_total)
+    report = {'task_id': results.get('task_id'), 'judge_model': results.get('judge_model'),
+              'scorer': HEURISTIC_SCORER, 'rounds': n}
+    if n == 0:
+        return report
+    llm_arr, heur_arr = np.asarray(llm_total, dtype=float), np.asarray(heur_total, dtype=float)
+    report['score'] = {
+        'pearson': _correlation('pearson', llm_total, heur_total),
+        'spearman': _correlation('spearman', llm_total, heur_total),
+        'mae': round(float(np.mean(np.abs(llm_arr - heur_arr))), 2),
+        'llm_mean': round(float(llm_arr.mean()), 2),
+        'heuristic_mean': round(float(heur_arr.mean()), 2)
+    }
+    report['dimensions'] = {key: _correlation('pearson', *pairs) for key, pairs in dims.items()}
+    report['binary'] = {
+        'accuracy': round(float(np.mean(np.asarray(llm_binary) == np.asarray(heur_binary))), 4),
+        'kappa': _cohen_kappa(llm_binary, heur_binary),
+        'llm_rate': round(float(np.mean(llm_binary)), 4),
+        'heuristic_rate': round(float(np.mean(heur_binary)), 4)
+    }
+    report['prescreen'] = {rule: {
+        'fired': entry['fired'],
+        'precision': round(entry['llm_binary_0'] / entry['fired'], 4) if entry['fired'] else None,
+        'llm_mean_score': round(entry['llm_score_sum'] / entry['fired'], 2) if entry['fired'] else None
+    } for rule, entry in rules.items()}
+    means = {method: (llm / count, heur / count) for method, (llm, heur, count) in by_method.items()}
+    report['methods'] = {method: {'llm_avg': round(llm, 2), 'heuristic_avg': round(heur, 2)}
+                         for method, (llm, heur) in means.items()}
+    if len(means) >= 2:
+        llm_rank = sorted(means, key=lambda m: -means[m][0])
+        heur_rank = sorted(means, key=lambda m: -means[m][1])
+        report['ranking'] = {'llm': llm_rank, 'heuristic': heur_rank, 'same_order': llm_rank == heur_rank,
+                             'kendall_tau': _correlation('kendall', [means[m][0] for m in means],
+                                                         [means[m][1] for m in means])}
+    return report
@@ -0,0 +1,227 @@
+"""
+PersonaSteer Benchmark - History Strategies
+
+评审提示词中的对话历史策略。完整历史 (full) 让每个会话的评审输入 token 随轮次数平方增长，
+长会话的后期轮次还可能超出上下文长度。可选策略 (PERSONASTEER_HISTORY 或 --history，格式 name[:N])：
+- full：完整历史 (默认)
+- window[:N]：只保留最近 N 轮 (默认 8)，前面的轮次以一行省略标记代替
+- budget[:N]：历史不超过 N 个 token (默认 2000)；保留开头 HEAD_ROUNDS 轮与尽可能多的最近轮次，省略中间部分
+- summary[:N]：最近 N 到 2N-1 轮保留原文 (默认 4)，更早的轮次折叠为滚动摘要。摘要只概括用户一方的消息
+  (各方法相同)，每 N 轮由评审模型增量生成一次，按会话缓存，供所有方法与之后的轮次复用
+
+drift_report() 对比同一数据在某个策略与完整历史下的评分，给出 token 节省与分数漂移。
+"""
+
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:  # 可选依赖：未安装时按字符数估算 token
+    tiktoken = None
+
+HISTORY_STRATEGIES = {'full': 0, 'window': 8, 'budget': 2000, 'summary': 4}   # 策略 -> 默认参数
+HEAD_ROUNDS = 2               # budget 策略保留的开头轮次 (通常包含自我介绍)
+SUMMARY_MAX_TOKENS = 300
+SUMMARY_CACHE_ENTRIES = 10_000
+NO_HISTORY = "(No previous conversation)"
+
+HISTORY_SUMMARY_PROMPT = '''You are summarizing the earlier part of a chat between a user ("You") and a new acquaintance ("Other").
+
+Summary so far:
+{summary}
+
+New messages from the user:
+{messages}
+
+Update the summary of what the user has said: facts about themselves, interests, opinions, feelings, plans, and topics already discussed. Keep concrete details (names, places, activities). Write at most 120 words in the second person ("You mentioned ..."). Output only the summary.'''
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """token 数 (安装了 tiktoken 时用 cl100k_base 编码精确计数，否则按 4 个字符 ≈ 1 token 估算)"""
+    global _encoding
+    if not text:
+        return 0
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def parse_history_strategy(spec: Optional[str]) -> Tuple[str, int]:
+    """'window:8' -> ('window', 8)；省略参数时取默认值"""
+    name, _, value = (spec or 'full').strip().partition(':')
+    if name not in HISTORY_STRATEGIES or (value and not value.isdigit()) or (value and int(value) <= 0):
+        raise ValueError(f"Invalid history strategy '{spec}' "
+                         f"(expected full, window[:N], budget[:TOKENS] or summary[:N])")
+    return name, int(value) if value else HISTORY_STRATEGIES[name]
+
+
+def format_round(user_msg: str, assistant_msg: str) -> str:
+    return f"You: \"{user_msg}\", Other: \"{assistant_msg}\""
+
+
+def _omitted(n: int) -> str:
+    return f"[{n} earlier round{'s' if n != 1 else ''} omitted]"
+
+
+def window_history(parts: Sequence[str], n: int) -> str:
+    """最近 n 轮"""
+    if len(parts) <= n:
+        return ", ".join(parts)
+    return ", ".join([_omitted(len(parts) - n)] + list(parts[-n:]))
+
+
+def budget_history(parts: Sequence[str], budget: int, head: int = HEAD_ROUNDS) -> str:
+    """
+    不超过 budget 个 token 的历史：开头 head 轮 + 尽可能多的最近轮次，中间以省略标记代替
+
+    预算连开头都放不下时只保留最近的轮次；连最近一轮都放不下时截断最近一轮的开头部分。
+    """
+    sizes = [estimate_tokens(part) + 1 for part in parts]
+    if sum(sizes) <= budget:
+        return ", ".join(parts)
+    head = min(head, len(parts) - 1)
+    if sum(sizes[:head]) > budget // 2:
+        head = 0
+    used = sum(sizes[:head]) + 8   # 省略标记
+    tail = len(parts)
+    while tail > head and used + sizes[tail - 1] <= budget:
+        tail -= 1
+        used += sizes[tail]
+    if tail == len(parts):
+        # 最近一轮本身超出预算：保留其末尾
+        keep = max(1, (budget - used) * 4)
+        omitted = len(parts) - head - 1
+        return ", ".join(list(parts[:head]) + ([_omitted(omitted)] if omitted else []) + ['...' + parts[-1][-keep:]])
+    omitted = tail - head
+    return ", ".join(list(parts[:head]) + ([_omitted(omitted)] if omitted else []) + list(parts[tail:]))
+
+
+class SummaryStore:
+    """按 (评审模型, 折叠粒度, 已折叠的用户消息) 缓存滚动摘要 (LRU，跨任务共享)"""
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, chunk: int, user_messages: Sequence[str]) -> str:
+        payload = json.dumps([model, chunk, list(user_messages)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, summary: str):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def rolling_summary(user_messages: Sequence[str], upto: int, chunk: int, store: SummaryStore, model: str,
+                    summarize: Callable[[str], str]) -> str:
+    """
+    前 upto 轮用户消息的滚动摘要 (upto 为 chunk 的整数倍)：
+    S(c) = summarize(S(c - chunk) + 第 c-chunk..c-1 轮的用户消息)，每个 S(c) 只生成一次
+    """
+    summary = ''
+    # 找到已缓存的最长前缀，再逐块向后折叠
+    c = upto
+    while c > 0:
+        cached = store.get(store.make_key(model, chunk, user_messages[:c]))
+        if cached is not None:
+            summary = cached
+            break
+        c -= chunk
+    while c < upto:
+        messages = "\n".join(f"- {m}" for m in user_messages[c:c + chunk])
+        summary = summarize(HISTORY_SUMMARY_PROMPT.format(summary=summary or '(none)', messages=messages)).strip()
+        c += chunk
+        store.put(store.make_key(model, chunk, user_messages[:c]), summary)
+    return summary
+
+
+# ============================================================================
+# 与完整历史的分数漂移
+# ============================================================================
+
+def _round_scores(results: Dict[str, Any]) -> Dict[Tuple[str, str, int], Tuple[int, int]]:
+    """{(方法, 会话, 轮次): (分数, 二元判断)}"""
+    scores = {}
+    for method, data in results.get('methods', {}).items():
+        for s in data.get('sessions', []):
+            for detail in s.get('details', []):
+                scores[(method, s['session_id'], detail['round'])] = (detail['score'], int(detail['binary']))
+    return scores
+
+
+def drift_report(results: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对比同一数据在某个历史策略 (results) 与完整历史 (baseline) 下的评分
+
+    返回两者都评测过的轮次上：各方法的 AVG / 二元对齐率差值、逐轮分数的平均 / 最大绝对差与二元判断翻转率、
+    按轮次的平均绝对差 (截断通常只影响后期轮次)、方法排名是否一致，以及 judge_stats 中的历史 token 节省。
+    """
+    candidate, reference = _round_scores(results), _round_scores(baseline)
+    common = sorted(set(candidate) & set(reference), key=lambda key: (key[0], key[1], key[2]))
+    report = {
+        'task_id': results.get('task_id'),
+        'baseline_task_id': baseline.get('task_id'),
+        'history': results.get('history', 'full'),
+        'baseline_history': baseline.get('history', 'full'),
+        'rounds': len(common)
+    }
+    stats = results.get('judge_stats', {})
+    if 'history_tokens' in stats:
+        report['tokens'] = {key: stats.get(key) for key in
+                            ('history_tokens', 'history_tokens_full', 'history_token_savings', 'summary_calls')}
+        baseline_tokens = baseline.get('judge_stats', {}).get('history_tokens')
+        if baseline_tokens:
+            report['tokens']['baseline_history_tokens'] = baseline_tokens
+    if not common:
+        return report
+
+    by_method: Dict[str, List[Tuple[int, int, int, int]]] = {}
+    by_round: Dict[int, List[int]] = {}
+    for key in common:
+        (score, binary), (base_score, base_binary) = candidate[key], reference[key]
+        by_method.setdefault(key[0], []).append((score, base_score, binary, base_binary))
+        by_round.setdefault(key[2], []).append(abs(score - base_score))
+
+    report['methods'] = {}
+    for method, rows in by_method.items():
+        arr = np.asarray(rows, dtype=float)
+        diff = np.abs(arr[:, 0] - arr[:, 1])
+        report['methods'][method] = {
+            'rounds': len(rows),
+            'avg': round(float(arr[:, 0].mean()), 2),
+            'baseline_avg': round(float(arr[:, 1].mean()), 2),
+            'avg_drift': round(float(arr[:, 0].mean() - arr[:, 1].mean()), 2),
+            'binary_rate_drift': round(float(arr[:, 2].mean() - arr[:, 3].mean()) * 100, 2),
+            'mean_abs_score_diff': round(float(diff.mean()), 2),
+            'max_abs_score_diff': int(diff.max()),
+            'binary_flip_rate': round(float(np.mean(arr[:, 2] != arr[:, 3])), 4)
+        }
+    report['by_round'] = {k: round(float(np.mean(v)), 2) for k, v in sorted(by_round.items())}
+    if len(by_method) >= 2:
+        methods = report['methods']
+        report['same_ranking'] = sorted(methods, key=lambda m: -methods[m]['avg']) == \
+            sorted(methods, key=lambda m: -methods[m]['baseline_avg'])
+    return report
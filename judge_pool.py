@@ -0,0 +1,269 @@
+"""
+PersonaSteer Benchmark - Judge Endpoint Pool
+
+多个 OpenAI 兼容评审网关组成的端点池 (未配置时评估器仍使用 evaluator.client 单端点)：
+- 每个端点有独立的 client、并发上限、配额 (每分钟请求数 rpm) 与健康状态
+- 路由：在可用端点中选预计完成时间最短者 —— EWMA 延迟 × (在途数 + 1) / 并发上限，
+  再除以剩余配额比例 (配额将尽的端点少用)；上游返回 x-ratelimit-*-requests 头时以其为准
+- 熔断：连续失败 failure_threshold 次后断开 cooldown 秒，之后放行一个试探请求 (半开)，成功即恢复
+- 429 视为配额耗尽：按 Retry-After 暂停该端点，不计入熔断
+- 端点 client 关闭 SDK 自身的重试，失败时由池换一个端点重试 (故障转移)
+
+增加端点即可增加评审容量。配置 (PERSONASTEER_JUDGE_POOL 为 JSON 文件路径，或直接为 JSON)：
+
+    [{"name": "gw-a", "base_url": "https://a.example.com/v1", "api_key": "sk-...",
+      "max_concurrency": 16, "rpm": 3000},
+     {"name": "gw-b", "base_url": "http://127.0.0.1:9001/v1", "api_key_env": "GW_B_KEY",
+      "max_concurrency": 4}]
+
+本地测试可用 scripts/mock_judge_server.py 启动多个替身服务。
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import openai
+
+FAILURE_THRESHOLD = 5
+COOLDOWN_SECONDS = 30.0
+RATE_LIMIT_PAUSE_SECONDS = 2.0
+LATENCY_ALPHA = 0.2   # EWMA 平滑系数
+
+# 端点本身的故障 (计入熔断)；其他 4xx 是请求本身的问题，直接抛出
+_ENDPOINT_ERRORS = (openai.APIConnectionError, openai.InternalServerError)
+
+
+class Endpoint:
+    """单个评审网关 (状态由 JudgePool 在锁内维护)"""
+
+    def __init__(self, name: str, base_url: str, api_key: str, max_concurrency: int = 8,
+                 rpm: Optional[int] = None):
+        self.name = name
+        self.base_url = base_url
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rpm = int(rpm) if rpm else None
+        self.failure_threshold = FAILURE_THRESHOLD
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.inflight = 0
+        self.latency: Optional[float] = None
+        self.failures = 0              # 连续失败次数
+        self.open_until = 0.0          # 熔断断开至
+        self.trial = False             # 半开状态下的试探请求是否在途
+        self.paused_until = 0.0        # 429 后暂停至
+        self.sent = deque()            # 最近 60 秒的请求时间 (rpm 配额)
+        self.quota = None              # 上游报告的 (剩余, 上限)
+        self.calls = 0
+        self.errors = 0
+
+    def state(self, now: float) -> str:
+        if self.failures < self.failure_threshold:
+            return 'closed'
+        return 'open' if now < self.open_until else 'half_open'
+
+    def quota_left(self, now: float) -> float:
+        """剩余配额比例 (0-1)"""
+        while self.sent and now - self.sent[0] > 60:
+            self.sent.popleft()
+        fraction = 1.0
+        if self.rpm:
+            fraction = max(0.0, (self.rpm - len(self.sent)) / self.rpm)
+        if self.quota is not None and self.quota[1] > 0:
+            fraction = min(fraction, self.quota[0] / self.quota[1])
+        return fraction
+
+    def available(self, now: float) -> bool:
+        if self.inflight >= self.max_concurrency or now < self.paused_until:
+            return False
+        if self.rpm and self.quota_left(now) <= 0:
+            return False
+        state = self.state(now)
+        return state == 'closed' or (state == 'half_open' and not self.trial)
+
+    def next_ready(self, now: float) -> float:
+        """不可用时最早可能恢复的时刻 (在途请求结束另由通知唤醒)"""
+        ready = max(self.paused_until, self.open_until if self.state(now) == 'open' else 0.0)
+        if self.rpm and self.sent and len(self.sent) >= self.rpm:
+            ready = max(ready, self.sent[0] + 60)
+        return ready
+
+
+class JudgePool:
+    """按延迟与剩余配额路由的评审端点池"""
+
+    def __init__(self, endpoints: List[Endpoint], failure_threshold: int = FAILURE_THRESHOLD,
+                 cooldown: float = COOLDOWN_SECONDS):
+        if not endpoints:
+            raise ValueError("judge pool needs at least one endpoint")
+        names = [endpoint.name for endpoint in endpoints]
+        if len(set(names)) != len(names):
+            raise ValueError(f"duplicate judge endpoint names: {names}")
+        self.endpoints = endpoints
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        for endpoint in endpoints:
+            endpoint.failure_threshold = failure_threshold
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config: List[Dict[str, Any]]) -> 'JudgePool':
+        endpoints = []
+        for i, entry in enumerate(config):
+            api_key = entry.get('api_key') or os.environ.get(entry.get('api_key_env', ''), '') or 'EMPTY'
+            endpoints.append(Endpoint(entry.get('name') or f"endpoint-{i}", entry['base_url'], api_key,
+                                      entry.get('max_concurrency', 8), entry.get('rpm')))
+        return cls(endpoints)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'JudgePool':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_config(json.load(f))
+
+    @classmethod
+    def from_env(cls) -> Optional['JudgePool']:
+        """PERSONASTEER_JUDGE_POOL：JSON 文件路径或 JSON 字符串；未设置时返回 None"""
+        value = os.environ.get('PERSONASTEER_JUDGE_POOL', '').strip()
+        if not value:
+            return None
+        if value.startswith('['):
+            return cls.from_config(json.loads(value))
+        return cls.from_file(value)
+
+    @property
+    def capacity(self) -> int:
+        return sum(endpoint.max_concurrency for endpoint in self.endpoints)
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def _score(self, endpoint: Endpoint, now: float, default_latency: float) -> float:
+        """预计完成时间 / 剩余配额比例 (越小越好)；未测得延迟的端点按平均延迟估计，以便探索"""
+        latency = endpoint.latency if endpoint.latency is not None else default_latency
+        expected = latency * (endpoint.inflight + 1) / endpoint.max_concurrency
+        return expected / max(endpoint.quota_left(now), 0.05)
+
+    def _acquire(self, exclude) -> Tuple[Endpoint, bool]:
+        """选出并占用一个端点，返回 (端点, 是否为半开状态的试探请求)"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self.endpoints if e.name not in exclude]
+                known = [e.latency for e in self.endpoints if e.latency is not None]
+                default_latency = sum(known) / len(known) if known else 1.0
+                ready = [e for e in candidates if e.available(now)]
+                if ready:
+                    endpoint = min(ready, key=lambda e: self._score(e, now, default_latency))
+                    endpoint.inflight += 1
+                    endpoint.sent.append(now)
+                    trial = endpoint.state(now) == 'half_open'
+                    if trial:
+                        endpoint.trial = True
+                    return endpoint, trial
+                # 没有可用端点：等到有请求结束，或最早的熔断 / 配额暂停到期
+                wake = min((e.next_ready(now) for e in candidates), default=0.0)
+                self._cond.wait(max(0.01, wake - now) if wake > now else 1.0)
+
+    def _release(self, endpoint: Endpoint, trial: bool, latency: Optional[float] = None, failed: bool = False,
+                 pause: Optional[float] = None, headers=None):
+        with self._cond:
+            now = time.monotonic()
+            endpoint.inflight -= 1
+            if trial:
+                endpoint.trial = False
+            if latency is not None:
+                endpoint.calls += 1
+                endpoint.failures = 0
+                endpoint.latency = latency if endpoint.latency is None else \
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * endpoint.latency
+            if failed:
+                endpoint.errors += 1
+                endpoint.failures += 1
+                if endpoint.failures >= self.failure_threshold:
+                    if endpoint.failures == self.failure_threshold or endpoint.open_until <= now:
+                        print(f"Judge endpoint {endpoint.name} circuit open for {self.cooldown:.0f}s")
+                    endpoint.open_until = now + self.cooldown
+            if pause is not None:
+                endpoint.errors += 1
+                endpoint.paused_until = now + pause
+            if headers is not None:
+                try:
+                    remaining = headers.get('x-ratelimit-remaining-requests')
+                    limit = headers.get('x-ratelimit-limit-requests')
+                    if remaining is not None and limit is not None:
+                        endpoint.quota = (int(remaining), int(limit))
+                except ValueError:
+                    pass
+            self._cond.notify_all()
+
+    def complete(self, body: Dict[str, Any], timeout: Optional[float] = None,
+                 on_attempt: Optional[Callable[[str, Optional[float], Optional[BaseException]], Any]] = None,
+                 reader: Optional[Callable[[Any], str]] = None) -> Tuple[str, str]:
+        """
+        发送一次 chat completion，返回 (消息内容, 端点名)
+
+        reader 不为 None 时以流式请求发送，由 reader(stream) 读取并返回消息内容。
+
+        端点故障 / 超时 / 429 时换一个尚未尝试的端点重试，全部失败后抛出最后一个异常。
+        on_attempt(端点名, 延迟, 异常) 在每次尝试后调用 (成功时异常为 None，失败时延迟为 None)。
+        """
+        tried = set()
+        last_error: Optional[BaseException] = None
+        for _ in range(len(self.endpoints)):
+            endpoint, trial = self._acquire(tried)
+            tried.add(endpoint.name)
+            start = time.monotonic()
+            try:
+                if reader is not None:
+                    raw = endpoint.client.chat.completions.with_raw_response.create(**body, stream=True,
+                                                                                    timeout=timeout)
+                    content = reader(raw.parse())
+                else:
+                    raw = endpoint.client.chat.completions.with_raw_response.create(**body, timeout=timeout)
+                    content = raw.parse().choices[0].message.content
+            except openai.RateLimitError as e:
+                retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+                try:
+                    pause = float(retry_after) if retry_after else RATE_LIMIT_PAUSE_SECONDS
+                except ValueError:
+                    pause = RATE_LIMIT_PAUSE_SECONDS
+                self._release(endpoint, trial, pause=pause)
+                last_error = e
+            except _ENDPOINT_ERRORS as e:
+                # APITimeoutError 是 APIConnectionError 的子类
+                self._release(endpoint, trial, failed=True)
+                last_error = e
+            except BaseException:
+                self._release(endpoint, trial)
+                raise
+            else:
+                latency = time.monotonic() - start
+                self._release(endpoint, trial, latency=latency, headers=raw.headers)
+                if on_attempt is not None:
+                    on_attempt(endpoint.name, latency, None)
+                return content, endpoint.name
+            if on_attempt is not None:
+                on_attempt(endpoint.name, None, last_error)
+        raise last_error
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各端点的状态与累计统计 (用于监控)"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                'capacity': self.capacity,
+                'endpoints': [{
+                    'name': e.name,
+                    'base_url': e.base_url,
+                    'state': e.state(now),
+                    'inflight': e.inflight,
+                    'max_concurrency': e.max_concurrency,
+                    'latency': round(e.latency, 3) if e.latency is not None else None,
+                    'quota_left': round(e.quota_left(now), 3),
+                    'paused': now < e.paused_until,
+                    'calls': e.calls,
+                    'errors': e.errors
+                } for e in self.endpoints]
+            }
@@ -0,0 +1,106 @@
+"""
+PersonaSteer Benchmark - Metrics Recompute
+
+指标定义 (calculate_metrics / _generate_radar_data 等，版本号见 evaluator.METRICS_VERSION) 变化后，
+由已保存的逐会话评分 (scores / binary / details) 重算已有任务的 metrics、al_curve、
+binary_alignment_rate 与 radar_data，不重新评审：
+- 结果文件按原压缩格式原子重写，同时重写图表数据 (<task_id>_charts.json)
+- 已是当前版本的结果默认跳过 (force=True 时仍重算)
+- 多个结果文件在进程池中并行处理，完成后刷新结果索引 (排行榜)
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import serialization
+from evaluator import METRICS_VERSION, BenchmarkEvaluator, write_chart_payload, write_results
+from results_index import ResultsIndex, find_result_files
+
+_evaluator: Optional[BenchmarkEvaluator] = None
+
+
+def _get_evaluator() -> BenchmarkEvaluator:
+    """每个进程一个评估器实例 (只用到指标计算，不发出评审调用)"""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = BenchmarkEvaluator()
+    return _evaluator
+
+
+def _compression_of(path: str) -> str:
+    for compression, suffix in serialization.SUFFIXES.items():
+        if suffix and path.endswith(suffix):
+            return compression
+    return 'none'
+
+
+def recompute_file(path: str, force: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    重算单个结果文件
+
+    返回 {'task_id', 'status', 'from_version', 'changed'}，status 为：
+    updated (数值有变化) / unchanged (数值不变，只更新版本号) / current (已是当前版本，跳过) /
+    skipped (无法重算，见 error) / failed (读写出错)。dry_run 时只计算不写回。
+    """
+    folder, name = os.path.split(path)
+    task_id = name.split('_results.json')[0]
+    report = {'task_id': task_id, 'status': 'current', 'from_version': None, 'changed': []}
+    try:
+        results = serialization.load(path)
+        report['from_version'] = results.get('metrics_version', 0)
+        if report['from_version'] == METRICS_VERSION and not force:
+            return report
+        try:
+            report['changed'] = _get_evaluator().recompute_results(results)
+        except ValueError as e:
+            report.update(status='skipped', error=str(e))
+            return report
+        report['status'] = 'updated' if report['changed'] else 'unchanged'
+        if not dry_run:
+            compression = _compression_of(path)
+            write_results(results, os.path.join(folder, f"{task_id}_results.json"), compression)
+            write_chart_payload(results, folder, compression)
+    except Exception as e:
+        report.update(status='failed', error=str(e))
+    return report
+
+
+def recompute_folder(results_folder: str, task_ids: Optional[List[str]] = None, force: bool = False,
+                     dry_run: bool = False, workers: Optional[int] = None,
+                     on_file: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+    """
+    重算结果目录中的所有任务 (或 task_ids 指定的任务)，返回汇总：
+    各状态的任务数、当前 metrics_version、耗时与逐任务报告
+
+    workers=1 时在当前进程内重算 (web 应用的后台线程)；on_file 在每个文件处理完后以其报告调用
+    """
+    start = time.time()
+    paths = [path for task_id, path in find_result_files(results_folder)
+             if task_ids is None or task_id in task_ids]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            reports = []
+            for report in executor.map(recompute_file, paths, [force] * len(paths), [dry_run] * len(paths)):
+                reports.append(report)
+                if on_file:
+                    on_file(report)
+    else:
+        reports = []
+        for path in paths:
+            reports.append(recompute_file(path, force, dry_run))
+            if on_file:
+                on_file(reports[-1])
+
+    if not dry_run and any(r['status'] in ('updated', 'unchanged') for r in reports):
+        # 重写的结果文件修改时间已变化，sync 只重新索引这些文件
+        ResultsIndex.for_folder(results_folder).sync(results_folder)
+
+    summary = {'metrics_version': METRICS_VERSION, 'files': len(reports), 'dry_run': dry_run}
+    for status in ('updated', 'unchanged', 'current', 'skipped', 'failed'):
+        summary[status] = sum(r['status'] == status for r in reports)
+    summary['seconds'] = round(time.time() - start, 3)
+    summary['tasks'] = reports
+    return summary
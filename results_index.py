@@ -0,0 +1,286 @@
+"""
+PersonaSteer Benchmark - Results Index
+
+跨任务结果索引：每个任务完成时把元数据 (数据集哈希、评审模型、模式、完成时间) 与
+各方法的汇总指标 (AVG / Slope / Intercept / R2、二元对齐率、AL 曲线) 写入 SQLite，
+排行榜查询只读索引，无需逐个解析 results/*_results.json。
+
+已有的结果文件可用 sync() 增量补建索引 (按文件修改时间跳过已索引的文件)。
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import serialization
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    dataset_hash TEXT,
+    judge_model TEXT,
+    mode TEXT NOT NULL,
+    total_sessions INTEGER NOT NULL,
+    base_task_id TEXT,
+    result_path TEXT,
+    result_mtime REAL,
+    completed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS method_results (
+    task_id TEXT NOT NULL,
+    method TEXT NOT NULL,
+    avg REAL,
+    slope REAL,
+    intercept REAL,
+    r2 REAL,
+    binary_rate REAL,
+    total_evaluations INTEGER NOT NULL,
+    metrics TEXT NOT NULL,
+    al_curve TEXT NOT NULL,
+    PRIMARY KEY (task_id, method)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_dataset ON tasks (dataset_hash, completed_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_judge ON tasks (judge_model, completed_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed_at);
+CREATE INDEX IF NOT EXISTS idx_method_avg ON method_results (method, avg);
+CREATE INDEX IF NOT EXISTS idx_method_slope ON method_results (method, slope);
+CREATE INDEX IF NOT EXISTS idx_avg ON method_results (avg);
+CREATE INDEX IF NOT EXISTS idx_slope ON method_results (slope);
+'''
+
+INDEX_FILENAME = 'index.db'
+
+# 排序字段 -> 列名
+SORT_COLUMNS = {
+    'AVG': 'm.avg',
+    'Slope': 'm.slope',
+    'Intercept': 'm.intercept',
+    'R2': 'm.r2',
+    'binary_rate': 'm.binary_rate',
+    'completed_at': 't.completed_at'
+}
+
+_RESULT_FILE = re.compile(r'^(?P<task_id>.+)_results\.json(\.gz|\.zst)?$')
+
+
+def find_result_files(results_folder: str) -> List[Tuple[str, str]]:
+    """结果目录中的 (task_id, 结果文件路径)；同一任务可能存在多个压缩变体，以 serialization.find 的优先顺序为准"""
+    found = {}
+    for name in sorted(os.listdir(results_folder)):
+        match = _RESULT_FILE.match(name)
+        if match and match.group('task_id') not in found:
+            task_id = match.group('task_id')
+            found[task_id] = serialization.find(os.path.join(results_folder, f"{task_id}_results.json"))
+    return list(found.items())
+
+
+def file_digest(path: str) -> str:
+    """数据集哈希：与上传存储的 file_id 相同 (sha256 前 16 位)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _parse_time(value) -> Optional[float]:
+    """时间戳或 ISO 日期 / 时间 -> epoch 秒"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def task_mode(results: Dict[str, Any]) -> str:
+    if results.get('scoring') == 'heuristic':
+        return 'heuristic'   # 离线启发式评分，不与 LLM 评审结果一起排名
+    if results.get('estimate'):
+        return 'preview'
+    if 'adaptive' in results:
+        return 'adaptive'
+    return 'full'
+
+
+class ResultsIndex:
+    """基于 SQLite 的跨任务结果索引"""
+
+    def __init__(self, db_path: str, wal: bool = True):
+        self.db_path = db_path
+        self.wal = wal
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def for_folder(cls, results_folder: str) -> 'ResultsIndex':
+        """结果目录下的默认索引 (<results_folder>/index.db)"""
+        os.makedirs(results_folder, exist_ok=True)
+        return cls(os.path.join(results_folder, INDEX_FILENAME))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        if self.wal:
+            conn.execute('PRAGMA journal_mode = WAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _upsert(self, conn, results: Dict[str, Any], result_path: Optional[str],
+                completed_at: Optional[float]):
+        task_id = results['task_id']
+        mtime = os.path.getmtime(result_path) if result_path and os.path.exists(result_path) else None
+        conn.execute('DELETE FROM method_results WHERE task_id = ?', (task_id,))
+        conn.execute(
+            'INSERT OR REPLACE INTO tasks (task_id, dataset_hash, judge_model, mode, total_sessions, '
+            'base_task_id, result_path, result_mtime, completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (task_id, results.get('file_id'), results.get('judge_model'), task_mode(results),
+             results.get('total_sessions', 0), results.get('base_task_id'),
+             os.path.abspath(result_path) if result_path else None, mtime,
+             completed_at if completed_at is not None else (mtime or time.time()))
+        )
+        rows = []
+        for method, data in results.get('methods', {}).items():
+            metrics = data.get('metrics', {})
+            rows.append((task_id, method, metrics.get('AVG'), metrics.get('Slope'), metrics.get('Intercept'),
+                         metrics.get('R2'), data.get('binary_alignment_rate'), data.get('total_evaluations', 0),
+                         json.dumps(metrics), json.dumps(data.get('al_curve', []))))
+        conn.executemany(
+            'INSERT INTO method_results (task_id, method, avg, slope, intercept, r2, binary_rate, '
+            'total_evaluations, metrics, al_curve) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+
+    def add(self, results: Dict[str, Any], result_path: Optional[str] = None,
+            completed_at: Optional[float] = None):
+        """索引一个已完成任务 (同一 task_id 重复写入时覆盖)"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._upsert(conn, results, result_path, completed_at)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def remove(self, task_id: str):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM method_results WHERE task_id = ?', (task_id,))
+            conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+
+    def sync(self, results_folder: str) -> int:
+        """
+        扫描结果目录，补建 / 刷新索引，返回重新索引的文件数
+
+        只解析新增或修改时间变化的结果文件；已删除的结果文件对应的任务从索引中移除。
+        """
+        with self._connect() as conn:
+            known = {row['task_id']: (row['result_path'], row['result_mtime'])
+                     for row in conn.execute('SELECT task_id, result_path, result_mtime FROM tasks')}
+
+        seen = set()
+        pending = []
+        for task_id, path in find_result_files(results_folder):
+            seen.add(task_id)
+            indexed = known.get(task_id)
+            if indexed and indexed[0] == os.path.abspath(path) and indexed[1] == os.path.getmtime(path):
+                continue
+            pending.append((task_id, path))
+
+        folder = os.path.abspath(results_folder)
+        stale = [task_id for task_id, (path, _) in known.items()
+                 if task_id not in seen and path and os.path.dirname(path) == folder]
+
+        # 单个事务批量写入
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for task_id, path in pending:
+                    try:
+                        results = serialization.load(path)
+                    except Exception as e:
+                        print(f"Skipping unreadable results file {path}: {e}")
+                        continue
+                    results.setdefault('task_id', task_id)
+                    self._upsert(conn, results, path, None)
+                for task_id in stale:
+                    conn.execute('DELETE FROM method_results WHERE task_id = ?', (task_id,))
+                    conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return len(pending)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def leaderboard(self, dataset: Optional[str] = None, method: Optional[str] = None,
+                    judge_model: Optional[str] = None, mode: Optional[str] = None,
+                    since=None, until=None, sort: str = 'AVG', descending: bool = True,
+                    limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按 (任务, 方法) 排名
+
+        Args:
+            dataset: 数据集哈希 (file_id)
+            since / until: 完成时间范围 (epoch 秒或 ISO 日期 / 时间)
+            sort: AVG / Slope / Intercept / R2 / binary_rate / completed_at
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort field: {sort} (expected one of {', '.join(SORT_COLUMNS)})")
+        clauses, params = [], []
+        for column, value in (('t.dataset_hash', dataset), ('m.method', method),
+                              ('t.judge_model', judge_model), ('t.mode', mode)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None and since != '':
+            clauses.append('t.completed_at >= ?')
+            params.append(_parse_time(since))
+        if until is not None and until != '':
+            clauses.append('t.completed_at <= ?')
+            params.append(_parse_time(until))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        direction = 'DESC' if descending else 'ASC'
+        query = (
+            'SELECT t.task_id, t.dataset_hash, t.judge_model, t.mode, t.total_sessions, t.completed_at, '
+            'm.method, m.binary_rate, m.total_evaluations, m.metrics, m.al_curve '
+            'FROM method_results m JOIN tasks t ON t.task_id = m.task_id '
+            f'{where} ORDER BY {SORT_COLUMNS[sort]} {direction} '
+            'LIMIT ? OFFSET ?'
+        )
+        with self._connect() as conn:
+            rows = conn.execute(query, params + [int(limit), int(offset)]).fetchall()
+        return [{
+            'task_id': row['task_id'],
+            'dataset_hash': row['dataset_hash'],
+            'judge_model': row['judge_model'],
+            'mode': row['mode'],
+            'total_sessions': row['total_sessions'],
+            'completed_at': datetime.fromtimestamp(row['completed_at']).isoformat(timespec='seconds'),
+            'method': row['method'],
+            'metrics': json.loads(row['metrics']),
+            'binary_alignment_rate': row['binary_rate'],
+            'total_evaluations': row['total_evaluations'],
+            'al_curve': json.loads(row['al_curve'])
+        } for row in rows]
+
+    def task_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
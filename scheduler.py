@@ -0,0 +1,174 @@
+"""
+PersonaSteer Benchmark - Judge Scheduler
+
+评审模型调用的全局调度器 (位于 BenchmarkEvaluator 与评审 API 之间)：
+- 全局并发上限 capacity：所有并发评测任务共享同一份评审配额
+- 加权公平排队 (start-time fair queuing)：每个任务维护虚拟时间，每获得一个调用槽位前进 1/priority；
+  空闲槽位总是分给有等待请求、且虚拟时间最小的任务。新任务从当前全局虚拟时间起步，
+  因此 10 个会话的快速检查不会排在 10000 个会话的夜间任务之后
+- 每任务并发上限 max_concurrency：单个任务最多占用的槽位数
+- 协作式取消：cancel(task_id) 后该任务不再获得新的槽位，等待中的调用立即抛出 TaskCancelled；
+  已发出的调用正常返回，评测循环据此停止提交新会话并保留有效的断点
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+class TaskCancelled(BaseException):
+    """
+    任务已被取消 (断点仍然有效，可用相同 task_id 续评)
+
+    与 asyncio.CancelledError 一样继承 BaseException：评审调用处的 except Exception
+    会把失败记为默认分数，取消不能被当作一次失败的评审写入断点
+    """
+
+    def __init__(self, task_id: Optional[str]):
+        super().__init__(f"Task {task_id} was cancelled")
+        self.task_id = task_id
+
+
+class _TaskState:
+    __slots__ = ('priority', 'max_concurrency', 'vtime', 'inflight', 'waiting', 'granted', 'cancelled', 'finished')
+
+    def __init__(self, priority: float, max_concurrency: Optional[int], vtime: float):
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.vtime = vtime
+        self.inflight = 0
+        self.waiting = 0
+        self.granted = 0
+        self.cancelled = False
+        self.finished = False   # 已 unregister，最后一个调用结束后移除
+
+
+class JudgeScheduler:
+    """评审调用槽位的加权公平调度"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.inflight = 0
+        self.vclock = 0.0   # 最近一次发放槽位的虚拟时间
+        self._tasks: Dict[Optional[str], _TaskState] = {}
+        self._cond = threading.Condition()
+
+    def _state(self, task_id: Optional[str]) -> _TaskState:
+        state = self._tasks.get(task_id)
+        if state is None:
+            state = self._tasks[task_id] = _TaskState(1.0, None, self.vclock)
+        return state
+
+    def _release(self, task_id: Optional[str], state: _TaskState):
+        """任务空闲时移除已 unregister 的任务状态，以及不属于任何任务 (task_id 为 None) 的调用状态"""
+        if state.inflight == 0 and state.waiting == 0 and (state.finished or task_id is None) \
+                and self._tasks.get(task_id) is state:
+            del self._tasks[task_id]
+
+    def register(self, task_id: str, priority: float = 1.0, max_concurrency: Optional[int] = None):
+        """设置任务的权重与并发上限 (未注册的任务权重为 1、不设上限)；续评的任务清除先前的取消状态"""
+        if priority <= 0:
+            raise ValueError("priority must be positive")
+        with self._cond:
+            state = self._state(task_id)
+            state.cancelled = False
+            state.finished = False
+            state.priority = float(priority)
+            state.max_concurrency = max_concurrency if max_concurrency and max_concurrency > 0 else None
+            self._cond.notify_all()
+
+    def track(self, task_id: str):
+        """开始跟踪任务 (已注册时保留其设置)，此后即可取消"""
+        with self._cond:
+            self._state(task_id).finished = False
+
+    def unregister(self, task_id: str):
+        """
+        任务结束后移除其状态；仍有在途或等待中的调用时 (如被取消的任务) 推迟到最后一个调用结束，
+        期间取消状态仍然有效
+        """
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is not None:
+                state.finished = True
+                self._release(task_id, state)
+
+    def cancel(self, task_id: str) -> bool:
+        """取消任务：不再发放新槽位，唤醒并终止其等待中的调用。返回任务是否在本调度器中"""
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is None:
+                return False
+            state.cancelled = True
+            self._cond.notify_all()
+            return True
+
+    def is_cancelled(self, task_id: Optional[str]) -> bool:
+        with self._cond:
+            state = self._tasks.get(task_id)
+            return state is not None and state.cancelled
+
+    def _next_task(self) -> Optional[_TaskState]:
+        """下一个应获得槽位的任务：有等待请求、未达上限、虚拟时间最小"""
+        best = None
+        for state in self._tasks.values():
+            if state.waiting == 0 or state.cancelled:
+                continue
+            if state.max_concurrency is not None and state.inflight >= state.max_concurrency:
+                continue
+            if best is None or state.vtime < best.vtime:
+                best = state
+        return best
+
+    @contextmanager
+    def slot(self, task_id: Optional[str]):
+        """占用一个评审调用槽位；任务被取消时抛出 TaskCancelled"""
+        with self._cond:
+            state = self._state(task_id)
+            if state.waiting == 0 and state.inflight == 0:
+                # 空闲后重新活跃的任务不能用积攒的虚拟时间插队，也不应被过去的用量惩罚
+                state.vtime = max(state.vtime, self.vclock)
+            state.waiting += 1
+            try:
+                while True:
+                    if state.cancelled:
+                        raise TaskCancelled(task_id)
+                    if self.inflight < self.capacity and self._next_task() is state:
+                        break
+                    self._cond.wait()
+            except BaseException:
+                state.waiting -= 1
+                self._release(task_id, state)
+                raise
+            state.waiting -= 1
+            self.inflight += 1
+            state.inflight += 1
+            state.granted += 1
+            self.vclock = state.vtime
+            state.vtime += 1.0 / state.priority
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.inflight -= 1
+                state.inflight -= 1
+                self._release(task_id, state)
+                self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """调度状态 (用于监控)"""
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'inflight': self.inflight,
+                'tasks': {
+                    str(task_id): {
+                        'priority': state.priority,
+                        'max_concurrency': state.max_concurrency,
+                        'inflight': state.inflight,
+                        'waiting': state.waiting,
+                        'granted': state.granted,
+                        'cancelled': state.cancelled
+                    } for task_id, state in self._tasks.items()
+                }
+            }
@@ -4,13 +4,52 @@ Dialogue Generation Script - For client-side test data generation
 
 使用方法 / Usage:
     python generate_dialogues.py --profiles data/profiles.jsonl --output data/benchmark_input.jsonl
+    python generate_dialogues.py ... --workers 32 --max-connections 64   # 并发生成
+    python generate_dialogues.py ... --resume                            # 断点续跑
+    python generate_dialogues.py ... --batch openai                      # 离线批处理，按轮次提交
 """
 
 import json
 import argparse
 import os
-from typing import List, Dict, Any
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional
 import requests
+from requests.adapters import HTTPAdapter
+
+# ============================================================================
+# HTTP 连接池：所有请求复用 keep-alive 连接，并限制同时在途的请求数
+# ============================================================================
+_http_session = None
+_request_slots = threading.BoundedSemaphore(8)
+_method_executor = None
+
+
+def configure_http(max_connections: int):
+    """初始化共享的 HTTP 连接池、在途请求上限以及方法级并发线程池"""
+    global _http_session, _request_slots, _method_executor
+    _http_session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections)
+    _http_session.mount('http://', adapter)
+    _http_session.mount('https://', adapter)
+    _request_slots = threading.BoundedSemaphore(max_connections)
+    _method_executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='method')
+
+
+def post_chat(api_url: str, api_key: str, data: Dict) -> str:
+    """通过共享连接池发送 chat completion 请求，返回消息内容"""
+    if _http_session is None:
+        configure_http(8)
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    with _request_slots:
+        response = _http_session.post(api_url, headers=headers, json=data, timeout=30)
+    response.raise_for_status()
+    return response.json()['choices'][0]['message']['content'].strip()
 
 # User Simulator Prompt (参考 RLPA)
 USER_SIM_PROMPT = '''# 任务：模拟真实用户进行多轮对话
@@ -50,6 +89,59 @@ USER_SIM_PROMPT = '''# 任务：模拟真实用户进行多轮对话
 直接输出你作为用户的下一条消息（简短、自然、口语化）。不要解释你在做什么。
 '''
 
+# 请求失败时使用的占位回复
+USER_SIM_FALLBACK = "嗨，你好！"
+MODEL_FALLBACK = "I'm here to help!"
+
+
+class JsonlAppender:
+    """
+    线程安全的 JSONL 追加写入器
+
+    每条记录一次 write 写入整行并 flush + fsync，进程崩溃时最多丢失正在写入的一行。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+    
+    def append(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+    
+    def close(self):
+        self._file.close()
+
+
+def read_jsonl_tolerant(path: str) -> List[Dict]:
+    """
+    读取可能被中断写入的 JSONL 文件
+
+    末尾不完整的行会被截断掉，保证之后的追加写入从完整行开始。
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end < len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+    records = []
+    for line in data[:end].decode('utf-8').splitlines():
+        if line.strip():
+            records.append(json.loads(line))
+    return records
+
+
+def session_id_for(profile_data: Dict) -> str:
+    return f"user_{profile_data.get('id', 'unknown')}_session_001"
+
 
 def load_profiles(filepath: str) -> List[Dict]:
     """加载用户画像"""
@@ -61,8 +153,8 @@ def load_profiles(filepath: str) -> List[Dict]:
     return profiles
 
 
-def call_user_simulator(profile: str, personality: str, history: List[str], api_url: str, api_key: str) -> str:
-    """调用用户模拟器生成消息"""
+def build_user_sim_request(profile: str, personality: str, history: List[str]) -> Dict:
+    """构建用户模拟器的 chat completion 请求体"""
     history_str = "\n".join(history) if history else "（这是对话的开始）"
     
     prompt = USER_SIM_PROMPT.format(
@@ -71,30 +163,26 @@ def call_user_simulator(profile: str, personality: str, history: List[str], api_
         history=history_str
     )
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
+    return {
         "model": "gpt-4o-mini",
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": 150,
         "temperature": 0.8
     }
-    
+
+
+def call_user_simulator(profile: str, personality: str, history: List[str], api_url: str, api_key: str) -> str:
+    """调用用户模拟器生成消息"""
     try:
-        response = requests.post(api_url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content'].strip()
+        return post_chat(api_url, api_key, build_user_sim_request(profile, personality, history))
     except Exception as e:
         print(f"Error calling user simulator: {e}")
-        return "嗨，你好！"
+        return USER_SIM_FALLBACK
 
 
-def call_model(model_name: str, user_message: str, history: List[str], 
-               profile: str = None, api_url: str = None, api_key: str = None) -> str:
-    """调用被测模型生成响应
+def build_model_request(model_name: str, user_message: str, history: List[str],
+                        profile: str = None) -> Dict:
+    """构建被测模型的 chat completion 请求体
     
     这里是示例实现，实际使用时需要根据你的模型接口进行修改
     """
@@ -119,12 +207,7 @@ Respond naturally and show understanding of the user's interests and style."""
     else:
         system_prompt = "You are a helpful assistant."
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
+    return {
         "model": "gpt-4o-mini",
         "messages": [
             {"role": "system", "content": system_prompt},
@@ -133,26 +216,35 @@ Respond naturally and show understanding of the user's interests and style."""
         "max_tokens": 200,
         "temperature": 0.7
     }
-    
+
+
+def call_model(model_name: str, user_message: str, history: List[str], 
+               profile: str = None, api_url: str = None, api_key: str = None) -> str:
+    """调用被测模型生成响应"""
     try:
-        response = requests.post(api_url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content'].strip()
+        return post_chat(api_url, api_key, build_model_request(model_name, user_message, history, profile))
     except Exception as e:
         print(f"Error calling model {model_name}: {e}")
-        return "I'm here to help!"
+        return MODEL_FALLBACK
 
 
 def generate_session(profile_data: Dict, methods: List[str], num_rounds: int,
-                     api_url: str, api_key: str) -> Dict:
-    """为单个用户生成完整的多轮对话会话"""
+                     api_url: str, api_key: str,
+                     completed_rounds: Optional[List[Dict]] = None,
+                     on_round: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    """
+    为单个用户生成完整的多轮对话会话
+    
+    completed_rounds: 之前已生成的轮次 (断点续跑)，会重建各方法历史并从下一轮继续
+    on_round: 每生成一轮后的回调 (session_id, round_record)，用于记录进度
+    """
     
     profile = profile_data.get('profile', '')
     personality = profile_data.get('personality', '')
     user_id = profile_data.get('id', 'unknown')
     
     session = {
-        "session_id": f"user_{user_id}_session_001",
+        "session_id": session_id_for(profile_data),
         "user_profile": profile,
         "user_personality": personality,
         "rounds": []
@@ -161,8 +253,18 @@ def generate_session(profile_data: Dict, methods: List[str], num_rounds: int,
     # 每个方法维护独立的对话历史
     method_histories = {method: [] for method in methods}
     
-    for round_num in range(1, num_rounds + 1):
-        print(f"  Round {round_num}/{num_rounds}...")
+    # 恢复已生成的轮次
+    for round_record in completed_rounds or []:
+        session["rounds"].append(round_record)
+        for method in methods:
+            method_histories[method].append(round_record["user_message"])
+            method_histories[method].append(round_record["responses"][method])
+    
+    if _method_executor is None:
+        configure_http(8)
+    
+    for round_num in range(len(session["rounds"]) + 1, num_rounds + 1):
+        print(f"  [{user_id}] Round {round_num}/{num_rounds}...")
         
         # 生成用户消息（基于某个方法的历史，这里用第一个方法的）
         primary_method = methods[0]
@@ -172,29 +274,120 @@ def generate_session(profile_data: Dict, methods: List[str], num_rounds: int,
             api_url, api_key
         )
         
-        # 各方法生成响应
-        responses = {}
-        for method in methods:
-            response = call_model(
-                method, user_message, 
+        # 各方法并发生成响应 (各方法历史相互独立，本轮全部完成后再追加)
+        replies = _method_executor.map(
+            lambda method: call_model(
+                method, user_message,
                 method_histories[method],
                 profile, api_url, api_key
-            )
+            ),
+            methods
+        )
+        responses = {}
+        for method, response in zip(methods, replies):
             responses[method] = response
             
             # 更新该方法的历史
             method_histories[method].append(user_message)
             method_histories[method].append(response)
         
-        session["rounds"].append({
+        round_record = {
             "round": round_num,
             "user_message": user_message,
             "responses": responses
-        })
+        }
+        session["rounds"].append(round_record)
+        if on_round:
+            on_round(session["session_id"], round_record)
     
     return session
 
 
+def generate_batch(profiles: List[Dict], methods: List[str], num_rounds: int, transport,
+                   workdir: str, partial_rounds: Optional[Dict[str, List[Dict]]] = None,
+                   on_round: Optional[Callable[[str, Dict], None]] = None,
+                   poll_interval: float = 30.0) -> List[Dict]:
+    """
+    离线批处理生成 - 按轮次同步推进所有会话
+    
+    每一轮提交两个批处理文件：先是所有会话的用户模拟器请求，
+    再是所有会话 × 方法的被测模型请求；批处理中失败的请求使用占位回复。
+    transport: batch_transport.BatchTransport 实例
+    """
+    from batch_transport import run_batch
+    
+    sessions = []
+    histories = []
+    for profile_data in profiles:
+        session = {
+            "session_id": session_id_for(profile_data),
+            "user_profile": profile_data.get('profile', ''),
+            "user_personality": profile_data.get('personality', ''),
+            "rounds": []
+        }
+        method_histories = {method: [] for method in methods}
+        for round_record in (partial_rounds or {}).get(session["session_id"], []):
+            session["rounds"].append(round_record)
+            for method in methods:
+                method_histories[method].append(round_record["user_message"])
+                method_histories[method].append(round_record["responses"][method])
+        sessions.append(session)
+        histories.append(method_histories)
+    
+    step = 0
+    while True:
+        active = [i for i, session in enumerate(sessions) if len(session["rounds"]) < num_rounds]
+        if not active:
+            break
+        step += 1
+        print(f"Batch step {step}: {len(active)} sessions")
+        
+        # 用户消息 (基于第一个方法的历史)
+        user_requests = {
+            f"{sessions[i]['session_id']}:{len(sessions[i]['rounds']) + 1}:user": build_user_sim_request(
+                sessions[i]["user_profile"], sessions[i]["user_personality"], histories[i][methods[0]]
+            )
+            for i in active
+        }
+        user_contents = run_batch(transport, user_requests, workdir, poll_interval=poll_interval,
+                                  name=f"step{step:03d}_user")
+        user_messages = {}
+        for i, custom_id in zip(active, user_requests):
+            content = user_contents.get(custom_id)
+            user_messages[i] = content.strip() if content else USER_SIM_FALLBACK
+        
+        # 各方法响应
+        model_requests = {}
+        for i in active:
+            for method in methods:
+                custom_id = f"{sessions[i]['session_id']}:{len(sessions[i]['rounds']) + 1}:{method}"
+                model_requests[custom_id] = build_model_request(
+                    method, user_messages[i], histories[i][method], sessions[i]["user_profile"]
+                )
+        model_contents = run_batch(transport, model_requests, workdir, poll_interval=poll_interval,
+                                   name=f"step{step:03d}_model")
+        
+        for i in active:
+            session = sessions[i]
+            round_num = len(session["rounds"]) + 1
+            responses = {}
+            for method in methods:
+                content = model_contents.get(f"{session['session_id']}:{round_num}:{method}")
+                responses[method] = content.strip() if content else MODEL_FALLBACK
+                histories[i][method].append(user_messages[i])
+                histories[i][method].append(responses[method])
+            round_record = {
+                "round": round_num,
+                "user_message": user_messages[i],
+                "responses": responses
+            }
+            session["rounds"].append(round_record)
+            if on_round:
+                on_round(session["session_id"], round_record)
+    
+    return sessions
+
+
 def main():
     parser = argparse.ArgumentParser(description='Generate benchmark dialogue data')
     parser.add_argument('--profiles', type=str, required=True, 
@@ -211,31 +404,100 @@ def main():
                         help='API endpoint URL')
     parser.add_argument('--api_key', type=str, required=True,
                         help='API key')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Number of profiles generated concurrently')
+    parser.add_argument('--max-connections', type=int, default=16,
+                        help='Maximum concurrent HTTP requests (connection pool size)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip profiles already in the output file and continue partial sessions')
+    parser.add_argument('--batch', type=str, default=None, choices=['openai', 'local'],
+                        help='Batch mode: submit each round as batch files via this transport '
+                             '(local: a spool directory served by "python batch_transport.py serve")')
+    parser.add_argument('--batch-dir', type=str, default='batches',
+                        help='Batch mode: folder for batch input/output files and the local spool')
+    parser.add_argument('--batch-poll', type=float, default=30.0,
+                        help='Batch mode: seconds between status polls')
     
     args = parser.parse_args()
+    configure_http(args.max_connections)
     
     # 加载用户画像
     print(f"Loading profiles from {args.profiles}...")
     profiles = load_profiles(args.profiles)
     print(f"Loaded {len(profiles)} profiles")
     
-    # 生成对话
-    sessions = []
-    for i, profile_data in enumerate(profiles):
-        print(f"Generating session {i+1}/{len(profiles)}...")
-        session = generate_session(
-            profile_data, args.methods, args.rounds,
-            args.api_url, args.api_key
-        )
-        sessions.append(session)
+    # 已完成的会话 / 未完成会话的逐轮进度
+    progress_path = args.output + '.progress'
+    done_ids = set()
+    partial_rounds: Dict[str, List[Dict]] = {}
+    if args.resume:
+        done_ids = {s['session_id'] for s in read_jsonl_tolerant(args.output)}
+        for entry in read_jsonl_tolerant(progress_path):
+            rounds = partial_rounds.setdefault(entry['session_id'], [])
+            if entry['round']['round'] == len(rounds) + 1:
+                rounds.append(entry['round'])
+        print(f"Resuming: {len(done_ids)} sessions done, "
+              f"{len([k for k in partial_rounds if k not in done_ids])} partial sessions")
+    else:
+        for path in (args.output, progress_path):
+            if os.path.exists(path):
+                os.remove(path)
     
-    # 保存结果
-    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
-    with open(args.output, 'w', encoding='utf-8') as f:
+    todo = [p for p in profiles if session_id_for(p) not in done_ids]
+    output = JsonlAppender(args.output)
+    progress = JsonlAppender(progress_path)
+    
+    if args.batch:
+        # batch_transport.py 位于仓库根目录
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from batch_transport import make_transport
+        transport = make_transport(args.batch, spool_dir=os.path.join(args.batch_dir, 'spool'),
+                                   base_url=args.api_url.rsplit('/chat/completions', 1)[0],
+                                   api_key=args.api_key)
+        sessions = generate_batch(
+            todo, args.methods, args.rounds, transport, args.batch_dir,
+            partial_rounds=partial_rounds,
+            on_round=lambda sid, record: progress.append({'session_id': sid, 'round': record}),
+            poll_interval=args.batch_poll
+        )
         for session in sessions:
-            f.write(json.dumps(session, ensure_ascii=False) + '\n')
+            output.append(session)
+        output.close()
+        progress.close()
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        print(f"Saved {len(sessions)} new sessions to {args.output} ({len(done_ids) + len(sessions)} total)")
+        return
+    
+    # 并发生成对话，每个会话完成后立即追加写入
+    def generate(indexed):
+        i, profile_data = indexed
+        session_id = session_id_for(profile_data)
+        print(f"Generating session {i+1}/{len(todo)} [{session_id}]...")
+        try:
+            session = generate_session(
+                profile_data, args.methods, args.rounds,
+                args.api_url, args.api_key,
+                completed_rounds=partial_rounds.get(session_id),
+                on_round=lambda sid, record: progress.append({'session_id': sid, 'round': record})
+            )
+        except Exception as e:
+            print(f"  ✗ Failed to generate {session_id}: {e}")
+            return False
+        output.append(session)
+        return True
+    
+    with ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix='profile') as executor:
+        succeeded = sum(executor.map(generate, enumerate(todo)))
+    
+    output.close()
+    progress.close()
+    
+    # 全部完成后逐轮进度文件不再需要
+    if succeeded == len(todo) and os.path.exists(progress_path):
+        os.remove(progress_path)
     
-    print(f"Saved {len(sessions)} sessions to {args.output}")
+    print(f"Saved {succeeded} new sessions to {args.output} ({len(done_ids) + succeeded} total)")
     print("Done! You can now upload this file to the benchmark platform.")
 
 
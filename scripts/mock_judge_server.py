@@ -0,0 +1,212 @@
+"""
+评审模型替身服务 - 用于本地测试端点池 / 调度 / 对冲
+Mock Judge Server - OpenAI-compatible stand-in for local testing
+
+实现 POST /v1/chat/completions (含 stream=true 的 SSE 流式输出)：评分由提示词哈希决定
+(任何替身对同一请求给出相同结果，因此多端点 / 对冲 / 故障转移不改变评测分数)。
+首 token 延迟、逐 token 生成时间、慢请求、错误与配额可配置；输出按空白切分计为 token，
+超过 max_tokens 时截断 (finish_reason=length)。客户端提前关闭流时停止生成。
+GET /stats 返回已处理的请求数与生成的 token 数。
+
+使用方法 / Usage:
+    python scripts/mock_judge_server.py --port 9001 --latency 0.05
+    python scripts/mock_judge_server.py --port 9002 --latency 0.2 --slow-rate 0.02 --slow-factor 20
+    python scripts/mock_judge_server.py --port 9003 --error-rate 0.5       # 不稳定的网关 (HTTP 500)
+    python scripts/mock_judge_server.py --port 9004 --rpm 120              # 配额用尽时返回 429
+    python scripts/mock_judge_server.py --port 9005 --token-latency 0.01 --trailing-words 150  # 结论后还有长篇评论
+
+    PERSONASTEER_JUDGE_POOL='[{"name": "a", "base_url": "http://127.0.0.1:9001/v1", "max_concurrency": 8},
+                              {"name": "b", "base_url": "http://127.0.0.1:9002/v1", "max_concurrency": 8}]' \\
+        python cli.py evaluate sample_data.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIMENSIONS = ('Style', 'Content', 'Naturalness', 'Personalization', 'Conversation')
+
+
+def judge_answer(prompt: str, reasoning_words: int = 20, trailing_words: int = 0) -> str:
+    """按提示词哈希生成可被评估器解析的确定性评审结果 (理由 → 结论 → 可选的结尾评论)"""
+    digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+    reasoning = ' '.join(f"reason{(digest >> i) % 97}" for i in range(reasoning_words))
+    trailing = ('\n\nAdditional commentary: ' + ' '.join('detail' for _ in range(trailing_words))) \
+        if trailing_words else ''
+    if 'Final Decision' in prompt:
+        return f"Judgment Reasoning: {reasoning}.\nFinal Decision: \\boxed{{{digest % 2}}}" + trailing
+    scores = [(digest >> (i * 8)) % 21 for i in range(len(DIMENSIONS))]
+    lines = [f"{name}: {score}/20" for name, score in zip(DIMENSIONS, scores)]
+    return f"Reasoning: {reasoning}.\n" + "\n".join(lines) + f"\nTotal: \\boxed{{{sum(scores)}}}" + trailing
+
+
+class MockJudge:
+    def __init__(self, latency: float, slow_rate: float, slow_factor: float, error_rate: float,
+                 rpm: int, seed: int, token_latency: float = 0.0, reasoning_words: int = 20,
+                 trailing_words: int = 0):
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.random = random.Random(seed)
+        self.token_latency = token_latency
+        self.reasoning_words = reasoning_words
+        self.trailing_words = trailing_words
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.tokens = 0
+        self.closed_streams = 0
+        self.sent = deque()
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """返回 (状态码, 延迟, 剩余配额)"""
+        with self.lock:
+            self.requests += 1
+            now = time.time()
+            while self.sent and now - self.sent[0] > 60:
+                self.sent.popleft()
+            if self.rpm and len(self.sent) >= self.rpm:
+                self.rate_limited += 1
+                return 429, 0.0, 0
+            self.sent.append(now)
+            remaining = self.rpm - len(self.sent) if self.rpm else None
+            if self.random.random() < self.error_rate:
+                self.errors += 1
+                return 500, self.latency, remaining
+            slow = self.random.random() < self.slow_rate
+            return 200, self.latency * (self.slow_factor if slow else 1), remaining
+
+
+def make_handler(judge: MockJudge):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, {'requests': judge.requests, 'errors': judge.errors,
+                                 'rate_limited': judge.rate_limited, 'tokens': judge.tokens,
+                                 'closed_streams': judge.closed_streams})
+            else:
+                self._send(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not self.path.endswith('/chat/completions'):
+                self._send(404, {'error': {'message': 'not found'}})
+                return
+            status, delay, remaining = judge.admit()
+            headers = {}
+            if judge.rpm:
+                headers = {'x-ratelimit-limit-requests': judge.rpm, 'x-ratelimit-remaining-requests': remaining}
+            if status == 429:
+                headers['retry-after'] = 1
+                self._send(429, {'error': {'message': 'rate limit exceeded', 'type': 'rate_limit'}}, headers)
+                return
+            time.sleep(delay)
+            if status != 200:
+                self._send(status, {'error': {'message': 'mock upstream failure', 'type': 'server_error'}})
+                return
+            prompt = request.get('messages', [{}])[-1].get('content', '')
+            tokens = re.findall(r'\S+\s*', judge_answer(prompt, judge.reasoning_words, judge.trailing_words))
+            finish_reason = 'stop'
+            if request.get('max_tokens') and len(tokens) > request['max_tokens']:
+                tokens = tokens[:request['max_tokens']]
+                finish_reason = 'length'
+            if request.get('stream'):
+                self._stream(request, tokens, finish_reason, headers)
+                return
+            time.sleep(judge.token_latency * len(tokens))
+            with judge.lock:
+                judge.tokens += len(tokens)
+            content = ''.join(tokens)
+            self._send(200, {
+                'id': f"chatcmpl-mock-{judge.requests}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'mock'),
+                'choices': [{'index': 0, 'finish_reason': finish_reason,
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(tokens),
+                          'total_tokens': len(prompt) // 4 + len(tokens)}
+            }, headers)
+
+        def _stream(self, request, tokens, finish_reason: str, headers):
+            """SSE 流式输出，每个 token 一个 chunk；客户端断开即停止生成"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            for name, value in headers.items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.close_connection = True
+
+            def chunk(delta, finish=None):
+                payload = {'id': f"chatcmpl-mock-{judge.requests}", 'object': 'chat.completion.chunk',
+                           'created': int(time.time()), 'model': request.get('model', 'mock'),
+                           'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+
+            try:
+                chunk({'role': 'assistant', 'content': ''})
+                for token in tokens:
+                    time.sleep(judge.token_latency)
+                    chunk({'content': token})
+                    with judge.lock:
+                        judge.tokens += 1
+                chunk({}, finish_reason)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                with judge.lock:
+                    judge.closed_streams += 1
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OpenAI-compatible mock judge server')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--latency', type=float, default=0.05, help='Response latency in seconds')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fraction of requests that are slow')
+    parser.add_argument('--slow-factor', type=float, default=10.0, help='Latency multiplier of slow requests')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute before answering 429 (0 = unlimited)')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Generation time per output token')
+    parser.add_argument('--reasoning-words', type=int, default=20, help='Words of reasoning before the verdict')
+    parser.add_argument('--trailing-words', type=int, default=0, help='Words of commentary after the verdict')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    judge = MockJudge(args.latency, args.slow_rate, args.slow_factor, args.error_rate, args.rpm, args.seed,
+                      args.token_latency, args.reasoning_words, args.trailing_words)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(judge))
+    print(f"Mock judge listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
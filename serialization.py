@@ -0,0 +1,144 @@
+"""
+PersonaSteer Benchmark - Serialization
+
+结果与断点文件的读写层：
+- JSON 后端：安装了 orjson 时使用 orjson，否则回退到标准库 json；输出均为紧凑格式 (无缩进)
+- 压缩：none / gzip / zstd (需要 zstandard)，写入时在文件名后追加 .gz / .zst
+- 读取：依次查找 path、path.zst、path.gz，并按文件头 magic 自动识别压缩格式，
+  因此旧的未压缩 (带缩进) 结果文件仍可直接读取
+
+默认压缩方式由环境变量 PERSONASTEER_COMPRESSION 指定 (none / gzip / zstd，默认 none)。
+"""
+
+import gzip
+import io
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+DEFAULT_COMPRESSION = os.environ.get('PERSONASTEER_COMPRESSION', 'none')
+
+
+def _default(obj):
+    """numpy 标量 / 数组等非标准类型"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """紧凑 JSON (UTF-8 字节)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def check_compression(compression: Optional[str]) -> str:
+    compression = compression or DEFAULT_COMPRESSION
+    if compression not in SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression} (expected one of {', '.join(SUFFIXES)})")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+    return compression
+
+
+def find(path: str) -> Optional[str]:
+    """返回 path 实际存在的变体 (未压缩 / .zst / .gz)，都不存在时返回 None"""
+    for suffix in ('', '.zst', '.gz'):
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return None
+
+
+def exists(path: str) -> bool:
+    return find(path) is not None
+
+
+def remove(path: str):
+    """删除 path 的所有变体"""
+    for suffix in ('', '.zst', '.gz'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+@contextmanager
+def open_write(path: str, compression: Optional[str] = None) -> Iterator[BinaryIO]:
+    """
+    原子写入：先写临时文件，成功后替换为 path + 压缩后缀，并删除其他压缩格式的旧文件
+
+    产出二进制流，可多次 write(bytes) 以逐段写出大对象。
+    """
+    compression = check_compression(compression)
+    final_path = path + SUFFIXES[compression]
+    tmp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.tmp"
+    raw = open(tmp_path, 'wb')
+    try:
+        if compression == 'gzip':
+            stream = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+        elif compression == 'zstd':
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+        else:
+            stream = raw
+        yield stream
+        if stream is not raw:
+            stream.close()
+        raw.close()
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        raw.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    for suffix in SUFFIXES.values():
+        if path + suffix != final_path and os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def save(obj: Any, path: str, compression: Optional[str] = None) -> str:
+    """序列化并原子写入，返回实际写入的文件路径"""
+    with open_write(path, compression) as f:
+        f.write(dumps(obj))
+    return path + SUFFIXES[check_compression(compression)]
+
+
+def read_bytes(path: str) -> bytes:
+    """读取 path (自动查找压缩变体) 并解压"""
+    actual = find(path)
+    if actual is None:
+        raise FileNotFoundError(path)
+    with open(actual, 'rb') as f:
+        data = f.read()
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError(f"{actual} is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data
+
+
+def load(path: str) -> Any:
+    """读取结果 / 断点文件，自动识别压缩格式"""
+    return loads(read_bytes(path))
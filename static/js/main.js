@@ -7,12 +7,21 @@ let uploadedFile = null;
 let uploadedFilename = null;
 let detectedMethods = [];
 let selectedMethods = [];
-let evaluationResults = null;
+let currentTaskId = null;
 
 // Chart instances
 let alCurveChart = null;
 let radarChart = null;
 
+// Longer AL curves are decimated to this many points per method
+const AL_CURVE_MAX_POINTS = 200;
+
+// Per-session table: only visible rows are rendered, pages are fetched as they scroll into view
+const SESSION_PAGE_SIZE = 100;
+const SESSION_ROW_HEIGHT = 40;
+const SESSION_OVERSCAN = 10;
+let sessionTable = null;
+
 // Colors for different methods
 const methodColors = {
     'Base': { bg: 'rgba(239, 68, 68, 0.2)', border: '#ef4444' },
@@ -27,6 +36,7 @@ const methodColors = {
 document.addEventListener('DOMContentLoaded', function() {
     setupFileUpload();
     setupNavigation();
+    setupSessionTable();
 });
 
 /**
@@ -92,8 +102,12 @@ function handleFileSelect(e) {
         if (data.success) {
             uploadedFilename = data.filename;
             statusBox.querySelector('.status-icon').textContent = '✅';
-            statusBox.querySelector('.status-text').textContent = 
-                `${data.message} (${data.sessions} sessions, ${data.methods.length} methods: ${data.methods.join(', ')})`;
+            let statusText = `${data.message} (${data.sessions} sessions, ${data.methods.length} methods: ${data.methods.join(', ')})`;
+            if (data.previous_tasks && data.previous_tasks.length > 0) {
+                const taskIds = data.previous_tasks.map(task => task.task_id).join(', ');
+                statusText += ` — ${data.previous_tasks.length} previous tasks: ${taskIds}`;
+            }
+            statusBox.querySelector('.status-text').textContent = statusText;
             
             // Use methods returned from server (already validated)
             if (data.methods && data.methods.length > 0) {
@@ -104,7 +118,14 @@ function handleFileSelect(e) {
                 parseFileForMethods(file);
             }
         } else {
-            throw new Error(data.error);
+            let message = data.error;
+            if (data.errors && data.errors.length > 0) {
+                message += '\n' + data.errors.join('\n');
+                if (data.truncated) {
+                    message += `\n… (${data.error_count - data.errors.length} more)`;
+                }
+            }
+            throw new Error(message);
         }
     })
     .catch(error => {
@@ -178,6 +199,7 @@ function updateSelectedMethods() {
     
     const startBtn = document.getElementById('startEvalBtn');
     startBtn.disabled = selectedMethods.length === 0 || !uploadedFilename;
+    document.getElementById('previewEvalBtn').disabled = startBtn.disabled;
     
     // Update button text to show selected count
     if (selectedMethods.length > 0) {
@@ -189,8 +211,9 @@ function updateSelectedMethods() {
 
 /**
  * Start evaluation
+ * @param {Object} [preview] - e.g. { per_round: 5 } for a sampled quick preview
  */
-function startEvaluation() {
+function startEvaluation(preview) {
     if (!uploadedFilename || selectedMethods.length === 0) return;
     
     const startBtn = document.getElementById('startEvalBtn');
@@ -199,6 +222,7 @@ function startEvaluation() {
     const progressText = document.getElementById('progressText');
     
     startBtn.disabled = true;
+    document.getElementById('previewEvalBtn').disabled = true;
     progress.classList.remove('hidden');
     progress.classList.add('evaluating');
     progressFill.style.width = '10%';
@@ -219,7 +243,10 @@ function startEvaluation() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
             filename: uploadedFilename,
-            methods: selectedMethods
+            methods: selectedMethods,
+            preview: preview || null,
+            // Summary and chart payload only; session rows are paged in after the charts render
+            include_results: false
         }),
         signal: controller.signal
     })
@@ -232,13 +259,13 @@ function startEvaluation() {
         progressFill.style.width = '100%';
         
         if (data.success) {
-            evaluationResults = data.results;
+            currentTaskId = data.task_id;
             progressText.textContent = '✅ ' + data.message;
             progress.classList.remove('evaluating');
             
             // Show results
             setTimeout(() => {
-                displayResults(evaluationResults);
+                displayResults(data.charts);
             }, 500);
         } else {
             throw new Error(data.error);
@@ -260,50 +287,51 @@ function startEvaluation() {
         
         progress.classList.remove('evaluating');
         startBtn.disabled = false;
+        document.getElementById('previewEvalBtn').disabled = false;
     });
 }
 
 /**
  * Display evaluation results
+ * @param {Object} charts - chart-ready payload from the server (see build_chart_payload)
  */
-function displayResults(results) {
+function displayResults(charts) {
     const resultsSection = document.getElementById('results');
     resultsSection.classList.remove('hidden');
     
     // Scroll to results
     resultsSection.scrollIntoView({ behavior: 'smooth' });
     
-    // Populate metrics grid
-    populateMetricsGrid(results);
+    // Summary first: metric cards and the comparison table are small
+    populateMetricsGrid(charts);
+    populateResultsTable(charts);
     
-    // Draw charts
-    drawALCurveChart(results);
-    drawRadarChart(results);
-    
-    // Populate table
-    populateResultsTable(results);
+    // Draw charts on the following frames so the summary paints first
+    requestAnimationFrame(() => {
+        drawALCurveChart(charts);
+        requestAnimationFrame(() => {
+            drawRadarChart(charts);
+            openSessionTable(charts.task_id);
+        });
+    });
 }
 
 /**
  * Populate metrics cards
  */
-function populateMetricsGrid(results) {
+function populateMetricsGrid(charts) {
     const grid = document.getElementById('metricsGrid');
     grid.innerHTML = '';
     
-    const methods = Object.keys(results.methods);
-    const bestMethod = findBestMethod(results.methods);
-    
-    methods.forEach(method => {
-        const data = results.methods[method];
-        const metrics = data.metrics;
-        const isBest = method === bestMethod;
+    charts.cards.forEach(cardData => {
+        // Preview results are estimates: show the 95% error bar
+        const error = charts.estimate && cardData.error != null ? ` ±${cardData.error}` : '';
         
         const card = document.createElement('div');
         card.className = 'metric-card';
         card.innerHTML = `
-            <div class="value">${metrics.AVG}</div>
-            <div class="label">${method} AVG ${isBest ? '🏆' : ''}</div>
+            <div class="value">${charts.estimate ? '≈' : ''}${cardData.AVG}${error}</div>
+            <div class="label">${cardData.method} AVG ${cardData.best ? '🏆' : ''}</div>
         `;
         grid.appendChild(card);
     });
@@ -312,84 +340,70 @@ function populateMetricsGrid(results) {
     const sessionsCard = document.createElement('div');
     sessionsCard.className = 'metric-card';
     sessionsCard.innerHTML = `
-        <div class="value">${results.total_sessions}</div>
+        <div class="value">${charts.total_sessions}</div>
         <div class="label">Total Sessions</div>
     `;
     grid.appendChild(sessionsCard);
 }
 
-/**
- * Find best performing method
- */
-function findBestMethod(methods) {
-    let best = null;
-    let bestScore = -Infinity;
-    
-    for (const [method, data] of Object.entries(methods)) {
-        if (data.metrics.AVG > bestScore) {
-            bestScore = data.metrics.AVG;
-            best = method;
-        }
-    }
-    
-    return best;
-}
-
 /**
  * Draw AL(k) curve chart
  */
-function drawALCurveChart(results) {
+function drawALCurveChart(charts) {
     const ctx = document.getElementById('alCurveChart').getContext('2d');
     
     if (alCurveChart) {
         alCurveChart.destroy();
     }
     
-    const datasets = [];
-    const methods = Object.keys(results.methods);
+    // Very long curves: decimated {x, y} points on a linear turn axis, no point markers or animation
+    const decimated = charts.al_curve.labels.length > AL_CURVE_MAX_POINTS;
     
-    methods.forEach((method, idx) => {
-        const data = results.methods[method];
-        const colors = methodColors[method] || methodColors['default'];
-        
-        datasets.push({
-            label: method,
-            data: data.al_curve,
+    const datasets = charts.al_curve.series.map(series => {
+        const colors = methodColors[series.method] || methodColors['default'];
+        return {
+            label: series.method,
+            data: decimated ? decimateLTTB(series.data, AL_CURVE_MAX_POINTS) : series.data,
             borderColor: colors.border,
             backgroundColor: colors.bg,
-            borderWidth: 3,
+            borderWidth: decimated ? 2 : 3,
             fill: true,
-            tension: 0.4,
-            pointRadius: 4,
-            pointHoverRadius: 6
-        });
+            tension: decimated ? 0 : 0.4,
+            pointRadius: decimated ? 0 : 4,
+            pointHoverRadius: decimated ? 4 : 6
+        };
     });
+    const labels = decimated ? undefined : charts.al_curve.labels;
     
-    // Calculate max rounds
-    const maxRounds = Math.max(...methods.map(m => results.methods[m].al_curve.length));
-    const labels = Array.from({ length: maxRounds }, (_, i) => `Turn ${i + 1}`);
+    const xScale = {
+        grid: { color: 'rgba(255,255,255,0.05)' },
+        ticks: { color: '#a0a0b0' }
+    };
+    if (decimated) {
+        Object.assign(xScale, { type: 'linear', min: 1, max: charts.al_curve.labels.length });
+        xScale.ticks.callback = value => `Turn ${value}`;
+    }
     
     alCurveChart = new Chart(ctx, {
         type: 'line',
-        data: { labels, datasets },
+        data: labels ? { labels, datasets } : { datasets },
         options: {
             responsive: true,
             maintainAspectRatio: true,
+            animation: !decimated,
             plugins: {
                 legend: {
                     position: 'top',
                     labels: { color: '#a0a0b0', font: { size: 12 } }
                 },
                 tooltip: {
-                    mode: 'index',
+                    // Decimated series no longer share x values
+                    mode: decimated ? 'nearest' : 'index',
                     intersect: false
                 }
             },
             scales: {
-                x: {
-                    grid: { color: 'rgba(255,255,255,0.05)' },
-                    ticks: { color: '#a0a0b0' }
-                },
+                x: xScale,
                 y: {
                     min: 0,
                     max: 100,
@@ -411,25 +425,64 @@ function drawALCurveChart(results) {
     });
 }
 
+/**
+ * Largest-Triangle-Three-Buckets decimation: keep `threshold` points of a long series
+ * while preserving its peaks and dips. Returns {x, y} points, x being the turn number.
+ */
+function decimateLTTB(data, threshold) {
+    const points = data.map((y, i) => ({ x: i + 1, y }));
+    if (points.length <= threshold) return points;
+    
+    const sampled = [points[0]];
+    const bucketSize = (points.length - 2) / (threshold - 2);
+    let previous = 0;
+    for (let i = 0; i < threshold - 2; i++) {
+        // Average of the next bucket
+        const nextStart = Math.floor((i + 1) * bucketSize) + 1;
+        const nextEnd = Math.min(Math.floor((i + 2) * bucketSize) + 1, points.length);
+        let avgX = 0, avgY = 0;
+        for (let j = nextStart; j < nextEnd; j++) {
+            avgX += points[j].x;
+            avgY += points[j].y;
+        }
+        avgX /= nextEnd - nextStart;
+        avgY /= nextEnd - nextStart;
+        
+        // Point of the current bucket forming the largest triangle with the previous pick and that average
+        const a = points[previous];
+        let chosen = Math.floor(i * bucketSize) + 1;
+        let maxArea = -1;
+        for (let j = chosen; j < nextStart; j++) {
+            const area = Math.abs((a.x - avgX) * (points[j].y - a.y) - (a.x - points[j].x) * (avgY - a.y));
+            if (area > maxArea) {
+                maxArea = area;
+                chosen = j;
+            }
+        }
+        sampled.push(points[chosen]);
+        previous = chosen;
+    }
+    sampled.push(points[points.length - 1]);
+    return sampled;
+}
+
 /**
  * Draw radar chart
  */
-function drawRadarChart(results) {
+function drawRadarChart(charts) {
     const ctx = document.getElementById('radarChart').getContext('2d');
     
     if (radarChart) {
         radarChart.destroy();
     }
     
-    const radarData = results.radar_data;
-    const methods = Object.keys(radarData);
-    const dimensions = ['AVG', 'Slope', 'R2', 'Consistency', 'Improvement'];
+    const dimensions = charts.radar.dimensions;
     
-    const datasets = methods.map((method, idx) => {
-        const colors = methodColors[method] || methodColors['default'];
+    const datasets = charts.radar.series.map(series => {
+        const colors = methodColors[series.method] || methodColors['default'];
         return {
-            label: method,
-            data: dimensions.map(d => radarData[method][d]),
+            label: series.method,
+            data: series.data,
             borderColor: colors.border,
             backgroundColor: colors.bg,
             borderWidth: 2,
@@ -473,51 +526,208 @@ function drawRadarChart(results) {
 /**
  * Populate results table
  */
-function populateResultsTable(results) {
+function populateResultsTable(charts) {
     const tbody = document.getElementById('resultsTableBody');
     tbody.innerHTML = '';
     
-    const methods = Object.keys(results.methods);
-    const bestAVG = Math.max(...methods.map(m => results.methods[m].metrics.AVG));
-    const bestSlope = Math.max(...methods.map(m => results.methods[m].metrics.Slope));
-    const bestR2 = Math.max(...methods.map(m => results.methods[m].metrics.R2));
-    const bestImprovement = Math.max(...methods.map(m => results.methods[m].metrics.Improvement || 0));
+    // Preview results: trend metrics come from the estimated AL curve, not the full-run regression
+    const curveBased = charts.curve_based || [];
     
-    methods.forEach(method => {
-        const data = results.methods[method];
-        const metrics = data.metrics;
+    charts.table.forEach(rowData => {
+        const best = key => rowData.best.includes(key) ? 'best' : '';
+        const value = key => curveBased.includes(key)
+            ? `<span title="Computed from the estimated AL curve">~${rowData[key]}</span>` : rowData[key];
         
         const row = document.createElement('tr');
         row.innerHTML = `
-            <td><strong>${method}</strong></td>
-            <td class="${metrics.AVG === bestAVG ? 'best' : ''}">${metrics.AVG}</td>
-            <td class="${metrics.Slope === bestSlope ? 'best' : ''}">${metrics.Slope}</td>
-            <td class="${metrics.R2 === bestR2 ? 'best' : ''}">${metrics.R2}</td>
-            <td class="${metrics.Improvement === bestImprovement ? 'best' : ''}">${metrics.Improvement || 0}</td>
-            <td>${data.binary_alignment_rate}%</td>
+            <td><strong>${rowData.method}</strong></td>
+            <td class="${best('AVG')}">${rowData.AVG}</td>
+            <td class="${best('Slope')}">${value('Slope')}</td>
+            <td class="${best('R2')}">${value('R2')}</td>
+            <td class="${best('Improvement')}">${value('Improvement')}</td>
+            <td>${rowData.binary_alignment_rate}%</td>
         `;
         tbody.appendChild(row);
     });
 }
 
 /**
- * Export results as JSON
+ * Setup the per-session table (rows are re-rendered on scroll, at most once per frame)
  */
-function exportResults() {
-    if (!evaluationResults) return;
-    
-    const blob = new Blob([JSON.stringify(evaluationResults, null, 2)], {
-        type: 'application/json'
+function setupSessionTable() {
+    const viewport = document.getElementById('sessionViewport');
+    viewport.style.setProperty('--row-height', `${SESSION_ROW_HEIGHT}px`);
+    viewport.addEventListener('scroll', scheduleSessionRender, { passive: true });
+}
+
+/**
+ * Show the per-session table of a task, fetching its first page
+ */
+function openSessionTable(taskId) {
+    sessionTable = {
+        taskId,
+        methods: [],
+        total: 0,
+        sort: null,
+        order: 'desc',
+        pages: new Map(),
+        pending: new Set(),
+        generation: sessionTable ? sessionTable.generation + 1 : 0,
+        frame: null
+    };
+    document.getElementById('sessionViewport').scrollTop = 0;
+    document.getElementById('sessionSpacer').innerHTML = '';
+    document.getElementById('sessionTableHeader').innerHTML = '';
+    document.getElementById('sessionTableCount').textContent = '';
+    fetchSessionPage(0);
+}
+
+/**
+ * Sort the session table by a column (click again to reverse)
+ */
+function sortSessionTable(key) {
+    if (!sessionTable) return;
+    if (sessionTable.sort === key) {
+        sessionTable.order = sessionTable.order === 'desc' ? 'asc' : 'desc';
+    } else {
+        sessionTable.sort = key;
+        sessionTable.order = key === 'session_id' ? 'asc' : 'desc';
+    }
+    // Rows already fetched belong to the previous order
+    sessionTable.pages = new Map();
+    sessionTable.pending = new Set();
+    sessionTable.generation += 1;
+    document.getElementById('sessionViewport').scrollTop = 0;
+    renderSessionHeader();
+    fetchSessionPage(0);
+}
+
+/**
+ * Fetch one page of session rows (each page once; responses for an older order are dropped)
+ */
+function fetchSessionPage(page) {
+    const state = sessionTable;
+    if (state.pages.has(page) || state.pending.has(page)) return;
+    state.pending.add(page);
+    
+    const generation = state.generation;
+    const params = new URLSearchParams({ offset: page * SESSION_PAGE_SIZE, limit: SESSION_PAGE_SIZE });
+    if (state.sort) {
+        params.set('sort', state.sort);
+        params.set('order', state.order);
+    }
+    fetch(`/results/${encodeURIComponent(state.taskId)}/sessions?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            if (state !== sessionTable || generation !== state.generation) return;
+            state.pending.delete(page);
+            if (!data.success) throw new Error(data.error);
+            
+            const firstPage = state.methods.length === 0;
+            state.pages.set(page, data.rows);
+            state.methods = data.methods;
+            state.total = data.total;
+            if (firstPage) renderSessionHeader();
+            scheduleSessionRender();
+        })
+        .catch(error => {
+            state.pending.delete(page);
+            console.error('Error loading sessions:', error);
+        });
+}
+
+function scheduleSessionRender() {
+    if (!sessionTable || sessionTable.frame !== null) return;
+    sessionTable.frame = requestAnimationFrame(() => {
+        sessionTable.frame = null;
+        renderSessionRows();
+    });
+}
+
+/**
+ * Header row and grid columns: session, rounds, one column per method
+ */
+function renderSessionHeader() {
+    const state = sessionTable;
+    const columns = `minmax(10rem, 2fr) 6rem repeat(${state.methods.length}, minmax(8rem, 1fr))`;
+    document.getElementById('sessionTable').style.setProperty('--session-columns', columns);
+    document.getElementById('sessionTableCount').textContent = state.total ? `(${state.total})` : '';
+    
+    const arrow = key => state.sort === key ? (state.order === 'desc' ? ' ▼' : ' ▲') : '';
+    const header = document.getElementById('sessionTableHeader');
+    header.innerHTML = '';
+    ['session_id', 'rounds', ...state.methods].forEach((key, i) => {
+        const cell = document.createElement('div');
+        cell.className = 'session-cell sortable';
+        cell.textContent = (i === 0 ? 'Session' : i === 1 ? 'Rounds' : `${key} AVG / Binary`) + arrow(key);
+        cell.addEventListener('click', () => sortSessionTable(key));
+        header.appendChild(cell);
     });
+}
+
+/**
+ * Render only the rows inside the viewport (plus overscan); fetch their pages if needed
+ */
+function renderSessionRows() {
+    const state = sessionTable;
+    const viewport = document.getElementById('sessionViewport');
+    const spacer = document.getElementById('sessionSpacer');
+    spacer.style.height = `${state.total * SESSION_ROW_HEIGHT}px`;
+    
+    const first = Math.max(Math.floor(viewport.scrollTop / SESSION_ROW_HEIGHT) - SESSION_OVERSCAN, 0);
+    const last = Math.min(Math.ceil((viewport.scrollTop + viewport.clientHeight) / SESSION_ROW_HEIGHT) + SESSION_OVERSCAN,
+                          state.total);
+    
+    const fragment = document.createDocumentFragment();
+    for (let index = first; index < last; index++) {
+        const page = Math.floor(index / SESSION_PAGE_SIZE);
+        const rows = state.pages.get(page);
+        if (!rows) fetchSessionPage(page);
+        
+        const rowData = rows ? rows[index - page * SESSION_PAGE_SIZE] : null;
+        const row = document.createElement('div');
+        row.className = 'session-row';
+        row.style.top = `${index * SESSION_ROW_HEIGHT}px`;
+        const cells = rowData
+            ? [rowData.session_id, rowData.rounds,
+               ...rowData.scores.map((score, i) => score === null ? '—' : `${score} / ${rowData.binary[i]}%`)]
+            : ['…', '', ...state.methods.map(() => '')];
+        cells.forEach(value => {
+            const cell = document.createElement('div');
+            cell.className = 'session-cell';
+            cell.textContent = value;
+            row.appendChild(cell);
+        });
+        fragment.appendChild(row);
+    }
+    spacer.replaceChildren(fragment);
+}
+
+/**
+ * Export results as JSON (the full results are only fetched on demand)
+ */
+function exportResults() {
+    if (!currentTaskId) return;
     
-    const url = URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = `benchmark_results_${evaluationResults.task_id}.json`;
-    document.body.appendChild(a);
-    a.click();
-    document.body.removeChild(a);
-    URL.revokeObjectURL(url);
+    fetch(`/results/${encodeURIComponent(currentTaskId)}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) throw new Error(data.error);
+            
+            const blob = new Blob([JSON.stringify(data.results, null, 2)], {
+                type: 'application/json'
+            });
+            
+            const url = URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = url;
+            a.download = `benchmark_results_${currentTaskId}.json`;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
+            URL.revokeObjectURL(url);
+        })
+        .catch(error => console.error('Error exporting results:', error));
 }
 
 /**
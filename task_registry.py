@@ -0,0 +1,265 @@
+"""
+PersonaSteer Benchmark - Task Registry
+
+多进程部署 (gunicorn 等多个 worker) 的共享任务状态：
+- tasks 表 (SQLite) 记录每个评测任务的请求键、状态、所属 worker 与心跳，任何 worker 都能回答任务状态；
+- claim() 在同一事务中检查并登记，相同请求 (文件、方法、评审模型、模式与参数相同) 同一时刻只会运行一次；
+  其他 worker 收到相同请求时等待正在运行的任务完成并复用其结果；
+- 运行中的任务定期写心跳，心跳超时 (worker 崩溃) 的任务可被重新认领，并沿用原 task_id 从断点续评；
+  被取消或失败的任务在再次收到相同请求时同样沿用原 task_id 续评；
+- request_cancel() 设置取消标记，运行该任务的 worker 轮询到后在本进程内协作式取消；
+- file_lock() 为上传元数据等 JSON 文件的读-改-写提供跨进程文件锁。
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from scheduler import TaskCancelled
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    request_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    heartbeat REAL,
+    completed_sessions INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    request TEXT,
+    error TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_key ON tasks (request_key, status);
+'''
+
+HEARTBEAT_SECONDS = 10
+CANCEL_POLL_SECONDS = 1
+STALE_SECONDS = 60   # 超过此时间没有心跳的运行中任务视为已中断
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    跨进程互斥锁 (path + '.lock' 上的 flock)，同时在进程内按路径互斥
+
+    没有 fcntl 的平台上只保证进程内互斥。
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def request_key(**request) -> str:
+    """任务请求的规范化键：参数相同的请求得到相同的键"""
+    return json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class TaskRun:
+    """运行中的任务：后台线程定期写心跳与已完成会话数，并轮询取消标记"""
+
+    def __init__(self, registry: 'TaskRegistry', task_id: str, on_cancel: Optional[Callable[[], Any]] = None):
+        self.registry = registry
+        self.task_id = task_id
+        self.on_cancel = on_cancel
+        self.completed_sessions = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def advance(self, *_):
+        """作为 on_session 回调使用"""
+        self.completed_sessions += 1
+
+    def _beat(self):
+        last_beat = time.time()
+        cancel_seen = False
+        while not self._stop.wait(min(CANCEL_POLL_SECONDS, self.registry.heartbeat_seconds)):
+            try:
+                if time.time() - last_beat >= self.registry.heartbeat_seconds:
+                    self.registry.heartbeat(self.task_id, self.completed_sessions)
+                    last_beat = time.time()
+                if not cancel_seen and self.on_cancel and self.registry.cancel_requested(self.task_id):
+                    cancel_seen = True
+                    self.on_cancel()
+            except sqlite3.Error as e:
+                print(f"Heartbeat failed for task {self.task_id}: {e}")
+
+
+class TaskRegistry:
+    """基于 SQLite 的进程安全任务登记表"""
+
+    def __init__(self, db_path: str, heartbeat_seconds: float = HEARTBEAT_SECONDS,
+                 stale_seconds: float = STALE_SECONDS, wal: bool = True):
+        self.db_path = db_path
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.wal = wal
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(tasks)')}
+            if 'cancel_requested' not in columns:
+                conn.execute('ALTER TABLE tasks ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        if self.wal:
+            conn.execute('PRAGMA journal_mode = WAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _is_stale(self, row) -> bool:
+        return row['status'] == 'running' and time.time() - (row['heartbeat'] or 0) > self.stale_seconds
+
+    def claim(self, key: str, task_id: str, request: Dict[str, Any] = None) -> Tuple[str, bool]:
+        """
+        登记一个任务
+
+        Returns:
+            (task_id, owned): owned 为 False 时，相同请求的任务正由其他 worker 运行，task_id 为该任务；
+            心跳超时、已取消或失败的同键任务被接管时返回其原 task_id (从断点续评)
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT * FROM tasks WHERE request_key = ? AND status = 'running' ORDER BY started_at LIMIT 1",
+                    (key,)
+                ).fetchone()
+                if row is not None and not self._is_stale(row):
+                    conn.execute('COMMIT')
+                    return row['task_id'], False
+                if row is None:
+                    row = conn.execute(
+                        "SELECT * FROM tasks WHERE request_key = ? AND status IN ('cancelled', 'failed') "
+                        "ORDER BY started_at DESC LIMIT 1",
+                        (key,)
+                    ).fetchone()
+                if row is not None:
+                    # 原 worker 已失联，或任务曾被取消 / 失败：沿用 task_id 以便从 checkpoint 续评
+                    print(f"Resuming task {row['task_id']} ({row['status']}, owner {row['owner']})")
+                    task_id = row['task_id']
+                    conn.execute(
+                        "UPDATE tasks SET status = 'running', owner = ?, heartbeat = ?, cancel_requested = 0, "
+                        "error = NULL, finished_at = NULL WHERE task_id = ?",
+                        (self.owner, now, task_id)
+                    )
+                else:
+                    conn.execute(
+                        "INSERT INTO tasks (task_id, request_key, status, owner, heartbeat, request, started_at) "
+                        "VALUES (?, ?, 'running', ?, ?, ?, ?)",
+                        (task_id, key, self.owner, now, json.dumps(request or {}, ensure_ascii=False), now)
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return task_id, True
+
+    @contextmanager
+    def running(self, task_id: str, on_cancel: Optional[Callable[[], Any]] = None):
+        """
+        任务运行期间持续写心跳，收到取消请求时调用 on_cancel；
+        正常结束标记 done，TaskCancelled 标记 cancelled，其他异常标记 failed
+        """
+        run = TaskRun(self, task_id, on_cancel)
+        status = self.get(task_id)
+        if status is not None:
+            run.completed_sessions = status['completed_sessions']   # 续评时接着上次的计数
+        run._thread.start()
+        try:
+            yield run
+        except BaseException as e:
+            run._stop.set()
+            status = 'cancelled' if isinstance(e, TaskCancelled) else 'failed'
+            self.finish(task_id, status, error=str(e), completed_sessions=run.completed_sessions)
+            raise
+        run._stop.set()
+        self.finish(task_id, 'done', completed_sessions=run.completed_sessions)
+
+    def heartbeat(self, task_id: str, completed_sessions: int):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET heartbeat = ?, completed_sessions = ? WHERE task_id = ? AND owner = ?",
+                (time.time(), completed_sessions, task_id, self.owner)
+            )
+
+    def request_cancel(self, task_id: str) -> bool:
+        """请求取消运行中的任务，返回任务是否在运行"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET cancel_requested = 1 WHERE task_id = ? AND status = 'running'", (task_id,)
+            )
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, task_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute('SELECT cancel_requested FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def finish(self, task_id: str, status: str, error: Optional[str] = None, completed_sessions: int = None):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE tasks SET status = ?, error = ?, finished_at = ?, '
+                'completed_sessions = COALESCE(?, completed_sessions) WHERE task_id = ? AND owner = ?',
+                (status, error, time.time(), completed_sessions, task_id, self.owner)
+            )
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """任务状态；心跳超时的运行中任务报告为 interrupted"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'task_id': row['task_id'],
+            'status': 'interrupted' if self._is_stale(row) else row['status'],
+            'owner': row['owner'],
+            'completed_sessions': row['completed_sessions'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'request': json.loads(row['request'] or '{}'),
+            'error': row['error'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'heartbeat': row['heartbeat']
+        }
+
+    def wait(self, task_id: str, poll_interval: float = 1.0, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待其他 worker 上的任务结束 (done / failed / cancelled / interrupted)，返回最终状态"""
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            status = self.get(task_id)
+            if status is None or status['status'] != 'running':
+                return status
+            if deadline and time.time() > deadline:
+                return status
+            time.sleep(poll_interval)
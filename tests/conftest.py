@@ -0,0 +1,108 @@
+"""
+测试公共设施：评审调用由 scripts/mock_judge_server.judge_answer 在进程内给出 (按提示词哈希的确定性结果)，
+不发出网络请求
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from evaluator import BenchmarkEvaluator  # noqa: E402
+from mock_judge_server import judge_answer  # noqa: E402
+
+
+class StubJudge:
+    """替换 BenchmarkEvaluator._request_judge，记录实际发出的评审请求"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, params, max_retries, ctx, kind=None):
+        self.prompts.append(prompt)
+        if ctx is not None:
+            ctx.count('api_calls')
+        return judge_answer(prompt)
+
+
+@pytest.fixture
+def stub_judge(monkeypatch):
+    for name in ('PERSONASTEER_SCORING', 'PERSONASTEER_HISTORY', 'PERSONASTEER_JUDGE_POOL'):
+        monkeypatch.delenv(name, raising=False)
+    judge = StubJudge()
+    monkeypatch.setattr(BenchmarkEvaluator, '_request_judge',
+                        lambda self, *args, **kwargs: judge(*args, **kwargs))
+    return judge
+
+
+class FakeClient:
+    """替换 Endpoint.client：依次给出预设结果 (字符串为回复内容，异常则抛出；最后一个结果一直重复)"""
+
+    def __init__(self, *outcomes, headers=None):
+        self.outcomes = list(outcomes)
+        self.headers = headers or {}
+        self.calls = 0
+        raw = SimpleNamespace(create=self.create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=raw))
+
+    def create(self, timeout=None, **body):
+        outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+        self.calls += 1
+        if isinstance(outcome, BaseException):
+            raise outcome
+        message = SimpleNamespace(content=outcome)
+        return SimpleNamespace(headers=self.headers,
+                               parse=lambda: SimpleNamespace(choices=[SimpleNamespace(message=message)]))
+
+
+def api_error(cls, status=None, headers=None):
+    """SDK 异常 (不依赖 SDK 所用的 HTTP 库构造 request / response)"""
+    error = cls.__new__(cls)
+    Exception.__init__(error, cls.__name__)
+    error.response = SimpleNamespace(status_code=status, headers=headers or {})
+    return error
+
+
+def make_sessions(n_sessions, n_rounds, methods=('Base', 'Ours'), with_ids=True):
+    sessions = []
+    for i in range(n_sessions):
+        session = {
+            'user_profile': f'Profile {i}: likes hiking and jazz',
+            'user_personality': 'Outgoing and curious',
+            'rounds': [{
+                'round': k + 1,
+                'user_message': f'Session {i} message {k}',
+                'responses': {m: f'{m} reply {k} to session {i}' for m in methods}
+            } for k in range(n_rounds)]
+        }
+        if with_ids:
+            session['session_id'] = f'user_{i:03d}'
+        sessions.append(session)
+    return sessions
+
+
+def write_jsonl(path, sessions):
+    with open(path, 'w', encoding='utf-8') as f:
+        for session in sessions:
+            f.write(json.dumps(session, ensure_ascii=False) + '\n')
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def web_app(tmp_path_factory):
+    """Flask 应用 (导入时创建的 uploads / results / tasks.db 等都放在临时目录中)"""
+    workdir = tmp_path_factory.mktemp('webapp')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    os.environ.setdefault('PERSONASTEER_SECRET_KEY', 'test')
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,31 @@
+import random
+
+from evaluator import SequentialComparison
+
+
+def _simulate(delta, seed, max_sessions=200):
+    """两个方法的逐轮得分 (会话效应 + 噪声)；返回 (停止时的会话数, 是否报告显著)"""
+    rng = random.Random(seed)
+    tracker = SequentialComparison('Base', ['Ours'], alpha=0.05, min_sessions=10, max_sessions=max_sessions)
+    for n in range(1, max_sessions + 1):
+        effect = rng.gauss(50, 10)
+        tracker.add({
+            'Base': {'scores': [min(100, max(0, round(rng.gauss(effect, 15)))) for _ in range(5)]},
+            'Ours': {'scores': [min(100, max(0, round(rng.gauss(effect + delta, 15)))) for _ in range(5)]}
+        })
+        if tracker.settled():
+            return n, tracker.summary()['Ours']['significant']
+    return max_sessions, False
+
+
+def test_no_difference_rarely_stops_as_significant():
+    # 每个会话之后都检查停止条件：随时有效的置信序列把错误停止率控制在 alpha 以内
+    runs = [_simulate(0, seed) for seed in range(300)]
+    false_stops = sum(significant for _, significant in runs) / len(runs)
+    assert false_stops <= 0.05
+
+
+def test_real_difference_stops_early():
+    runs = [_simulate(5, seed) for seed in range(50)]
+    assert all(significant for _, significant in runs)
+    assert sum(n for n, _ in runs) / len(runs) < 100
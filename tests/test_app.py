@@ -0,0 +1,131 @@
+import io
+import json
+
+from conftest import make_sessions
+
+
+def _upload(client, content, name):
+    return client.post('/upload', data={'file': (io.BytesIO(content), name)},
+                       content_type='multipart/form-data').get_json()
+
+
+def test_upload_merges_metadata_written_concurrently(web_app, monkeypatch):
+    content = ''.join(json.dumps(s) + '\n' for s in make_sessions(2, 3)).encode()
+    client = web_app.app.test_client()
+    first = _upload(client, content, 'a.jsonl')
+    file_id = first['file_id']
+
+    # 另一个上传在本次检查之后、加锁之前已写入元数据 (并记录了任务)：新上传路径必须合并而不是覆盖
+    original_load = web_app.load_upload_meta
+    calls = []
+
+    def stale_first_check(fid):
+        calls.append(fid)
+        return None if len(calls) == 1 else original_load(fid)
+
+    web_app.record_task(file_id, 't1', ['Base', 'Ours'], 'judge')
+    monkeypatch.setattr(web_app, 'load_upload_meta', stale_first_check)
+    second = _upload(client, content, 'b.jsonl')
+    monkeypatch.undo()
+
+    meta = web_app.load_upload_meta(file_id)
+    assert meta['original_names'] == ['a.jsonl', 'b.jsonl']
+    assert [task['task_id'] for task in meta['tasks']] == ['t1']
+    assert [task['task_id'] for task in second['previous_tasks']] == ['t1']
+
+
+def test_cached_task_requires_same_scoring_and_history(web_app, tmp_path, monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'RESULTS_FOLDER', str(tmp_path))
+    (tmp_path / 't_llm_results.json').write_text('{}')
+    (tmp_path / 't_old_results.json').write_text('{}')
+    meta = {'tasks': [
+        {'task_id': 't_old', 'methods': ['Base'], 'judge_model': 'judge'},   # 记录 scoring / history 之前的任务
+        {'task_id': 't_llm', 'methods': ['Base'], 'judge_model': 'judge', 'scoring': 'llm', 'history': 'window:8'}
+    ]}
+    assert web_app.find_cached_task(meta, ['Base'], 'judge', 'llm', 'window:8')[0] == 't_llm'
+    assert web_app.find_cached_task(meta, ['Base'], 'judge', 'llm', 'full')[0] == 't_old'
+    assert web_app.find_cached_task(meta, ['Base'], 'judge', 'heuristic', 'full') is None
+    assert web_app.find_cached_task(meta, ['Base'], 'judge', 'llm', 'summary:4') is None
+
+
+def test_upload_validation_uses_the_long_lived_pool(web_app, monkeypatch):
+    import validator
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError('upload handler created a process pool')
+
+    monkeypatch.setenv('PERSONASTEER_VALIDATION_WORKERS', '2')
+    pool = web_app.create_validation_pool()
+    chunks = []
+    pool_map = pool.map
+    monkeypatch.setattr(pool, 'map', lambda fn, *args: chunks.append(len(args[0])) or pool_map(fn, *args))
+    monkeypatch.setattr(web_app, 'validation_pool', pool)
+    chunk_ranges = validator._chunk_ranges
+    monkeypatch.setattr(validator, 'ProcessPoolExecutor', no_pool)
+    monkeypatch.setattr(validator, '_chunk_ranges', lambda path, chunk_size: chunk_ranges(path, 256))
+    try:
+        client = web_app.app.test_client()
+        for name, sessions in (('pool_a.jsonl', make_sessions(20, 3)), ('pool_b.jsonl', make_sessions(12, 2))):
+            content = ''.join(json.dumps(s) + '\n' for s in sessions).encode()
+            assert _upload(client, content, name)['sessions'] == len(sessions)
+    finally:
+        pool.shutdown()
+    # 两次上传都在启动时创建的同一个进程池中分块校验
+    assert len(chunks) == 2 and min(chunks) > 1
+    assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+def test_recompute_runs_in_background(web_app, stub_judge, tmp_path, monkeypatch):
+    from evaluator import BenchmarkEvaluator, write_results
+
+    monkeypatch.setitem(web_app.app.config, 'RESULTS_FOLDER', str(tmp_path))
+    results = BenchmarkEvaluator().evaluate_sessions(make_sessions(2, 3), ['Base', 'Ours'], 'old')
+    results['metrics_version'] = 0
+    write_results(results, str(tmp_path / 'old_results.json'))
+
+    client = web_app.app.test_client()
+    response = client.post('/api/recompute', json={'task_ids': ['old']})
+    assert response.status_code == 202
+    task_id = response.get_json()['task_id']
+
+    status = web_app.task_registry.wait(task_id, poll_interval=0.05, timeout=10)
+    assert status['status'] == 'done' and status['completed_sessions'] == 1
+    summary = client.get(f'/api/recompute/{task_id}').get_json()
+    assert summary['success'] and summary['files'] == 1 and summary['current'] == 0
+    assert client.get('/api/recompute/unknown').status_code == 404
+
+
+def test_results_cache_is_bounded_by_bytes(web_app, tmp_path, monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'RESULTS_FOLDER', str(tmp_path))
+    monkeypatch.setattr(web_app, '_results_cache', web_app.OrderedDict())
+    monkeypatch.setattr(web_app, '_results_cache_bytes', 0)
+    monkeypatch.setattr(web_app, 'RESULTS_CACHE_MAX_BYTES', 12_000)
+    for i in range(4):
+        (tmp_path / f't{i}_results.json').write_text(json.dumps({'task_id': f't{i}', 'pad': str(i) * 4000}))
+
+    client = web_app.app.test_client()
+    for i in range(4):
+        for encoding in ('identity', 'gzip'):
+            response = client.get(f'/results/t{i}', headers={'Accept-Encoding': encoding})
+            assert response.status_code == 200
+
+    cache = web_app._results_cache
+    assert web_app._results_cache_bytes == sum(entry['size'] for entry in cache.values()) <= 12_000
+    assert list(cache)[-1].endswith('t3_results.json') and len(cache) < 4
+    assert all(entry['size'] == sum(map(len, entry['bodies'].values())) for entry in cache.values())
+
+
+def test_evaluate_rejects_malformed_modes_before_claiming(web_app, monkeypatch):
+    client = web_app.app.test_client()
+    content = ''.join(json.dumps(s) + '\n' for s in make_sessions(2, 2)).encode()
+    filename = _upload(client, content, 'modes.jsonl')['filename']
+
+    def no_claim(*args, **kwargs):
+        raise AssertionError('malformed request claimed a task')
+
+    monkeypatch.setattr(web_app.task_registry, 'claim', no_claim)
+    for options in ({'adaptive': True}, {'adaptive': {'baseline': 'Base', 'precision': 'tight'}},
+                    {'adaptive': {'baseline': 'Base', 'alpha': 2}}, {'adaptive': {'baseline': 'Best'}},
+                    {'preview': True}, {'preview': {'per_round': 'five'}}, {'preview': {'seed': [1]}}):
+        response = client.post('/evaluate', json={'filename': filename, 'methods': ['Base', 'Ours'], **options})
+        assert response.status_code == 200 and response.get_json()['success'] is False, options
@@ -0,0 +1,18 @@
+import pytest
+
+import cli
+
+
+@pytest.mark.parametrize('options', [
+    ['--stream', '--preview', '2'],
+    ['--stream', '--batch', 'local'],
+    ['--stream', '--adaptive-baseline', 'Base'],
+    ['--base-task', 'old', '--preview', '2'],
+    ['--base-task', 'old', '--adaptive-baseline', 'Base'],
+    ['--preview', '2', '--batch', 'local'],
+])
+def test_evaluate_rejects_conflicting_modes(options, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(['evaluate', 'data.jsonl'] + options)
+    assert exc.value.code == 2
+    assert 'not' in capsys.readouterr().err
@@ -0,0 +1,98 @@
+import itertools
+import time
+
+import openai
+import pytest
+from conftest import api_error
+
+from evaluator import BenchmarkEvaluator, TaskContext
+from hedging import HedgePolicy
+
+BODY = {'model': 'judge', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+
+def slow_tail(evaluator, monkeypatch, *outcomes):
+    """按调用顺序替换 _timed_call：outcomes 为 (延迟秒数, 内容或异常)，之后的调用沿用最后一项"""
+    counter = itertools.count()
+
+    def timed_call(body, ctx, kind=None, started=None):
+        if started is not None:
+            started.set()
+        seconds, outcome = outcomes[min(next(counter), len(outcomes) - 1)]
+        time.sleep(seconds)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, seconds
+
+    monkeypatch.setattr(evaluator, '_timed_call', timed_call)
+    return counter
+
+
+def hedged_evaluator(budget=1.0, latency=0.02, samples=20):
+    evaluator = BenchmarkEvaluator(judge_pool=None, hedge_budget=budget)
+    for _ in range(samples):
+        evaluator.hedge.latencies.add(latency)
+    return evaluator
+
+
+def test_hedge_waits_for_enough_samples_and_the_quantile_delay(monkeypatch):
+    evaluator = hedged_evaluator(samples=19)
+    calls = slow_tail(evaluator, monkeypatch, (0.3, 'primary'), (0.01, 'hedge'))
+    ctx = TaskContext('t')
+    # 延迟样本不足：不对冲，等待首发请求返回
+    assert evaluator._hedged_call(BODY, ctx) == 'primary' and next(calls) == 1
+
+    evaluator = hedged_evaluator(latency=0.2)
+    calls = slow_tail(evaluator, monkeypatch, (0.05, 'primary'), (0.01, 'hedge'))
+    # 首发请求在 p95 延迟内返回：不对冲
+    assert evaluator._hedged_call(BODY, ctx) == 'primary' and next(calls) == 1
+    assert ctx.snapshot()['hedges_launched'] == 0
+
+
+def test_hedge_wins_against_a_slow_tail_primary(monkeypatch):
+    evaluator = hedged_evaluator()
+    slow_tail(evaluator, monkeypatch, (0.5, 'primary'), (0.01, 'hedge'))
+    ctx = TaskContext('t')
+    start = time.monotonic()
+    assert evaluator._hedged_call(BODY, ctx) == 'hedge'
+    assert time.monotonic() - start < 0.4
+    stats = ctx.snapshot()
+    assert (stats['hedges_launched'], stats['hedges_won']) == (1, 1)
+
+    # 首发请求仍先返回时取首发结果
+    evaluator = hedged_evaluator()
+    slow_tail(evaluator, monkeypatch, (0.1, 'primary'), (0.5, 'hedge'))
+    ctx = TaskContext('t')
+    assert evaluator._hedged_call(BODY, ctx) == 'primary'
+    stats = ctx.snapshot()
+    assert (stats['hedges_launched'], stats['hedges_won']) == (1, 0)
+
+
+def test_failed_request_does_not_win(monkeypatch):
+    evaluator = hedged_evaluator()
+    slow_tail(evaluator, monkeypatch, (0.1, api_error(openai.InternalServerError, 500)), (0.2, 'hedge'))
+    assert evaluator._hedged_call(BODY, TaskContext('t')) == 'hedge'
+
+    evaluator = hedged_evaluator()
+    slow_tail(evaluator, monkeypatch, (0.1, api_error(openai.InternalServerError, 500)),
+              (0.05, api_error(openai.APIConnectionError)))
+    with pytest.raises((openai.InternalServerError, openai.APIConnectionError)):
+        evaluator._hedged_call(BODY, TaskContext('t'))
+
+
+def test_hedges_stay_within_the_budget(monkeypatch):
+    evaluator = hedged_evaluator(budget=0.05, latency=0.005)
+    slow_tail(evaluator, monkeypatch, (0.03, 'answer'))
+    ctx = TaskContext('t')
+    for _ in range(60):
+        assert evaluator._hedged_call(BODY, ctx) == 'answer'
+    # 每个请求都超过对冲延迟，但对冲数不超过 5% × 请求数
+    assert (evaluator.hedge.requests, evaluator.hedge.hedges) == (60, 3)
+    assert ctx.snapshot()['hedges_launched'] == 3
+
+    policy = HedgePolicy(budget=0.1)
+    for n in range(1, 101):
+        policy.record_request()
+        policy.try_acquire()
+        assert policy.hedges <= 0.1 * n
+    assert policy.hedges == 10
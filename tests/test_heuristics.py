@@ -0,0 +1,52 @@
+from difflib import SequenceMatcher
+
+from conftest import make_sessions
+
+from evaluator import BenchmarkEvaluator
+from heuristics import round_response, similarity
+
+
+def test_round_response_distinguishes_missing_from_empty():
+    round_data = {'user_message': 'hi', 'responses': {'Base': '', 'Ours': 'hello'}}
+    assert round_response(round_data, 'Base') == ''
+    assert round_response(round_data, 'Ours') == 'hello'
+    assert round_response(round_data, 'CoT') is None
+    assert round_response({'assistant': {'preferred': 'x'}, 'chosen': 'rejected'}, None) is None
+
+
+def test_prescreen_skips_methods_missing_from_rounds(stub_judge):
+    sessions = make_sessions(3, 4, methods=('Base', 'Ours'))
+    del sessions[0]['rounds'][2]['responses']['Ours']
+    sessions[1]['rounds'][1]['responses']['Ours'] = ''
+
+    results = BenchmarkEvaluator(scoring='prescreen').evaluate_sessions(sessions, ['Base', 'Ours', 'CoT'], 'pre')
+    methods = results['methods']
+
+    assert methods['CoT']['total_evaluations'] == 0
+    assert methods['Base']['total_evaluations'] == 12
+    # 缺少的响应跳过；空响应仍由预筛记 0 分
+    assert methods['Ours']['total_evaluations'] == 11
+    empty = [d for s in methods['Ours']['sessions'] for d in s['details'] if d.get('source') == 'heuristic:empty']
+    assert len(empty) == 1 and empty[0]['score'] == 0
+
+
+def test_prescreen_reuses_only_rule_hits_from_heuristic_task(stub_judge):
+    sessions = make_sessions(2, 4, methods=('Base',))
+    sessions[0]['rounds'][1]['responses']['Base'] = ''    # 预筛命中：empty
+    heuristic = BenchmarkEvaluator(scoring='heuristic').evaluate_sessions(sessions, ['Base'], 'heur')
+
+    stub_judge.prompts.clear()
+    results = BenchmarkEvaluator(scoring='prescreen').evaluate_sessions(sessions, ['Base'], 'pre',
+                                                                         base_results=heuristic)
+    details = [d for s in results['methods']['Base']['sessions'] for d in s['details']]
+    reused = [d for d in details if d.get('source', '').startswith('heuristic')]
+    assert {d['source'] for d in reused} <= {'heuristic:empty', 'heuristic:duplicate'}
+    assert not any(d.get('source') == 'heuristic' for d in details)
+    assert stub_judge.prompts
+
+
+def test_similarity_is_not_an_upper_bound():
+    assert similarity('abcdefgh', 'zz') == 0.0
+    assert similarity('hello there friend', 'hello there friend') == 1.0
+    assert similarity('the quick brown fox', 'a slow grey cat') == \
+        SequenceMatcher(None, 'the quick brown fox', 'a slow grey cat', autojunk=False).ratio()
@@ -0,0 +1,50 @@
+from history import budget_history, format_round, window_history
+
+
+def _parts(n, size=20):
+    return [format_round(f'message {k} ' + 'x' * size, f'reply {k}') for k in range(n)]
+
+
+def test_budget_history_omits_middle_rounds():
+    parts = _parts(12)
+    history = budget_history(parts, 60)
+    assert history.startswith(parts[0] + ', ' + parts[1])
+    assert 'earlier rounds omitted]' in history and history.endswith(parts[-1])
+
+
+def test_budget_history_no_marker_when_nothing_is_omitted():
+    # 最近一轮超出预算时截断其开头；它前面只有保留的开头轮次 (或没有轮次) 时不输出省略标记
+    short, long = _parts(1, size=10)[0], format_round('long ' + 'y' * 400, 'reply')
+    history = budget_history([short, long], 40)
+    assert 'omitted' not in history and history.startswith(short + ', ...')
+    history = budget_history([long], 40)
+    assert 'omitted' not in history and history.startswith('...')
+    assert '[1 earlier round omitted]' in budget_history([short, short, short, long], 80)
+
+
+def test_window_history():
+    parts = _parts(5)
+    assert window_history(parts, 8) == ", ".join(parts)
+    assert window_history(parts, 2) == ", ".join(['[3 earlier rounds omitted]'] + parts[-2:])
+
+
+def test_summary_history_is_built_only_for_judged_rounds(stub_judge):
+    from conftest import make_sessions
+    from evaluator import BenchmarkEvaluator
+
+    sessions = make_sessions(3, 6)
+    first = BenchmarkEvaluator(scoring='llm', history='summary:2').evaluate_sessions(sessions, ['Base'], 'first')
+    assert first['judge_stats']['summary_calls'] > 0
+
+    # 另一个进程：摘要缓存为空，且重新生成的摘要文本不同；指纹基于原始历史，全部轮次直接复用，不生成摘要
+    other = BenchmarkEvaluator(scoring='llm', history='summary:2')
+    other._summarize = lambda prompt, ctx: 'a different summary'
+    second = other.evaluate_sessions(sessions, ['Base'], 'second', base_results=first)
+    stats = second['judge_stats']
+    assert (stats['reused_rounds'], stats['api_calls'], stats['summary_calls']) == (18, 0, 0)
+
+    # 预筛命中的轮次 (第 2 轮起的重复回复) 不调用评审模型，也不生成摘要
+    prescreened = BenchmarkEvaluator(scoring='prescreen', history='summary:2').evaluate_sessions(
+        sessions, ['Base'], 'prescreened')
+    stats = prescreened['judge_stats']
+    assert (stats['prescreened'], stats['summary_calls'], stats['api_calls']) == (15, 0, 6)
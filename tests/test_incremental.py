@@ -0,0 +1,28 @@
+from conftest import make_sessions
+
+from evaluator import BenchmarkEvaluator
+
+
+def test_failed_judgments_are_not_reused(stub_judge, monkeypatch):
+    sessions = make_sessions(2, 3)
+    evaluator = BenchmarkEvaluator()
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError('judge unavailable')
+
+    with monkeypatch.context() as m:
+        m.setattr(BenchmarkEvaluator, '_request_judge', unavailable)
+        first = evaluator.evaluate_sessions(sessions, ['Base'], 'first')
+    details = [d for s in first['methods']['Base']['sessions'] for d in s['details']]
+    assert all(d['source'] == 'failed' and 'fingerprint' not in d for d in details)
+    assert first['judge_stats']['failed_rounds'] == 6
+
+    second = evaluator.evaluate_sessions(sessions, ['Base', 'Ours'], 'second', base_results=first)
+    assert second['judge_stats']['reused_rounds'] == 0
+    assert second['judge_stats']['api_calls'] == 24
+    details = [d for s in second['methods']['Base']['sessions'] for d in s['details']]
+    assert all(d.get('fingerprint') and 'source' not in d for d in details)
+
+    # 评审成功的轮次照常复用
+    third = evaluator.evaluate_sessions(sessions, ['Base', 'Ours'], 'third', base_results=second)
+    assert third['judge_stats']['reused_rounds'] == 12 and third['judge_stats']['api_calls'] == 0
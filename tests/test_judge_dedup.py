@@ -0,0 +1,120 @@
+import threading
+import time
+
+import openai
+import pytest
+from conftest import FakeClient, api_error
+
+from evaluator import BenchmarkEvaluator, TaskContext
+from judge_pool import Endpoint, JudgePool
+from scheduler import TaskCancelled
+
+PARAMS = {'max_tokens': 600, 'temperature': 0.1}
+
+
+@pytest.fixture(autouse=True)
+def _no_env_pool(monkeypatch):
+    for name in ('PERSONASTEER_JUDGE_POOL', 'PERSONASTEER_HEDGE_BUDGET', 'PERSONASTEER_JUDGE_STREAM'):
+        monkeypatch.delenv(name, raising=False)
+
+
+def _ask(evaluator, ctx, results, prompt='prompt'):
+    try:
+        results[ctx.task_id] = evaluator._judge(prompt, PARAMS, 3, ctx, None)
+    except TaskCancelled as e:
+        results[ctx.task_id] = e
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_concurrent_identical_requests_are_coalesced(monkeypatch):
+    evaluator = BenchmarkEvaluator(judge_pool=None, hedge_budget=0)
+    leader, follower = TaskContext('leader'), TaskContext('follower')
+    release, calls = threading.Event(), []
+
+    def request(self, prompt, params, max_retries, ctx, kind=None):
+        ctx.count('api_calls')
+        calls.append(ctx.task_id)
+        release.wait(5)
+        return 'answer'
+
+    monkeypatch.setattr(BenchmarkEvaluator, '_request_judge', request)
+    results = {}
+    threads = [threading.Thread(target=_ask, args=(evaluator, leader, results))]
+    threads[0].start()
+    _wait_for(lambda: calls)
+    threads.append(threading.Thread(target=_ask, args=(evaluator, follower, results)))
+    threads[1].start()
+    _wait_for(lambda: follower.stats['coalesced'])
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {'leader': 'answer', 'follower': 'answer'} and calls == ['leader']
+    assert (leader.snapshot()['api_calls'], leader.snapshot()['calls_saved']) == (1, 0)
+    assert (follower.snapshot()['api_calls'], follower.snapshot()['calls_saved']) == (0, 1)
+
+
+def test_follower_leads_again_when_the_leader_is_cancelled(monkeypatch):
+    evaluator = BenchmarkEvaluator(judge_pool=None, hedge_budget=0)
+    leader, follower = TaskContext('leader'), TaskContext('follower')
+    calls = []
+
+    def request(self, prompt, params, max_retries, ctx, kind=None):
+        ctx.count('api_calls')
+        calls.append(ctx.task_id)
+        if ctx is leader:
+            _wait_for(lambda: follower.stats['coalesced'])
+            raise TaskCancelled('leader')
+        return 'answer'
+
+    monkeypatch.setattr(BenchmarkEvaluator, '_request_judge', request)
+    results = {}
+    threads = [threading.Thread(target=_ask, args=(evaluator, leader, results))]
+    threads[0].start()
+    _wait_for(lambda: calls)
+    threads.append(threading.Thread(target=_ask, args=(evaluator, follower, results)))
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+
+    # 发起请求的任务被取消：未取消的任务自行重新发起，并按实际调用计数
+    assert isinstance(results['leader'], TaskCancelled) and results['follower'] == 'answer'
+    assert calls == ['leader', 'follower']
+    stats = follower.snapshot()
+    assert (stats['requests'], stats['api_calls'], stats['coalesced'], stats['calls_saved']) == (1, 1, 0, 0)
+
+
+def test_retries_and_failover_count_one_api_call_per_request(monkeypatch):
+    monkeypatch.setattr('evaluator.time.sleep', lambda seconds: None)
+    evaluator = BenchmarkEvaluator(judge_pool=None, hedge_budget=0)
+    attempts = []
+
+    def flaky(body, ctx, kind=None, started=None):
+        attempts.append(body)
+        if len(attempts) < 3:
+            raise api_error(openai.InternalServerError, 500)
+        return 'answer', 0.01
+
+    monkeypatch.setattr(evaluator, '_timed_call', flaky)
+    ctx = TaskContext('t')
+    assert evaluator._judge('prompt', PARAMS, 3, ctx, None) == 'answer'
+    assert evaluator._judge('prompt', PARAMS, 3, ctx, None) == 'answer'   # 任务内去重
+    stats = ctx.snapshot()
+    assert (stats['requests'], stats['api_calls'], stats['retries'], stats['calls_saved']) == (2, 1, 2, 1)
+
+    # 端点池内的故障转移同样只算一次调用，尝试次数见 endpoints
+    endpoints = [Endpoint(name, f'http://{name}.test/v1', 'key') for name in ('gw-a', 'gw-b')]
+    endpoints[0].client, endpoints[0].latency = FakeClient(api_error(openai.InternalServerError, 500)), 0.1
+    endpoints[1].client, endpoints[1].latency = FakeClient('answer'), 1.0
+    evaluator = BenchmarkEvaluator(judge_pool=JudgePool(endpoints), hedge_budget=0)
+    ctx = TaskContext('t')
+    assert evaluator._judge('prompt', PARAMS, 3, ctx, None) == 'answer'
+    stats = ctx.snapshot()
+    assert (stats['api_calls'], stats['retries'], stats['calls_saved']) == (1, 0, 0)
+    assert (stats['endpoints']['gw-a']['errors'], stats['endpoints']['gw-b']['calls']) == (1, 1)
@@ -0,0 +1,92 @@
+import time
+
+import openai
+import pytest
+from conftest import FakeClient, api_error
+
+from judge_pool import Endpoint, JudgePool
+
+BODY = {'model': 'judge', 'messages': [{'role': 'user', 'content': 'hi'}]}
+
+
+def server_error():
+    return api_error(openai.InternalServerError, 500)
+
+
+def rate_limited(retry_after):
+    return api_error(openai.RateLimitError, 429, {'retry-after': retry_after})
+
+
+def make_pool(*clients, latencies=None, **kwargs):
+    endpoints = []
+    for i, client in enumerate(clients):
+        endpoint = Endpoint(f'gw-{"ab"[i]}', f'http://gw-{i}.test/v1', 'key', max_concurrency=4)
+        endpoint.client = client
+        endpoint.latency = latencies[i] if latencies else None
+        endpoints.append(endpoint)
+    return JudgePool(endpoints, **kwargs)
+
+
+def test_routes_by_latency_and_remaining_quota():
+    a = FakeClient('from a', headers={'x-ratelimit-remaining-requests': '1', 'x-ratelimit-limit-requests': '100'})
+    b = FakeClient('from b')
+    pool = make_pool(a, b, latencies=[0.1, 1.0])
+    assert pool.complete(BODY) == ('from a', 'gw-a')
+    # gw-a 报告配额只剩 1%：预计完成时间 / 剩余配额比例 使 gw-b 更优
+    assert pool.complete(BODY) == ('from b', 'gw-b')
+    assert pool.snapshot()['endpoints'][0]['quota_left'] == 0.01
+
+
+def test_circuit_opens_then_half_open_trial_closes_it():
+    a, b = FakeClient(server_error()), FakeClient('from b')
+    pool = make_pool(a, b, latencies=[0.1, 1.0], failure_threshold=2, cooldown=0.2)
+
+    for _ in range(2):
+        assert pool.complete(BODY) == ('from b', 'gw-b')   # gw-a 失败后故障转移
+    assert a.calls == 2 and pool.snapshot()['endpoints'][0]['state'] == 'open'
+    assert pool.complete(BODY) == ('from b', 'gw-b') and a.calls == 2   # 断开期间不再发往 gw-a
+
+    time.sleep(0.25)
+    # 半开：只放行一个试探请求，试探在途时其他请求不发往 gw-a
+    endpoint, trial = pool._acquire(set())
+    assert (endpoint.name, trial) == ('gw-a', True)
+    assert pool._acquire(set())[0].name == 'gw-b'
+    pool._release(pool.endpoints[1], False, latency=1.0)
+    pool._release(endpoint, trial, failed=True)
+    assert pool.snapshot()['endpoints'][0]['state'] == 'open'   # 试探失败：重新断开
+
+    time.sleep(0.25)
+    a.outcomes = ['from a']
+    assert pool.complete(BODY) == ('from a', 'gw-a')
+    assert pool.snapshot()['endpoints'][0]['state'] == 'closed' and pool.endpoints[0].failures == 0
+
+
+def test_rate_limit_pauses_endpoint_without_tripping_the_breaker():
+    a, b = FakeClient(rate_limited('0.3'), 'from a'), FakeClient('from b')
+    pool = make_pool(a, b, latencies=[0.1, 1.0], failure_threshold=1)
+    attempts = []
+    assert pool.complete(BODY, on_attempt=lambda *args: attempts.append(args)) == ('from b', 'gw-b')
+    assert [name for name, _, _ in attempts] == ['gw-a', 'gw-b']
+    assert isinstance(attempts[0][2], openai.RateLimitError) and attempts[1][2] is None
+
+    status = pool.snapshot()['endpoints'][0]
+    assert status['paused'] and status['state'] == 'closed' and status['errors'] == 1
+    assert pool.complete(BODY) == ('from b', 'gw-b')   # 暂停期间 (Retry-After) 不发往 gw-a
+    time.sleep(0.35)
+    assert pool.complete(BODY) == ('from a', 'gw-a')
+
+
+def test_failover_raises_last_error_after_every_endpoint_failed():
+    a, b = FakeClient(server_error()), FakeClient(api_error(openai.APIConnectionError))
+    pool = make_pool(a, b)
+    with pytest.raises(openai.APIConnectionError):
+        pool.complete(BODY)
+    assert (a.calls, b.calls) == (1, 1)
+
+    # 请求本身的错误 (4xx) 不换端点重试，也不计入熔断
+    bad = api_error(openai.BadRequestError, 400)
+    c = FakeClient(bad)
+    pool = make_pool(c, FakeClient('from b'), latencies=[0.1, 1.0])
+    with pytest.raises(openai.BadRequestError):
+        pool.complete(BODY)
+    assert c.calls == 1 and pool.endpoints[0].failures == 0 and pool.endpoints[0].inflight == 0
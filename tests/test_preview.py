@@ -0,0 +1,42 @@
+from conftest import make_sessions
+
+from evaluator import BenchmarkEvaluator
+
+
+def test_preview_without_session_ids_judges_only_sampled_rounds(stub_judge):
+    sessions = make_sessions(20, 5, with_ids=False)
+    results = BenchmarkEvaluator().evaluate_preview(sessions, ['Base', 'Ours'], 'prev', per_round=3, seed=1)
+
+    # 5 轮 x 每轮 3 个会话 x 2 个方法 x (评分 + 二元判断)
+    assert results['preview']['sampled_cells'] == 15
+    assert len(stub_judge.prompts) == 15 * 2 * 2
+    for method in ('Base', 'Ours'):
+        assert results['methods'][method]['total_evaluations'] == 15
+        # 会话按在完整文件中的位置命名，完整评测可以复用这些评分
+        assert all(s['session_id'].startswith('session_') for s in results['methods'][method]['sessions'])
+
+
+def test_preview_reports_only_avg_as_metric_estimate(stub_judge):
+    results = BenchmarkEvaluator().evaluate_preview(make_sessions(10, 4), ['Base'], 'prev', per_round=2, seed=0)
+    method = results['methods']['Base']
+    assert set(method['metrics']) == {'AVG'}
+    assert {'Slope', 'Intercept', 'R2'} <= set(method['curve_metrics'])
+
+
+def test_preview_census_matches_full_run_on_ragged_sessions(stub_judge):
+    # 会话长度不同，Ours 缺少部分轮次的响应：AL(k) 两边都按轮次编号分组，N_k 按方法统计
+    sessions = make_sessions(6, 5)
+    for i, session in enumerate(sessions):
+        del session['rounds'][5 - i % 3:]
+        for round_data in session['rounds'][i % 2::3]:
+            del round_data['responses']['Ours']
+    evaluator = BenchmarkEvaluator()
+    full = evaluator.evaluate_sessions(sessions, ['Base', 'Ours'], 'full')
+    preview = evaluator.evaluate_preview(sessions, ['Base', 'Ours'], 'prev', per_round=len(sessions))
+
+    for method in ('Base', 'Ours'):
+        estimate, exact = preview['methods'][method], full['methods'][method]
+        assert estimate['al_curve'] == exact['al_curve']
+        assert estimate['metrics']['AVG'] == exact['metrics']['AVG']
+        assert estimate['binary_alignment_rate'] == exact['binary_alignment_rate']
+    assert preview['preview']['round_population']['Base'] == [6, 6, 6, 4, 2]
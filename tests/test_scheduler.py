@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from scheduler import JudgeScheduler, TaskCancelled
+
+
+def test_unregister_waits_for_inflight_calls():
+    scheduler = JudgeScheduler(2)
+    scheduler.register('t', priority=2)
+    entered, release = threading.Event(), threading.Event()
+
+    def call():
+        with scheduler.slot('t'):
+            entered.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=call)
+    worker.start()
+    entered.wait(5)
+
+    # 任务结束 (如取消后) 时仍有在途调用：状态保留，取消仍然有效
+    scheduler.cancel('t')
+    scheduler.unregister('t')
+    assert scheduler.snapshot()['tasks']['t']['inflight'] == 1
+    assert scheduler.is_cancelled('t')
+    with pytest.raises(TaskCancelled):
+        with scheduler.slot('t'):
+            pass
+
+    release.set()
+    worker.join(5)
+    assert scheduler.snapshot() == {'capacity': 2, 'inflight': 0, 'tasks': {}}
+
+
+def test_untracked_calls_are_dropped_when_idle():
+    scheduler = JudgeScheduler(1)
+    with scheduler.slot(None):
+        assert 'None' in scheduler.snapshot()['tasks']
+    assert scheduler.snapshot()['tasks'] == {}
+
+    scheduler.register('t')
+    with scheduler.slot('t'):
+        pass
+    assert 't' in scheduler.snapshot()['tasks']   # 注册的任务保留到 unregister
+    scheduler.unregister('t')
+    assert scheduler.snapshot()['tasks'] == {}
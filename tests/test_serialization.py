@@ -0,0 +1,82 @@
+import gzip
+import json
+
+import numpy as np
+import pytest
+from conftest import make_sessions
+
+import serialization
+from evaluator import BenchmarkEvaluator, write_results
+
+RESULTS = {'task_id': 't', 'scores': np.array([1, 2, 3]), 'name': '评测 "结果"', 'empty': {}}
+EXPECTED = {'task_id': 't', 'scores': [1, 2, 3], 'name': '评测 "结果"', 'empty': {}}
+
+
+@pytest.mark.parametrize('compression, magic', [
+    ('none', b'{'), ('gzip', serialization.GZIP_MAGIC), ('zstd', serialization.ZSTD_MAGIC)])
+def test_round_trip_and_magic_detection(tmp_path, compression, magic):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    path = str(tmp_path / 'results.json')
+    written = serialization.save(RESULTS, path, compression)
+    assert written == path + serialization.SUFFIXES[compression]
+    with open(written, 'rb') as f:
+        assert f.read().startswith(magic)
+    assert serialization.load(path) == EXPECTED
+
+
+def test_format_is_detected_from_content_not_suffix(tmp_path):
+    # 旧的未压缩带缩进文件，以及后缀与内容不符的文件都按文件头识别
+    path = str(tmp_path / 'results.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(EXPECTED, f, ensure_ascii=False, indent=2)
+    assert serialization.load(path) == EXPECTED
+
+    path = str(tmp_path / 'mislabelled.json')
+    with open(path + '.zst', 'wb') as f:
+        f.write(gzip.compress(serialization.dumps(EXPECTED)))
+    assert serialization.load(path) == EXPECTED
+
+    with pytest.raises(FileNotFoundError):
+        serialization.load(str(tmp_path / 'missing.json'))
+    with pytest.raises(ValueError):
+        serialization.check_compression('lz4')
+
+
+def test_open_write_replaces_stale_variants(tmp_path):
+    path = str(tmp_path / 'results.json')
+    serialization.save({'old': 'none'}, path, 'none')
+    serialization.save({'old': 'zstd'}, path, 'zstd')
+    serialization.save({'new': 'gzip'}, path, 'gzip')
+    # 其他压缩格式的旧文件被删除，读取不会拿到过期的变体
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['results.json.gz']
+    assert serialization.load(path) == {'new': 'gzip'}
+
+    # 写入失败时保留旧文件，不留临时文件
+    with pytest.raises(RuntimeError):
+        with serialization.open_write(path, 'none') as f:
+            f.write(b'{"partial":')
+            raise RuntimeError('disk full')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['results.json.gz']
+    serialization.remove(path)
+    assert not serialization.exists(path)
+
+
+@pytest.mark.parametrize('compression', ['none', 'gzip'])
+def test_streamed_write_results_matches_in_memory_results(stub_judge, tmp_path, compression):
+    # 任务名 / 方法名恰好是旧实现占位符的序列化文本，也不影响逐段写出
+    methods = ['Base', '@@sessions:1@@', '']
+    sessions = make_sessions(4, 2, methods=methods)
+    evaluator = BenchmarkEvaluator()
+    memory = evaluator.evaluate_sessions(sessions, methods, 'memory')
+    streamed = evaluator.evaluate_sessions(sessions, methods, '@@sessions:0@@', results_folder=str(tmp_path), stream=True)
+    assert streamed['methods']['Base']['sessions'] == []
+
+    path = write_results(streamed, str(tmp_path / 'streamed.json'), compression)
+    assert path.endswith(serialization.SUFFIXES[compression])
+    saved = serialization.load(path)
+    assert list(saved) == [key for key in streamed if key != 'sessions_file']
+    assert saved['methods'] == {
+        method: {**data, 'sessions': memory['methods'][method]['sessions']}
+        for method, data in streamed['methods'].items()
+    }
@@ -0,0 +1,78 @@
+import random
+
+from conftest import make_sessions
+
+import serialization
+from evaluator import BenchmarkEvaluator, MethodResults, RunningMetrics, write_results
+
+
+def ragged_sessions():
+    """会话长度不同，且部分轮次缺少 Ours 的响应"""
+    sessions = make_sessions(6, 5)
+    for i, session in enumerate(sessions):
+        del session['rounds'][5 - i % 3:]
+        for round_data in session['rounds'][i % 2::3]:
+            del round_data['responses']['Ours']
+    return sessions
+
+
+def test_running_metrics_match_full_metrics_on_ragged_data():
+    rng = random.Random(7)
+    evaluator = BenchmarkEvaluator()
+    for _ in range(50):
+        running, full = RunningMetrics(), MethodResults()
+        for n in range(rng.randint(1, 8)):
+            scores = [rng.randint(0, 100) for _ in range(rng.randint(1, 6))]
+            binary = [rng.randint(0, 1) for _ in scores]
+            rounds = sorted(rng.sample(range(1, 9), len(scores)))
+            running.add_session(scores, binary, rounds)
+            full.add_session(f's{n}', scores, binary, [{'round': k} for k in rounds])
+        assert running.metrics() == evaluator.calculate_metrics(full.scores.tolist())
+        assert running.al_curve() == [round(mean, 2) for mean in full.round_means()]
+        assert running.binary_sum == sum(full.binary)
+
+
+def test_streamed_results_match_in_memory_results(stub_judge, tmp_path):
+    evaluator = BenchmarkEvaluator()
+    sessions = ragged_sessions()
+    memory = evaluator.evaluate_sessions(sessions, ['Base', 'Ours'], 'memory')
+    streamed = evaluator.evaluate_sessions(sessions, ['Base', 'Ours'], 'streamed',
+                                           results_folder=str(tmp_path), stream=True)
+
+    for method in ('Base', 'Ours'):
+        for key in ('metrics', 'binary_alignment_rate', 'al_curve', 'total_evaluations'):
+            assert streamed['methods'][method][key] == memory['methods'][method][key]
+    assert streamed['radar_data'] == memory['radar_data']
+
+    path = write_results(streamed, str(tmp_path / 'streamed'))
+    assert serialization.load(path)['methods'] == {
+        method: {**data, 'sessions': memory['methods'][method]['sessions']}
+        for method, data in streamed['methods'].items()
+    }
+
+
+def test_resume_retries_only_failed_sessions(stub_judge, tmp_path, monkeypatch):
+    evaluator = BenchmarkEvaluator()
+    sessions = make_sessions(5, 2)
+    evaluate_session = BenchmarkEvaluator.evaluate_session
+
+    def flaky(self, session, *args, **kwargs):
+        if session['session_id'] == 'user_001':
+            raise RuntimeError('connection reset')
+        return evaluate_session(self, session, *args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(BenchmarkEvaluator, 'evaluate_session', flaky)
+        first = evaluator.evaluate_sessions(sessions, ['Base'], 'task', results_folder=str(tmp_path), stream=True)
+    assert first['methods']['Base']['total_evaluations'] == 8
+
+    stub_judge.prompts.clear()
+    resumed = evaluator.evaluate_sessions(sessions, ['Base'], 'task', results_folder=str(tmp_path), stream=True)
+    # 只重新评测出错的会话，之后的会话不因它而重评
+    assert len(stub_judge.prompts) == 2 * 2
+    assert all('Session 1 ' in prompt for prompt in stub_judge.prompts)
+    assert resumed['methods']['Base']['total_evaluations'] == 10
+
+    saved = serialization.load(write_results(resumed, str(tmp_path / 'task')))
+    assert sorted(s['session_id'] for s in saved['methods']['Base']['sessions']) == \
+        [f'user_{i:03d}' for i in range(5)]
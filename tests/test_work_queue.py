@@ -0,0 +1,78 @@
+import time
+
+from conftest import make_sessions, write_jsonl
+
+from evaluator import BenchmarkEvaluator
+from work_queue import WorkQueue, merge_judge_stats, run_worker
+
+
+def test_expired_leases_fail_after_max_attempts(tmp_path):
+    data = write_jsonl(tmp_path / 'data.jsonl', make_sessions(1, 2, methods=('Base',)))
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.01, max_attempts=2)
+    queue.enqueue_file(data, ['Base'], 'q')
+
+    # worker 每次领取后崩溃，租约过期
+    for attempt in range(2):
+        item = queue.lease(f'w{attempt}')
+        assert item is not None
+        time.sleep(0.02)
+
+    assert queue.lease('w2') is None
+    assert queue.progress('q') == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert queue.is_finished('q')
+
+
+def test_task_settings_drive_workers_and_aggregate(tmp_path, stub_judge, monkeypatch):
+    data = write_jsonl(tmp_path / 'data.jsonl', make_sessions(2, 4))
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    settings = BenchmarkEvaluator(judge_model='judge-a', scoring='llm', history='window:2').settings
+    queue.enqueue_file(data, ['Base', 'Ours'], 'q', settings)
+
+    # worker 与汇总所在主机的默认配置不同
+    monkeypatch.setenv('PERSONASTEER_SCORING', 'prescreen')
+    monkeypatch.setenv('PERSONASTEER_HISTORY', 'budget:500')
+    assert run_worker(queue, BenchmarkEvaluator(judge_model='judge-b'), concurrency=2) == 4
+    results = queue.aggregate('q', BenchmarkEvaluator())
+
+    assert (results['judge_model'], results['scoring'], results['history']) == ('judge-a', 'llm', 'window:2')
+    assert results['methods']['Base']['total_evaluations'] == 8
+    # 第 4 轮的评审提示词只保留最近 2 轮历史
+    assert any('[1 earlier round omitted]' in prompt for prompt in stub_judge.prompts)
+
+
+def test_aggregate_merges_worker_judge_stats(tmp_path, stub_judge):
+    data = write_jsonl(tmp_path / 'data.jsonl', make_sessions(3, 2))
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    queue.enqueue_file(data, ['Base', 'Ours'], 'q')
+
+    # 两个 worker 各领取一部分评测项
+    first = queue.lease('w1/0')
+    queue.complete(first['item_id'], 'w1/0',
+                   BenchmarkEvaluator().evaluate_session(first['session'], [first['method']])[first['method']])
+    stub_judge.prompts.clear()
+    assert run_worker(queue, BenchmarkEvaluator(), worker_id='w2') == 5
+    assert run_worker(queue, BenchmarkEvaluator(), worker_id='w3') == 0
+    queue.report_stats('q', 'w1', {'requests': 2, 'api_calls': 2, 'prescreen_short': 1,
+                                   'latency_p99': 9.0, 'calls_saved': 0})
+
+    stats = queue.aggregate('q', BenchmarkEvaluator())['judge_stats']
+    assert stats['workers'] == 2
+    assert (stats['requests'], stats['api_calls']) == (len(stub_judge.prompts) + 2,) * 2
+    assert stats['calls_saved'] == 0 and stats['prescreen_short'] == 1
+    assert 'latency_p99' not in stats   # 各 worker 的分位数无法合并
+
+
+def test_merge_judge_stats_weights_endpoint_latency():
+    merged = merge_judge_stats([
+        {'requests': 4, 'api_calls': 3, 'history_tokens': 50, 'history_tokens_full': 100,
+         'endpoints': {'gw-a': {'calls': 3, 'errors': 1, 'avg_latency': 1.0, 'throughput': 0.5}}},
+        {'requests': 2, 'api_calls': 2, 'history_tokens': 30, 'history_tokens_full': 100,
+         'endpoints': {'gw-a': {'calls': 1, 'errors': 0, 'avg_latency': 3.0, 'throughput': 0.25},
+                       'gw-b': {'calls': 0, 'errors': 2, 'avg_latency': None, 'throughput': 0.0}}},
+    ])
+    assert (merged['requests'], merged['api_calls'], merged['calls_saved']) == (6, 5, 1)
+    assert merged['history_token_savings'] == 0.6
+    assert merged['endpoints'] == {
+        'gw-a': {'calls': 4, 'errors': 1, 'avg_latency': 1.5, 'throughput': 0.75},
+        'gw-b': {'calls': 0, 'errors': 2, 'avg_latency': None, 'throughput': 0.0},
+    }
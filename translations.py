@@ -34,6 +34,7 @@ TRANSLATIONS = {
         'eval_desc': '选择要评测的方法，系统将使用 LLM-as-a-Judge 进行评分',
         'select_methods': '选择评测方法',
         'start_eval': '开始评测',
+        'quick_preview': '快速预览 (抽样估计)',
         'evaluating': '评测中...',
         
         # Results section
@@ -42,6 +43,7 @@ TRANSLATIONS = {
         'al_curve_title': 'AL(k) 对齐曲线',
         'radar_title': '多维度对比雷达图',
         'details_title': '详细评分',
+        'sessions_title': '会话明细',
         'export_results': '导出结果',
         
         # Metrics
@@ -55,11 +57,17 @@ TRANSLATIONS = {
         'no_file_selected': '请选择文件',
         'invalid_format': '无效的文件格式，请上传 .jsonl 文件',
         'upload_success': '文件上传成功',
+        'upload_cached': '文件已上传过，复用校验结果',
+        'previous_tasks': '已有评测',
         'parse_error': '文件解析错误',
+        'parse_errors': '文件校验失败，共 {count} 处错误',
         'missing_params': '缺少必要参数',
         'file_not_found': '文件未找到',
+        'base_task_not_found': '基准评测任务未找到',
         'eval_complete': '评测完成',
+        'eval_cached': '已存在相同配置的评测结果，直接返回',
         'eval_error': '评测出错',
+        'eval_cancelled': '评测已取消，已完成的会话已保存，再次提交相同请求即可续评',
         'loading': '加载中...',
         
         # Documentation
@@ -97,6 +105,7 @@ TRANSLATIONS = {
         'eval_desc': 'Select methods to evaluate. The system will use LLM-as-a-Judge for scoring.',
         'select_methods': 'Select Methods',
         'start_eval': 'Start Evaluation',
+        'quick_preview': 'Quick Preview (sampled estimate)',
         'evaluating': 'Evaluating...',
         
         # Results section
@@ -105,6 +114,7 @@ TRANSLATIONS = {
         'al_curve_title': 'AL(k) Alignment Curve',
         'radar_title': 'Multi-dimensional Comparison Radar',
         'details_title': 'Detailed Scores',
+        'sessions_title': 'Per-session Scores',
         'export_results': 'Export Results',
         
         # Metrics
@@ -118,11 +128,17 @@ TRANSLATIONS = {
         'no_file_selected': 'Please select a file',
         'invalid_format': 'Invalid file format. Please upload a .jsonl file',
         'upload_success': 'File uploaded successfully',
+        'upload_cached': 'File already uploaded, reusing validation results',
+        'previous_tasks': 'previous evaluations',
         'parse_error': 'File parsing error',
+        'parse_errors': 'File validation failed with {count} errors',
         'missing_params': 'Missing required parameters',
         'file_not_found': 'File not found',
+        'base_task_not_found': 'Base task not found',
         'eval_complete': 'Evaluation completed',
+        'eval_cached': 'Returned stored results of an identical evaluation',
         'eval_error': 'Evaluation error',
+        'eval_cancelled': 'Evaluation cancelled; finished sessions are saved and resubmitting the same request resumes it',
         'loading': 'Loading...',
         
         # Documentation
@@ -160,6 +176,7 @@ TRANSLATIONS = {
         'eval_desc': '평가할 방법을 선택하세요. 시스템이 LLM-as-a-Judge를 사용하여 점수를 매깁니다.',
         'select_methods': '방법 선택',
         'start_eval': '평가 시작',
+        'quick_preview': '빠른 미리보기 (샘플 추정)',
         'evaluating': '평가 중...',
         
         # Results section
@@ -168,6 +185,7 @@ TRANSLATIONS = {
         'al_curve_title': 'AL(k) 정렬 곡선',
         'radar_title': '다차원 비교 레이더',
         'details_title': '상세 점수',
+        'sessions_title': '세션별 점수',
         'export_results': '결과 내보내기',
         
         # Metrics
@@ -181,11 +199,17 @@ TRANSLATIONS = {
         'no_file_selected': '파일을 선택해주세요',
         'invalid_format': '잘못된 파일 형식입니다. .jsonl 파일을 업로드해주세요',
         'upload_success': '파일 업로드 성공',
+        'upload_cached': '이미 업로드된 파일입니다. 검증 결과를 재사용합니다',
+        'previous_tasks': '이전 평가',
         'parse_error': '파일 파싱 오류',
+        'parse_errors': '파일 검증 실패: 오류 {count}개',
         'missing_params': '필수 매개변수 누락',
         'file_not_found': '파일을 찾을 수 없음',
+        'base_task_not_found': '기준 평가 작업을 찾을 수 없음',
         'eval_complete': '평가 완료',
+        'eval_cached': '동일한 설정의 평가 결과를 반환했습니다',
         'eval_error': '평가 오류',
+        'eval_cancelled': '평가가 취소되었습니다. 완료된 세션은 저장되었으며 같은 요청을 다시 제출하면 이어서 평가합니다',
         'loading': '로딩 중...',
         
         # Documentation
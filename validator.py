@@ -0,0 +1,236 @@
+"""
+PersonaSteer Benchmark - Upload Validator
+
+上传文件的严格格式校验，一次返回所有错误 (带行号，数量有上限)：
+文件按行对齐切分为若干块，逐块校验 (命令行指定 workers > 1 时、或 web 服务传入其长期进程池时并行校验)；各块分别记录出现过的方法集合，
+最后合并时以全文件第一轮的方法集合为准做跨块一致性检查。
+
+使用方法 / Usage:
+    report = validate_file('data.jsonl')
+    if report['errors']:
+        ...
+"""
+
+import json
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import serialization
+
+CHUNK_SIZE = 8 * 1024 * 1024   # 每块约 8MB
+MAX_ERRORS = 100               # 返回的错误条数上限
+
+REQUIRED_FIELDS = ['session_id', 'user_profile', 'rounds']
+
+
+def _check_session(session_data: Any) -> Tuple[List[Tuple[Optional[int], str]], List[Tuple[int, tuple]]]:
+    """
+    校验单个会话
+
+    Returns:
+        (errors, method_sets): errors 为 [(round 或 None, 消息)]，
+        method_sets 为各轮的 [(round, 方法名元组)]，用于方法一致性检查
+    """
+    if not isinstance(session_data, dict):
+        return [(None, "Session must be a JSON object / 会话必须为 JSON 对象")], []
+
+    # Check required top-level fields
+    errors = []
+    for field in REQUIRED_FIELDS:
+        if field not in session_data:
+            errors.append((None, f"Missing required field '{field}' / 缺少必填字段 '{field}'"))
+    if errors:
+        return errors, []
+
+    # Validate session_id
+    if not isinstance(session_data['session_id'], str) or len(session_data['session_id']) == 0:
+        errors.append((None, "'session_id' must be non-empty string / 'session_id' 必须为非空字符串"))
+
+    # Validate user_profile
+    if not isinstance(session_data['user_profile'], str) or len(session_data['user_profile']) < 10:
+        errors.append((None, "'user_profile' must be string with at least 10 chars / 'user_profile' 至少10个字符"))
+
+    # Validate rounds
+    rounds = session_data['rounds']
+    if not isinstance(rounds, list) or len(rounds) == 0:
+        errors.append((None, "'rounds' must be non-empty array / 'rounds' 必须为非空数组"))
+        return errors, []
+
+    method_sets = []
+    for r_idx, round_data in enumerate(rounds, 1):
+        if not isinstance(round_data, dict):
+            errors.append((r_idx, "Round must be an object / 轮次必须为对象"))
+            continue
+        # Check round fields
+        missing = [field for field in ('round', 'user_message', 'responses') if field not in round_data]
+        for field in missing:
+            errors.append((r_idx, f"Missing '{field}' field / 缺少 '{field}' 字段"))
+        if 'responses' in missing:
+            continue
+
+        # Validate responses
+        responses = round_data['responses']
+        if not isinstance(responses, dict) or len(responses) == 0:
+            errors.append((r_idx, "'responses' must be non-empty object / 'responses' 必须为非空对象"))
+            continue
+        method_sets.append((r_idx, tuple(responses.keys())))
+
+    return errors, method_sets
+
+
+def _check_chunk(path: str, start: int, end: int, max_errors: int) -> Dict[str, Any]:
+    """
+    校验文件中 [start, end) 字节范围 (两端均在行首) 的所有行
+
+    行号为块内相对行号 (从 1 开始)，由 validate_file 换算为文件行号。
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    lines = data.split(b'\n')
+    if lines and lines[-1] == b'':
+        lines.pop()
+
+    sessions = 0
+    errors = []
+    error_count = 0
+    # 方法集合 -> {'keys': 方法名元组, 'count': 出现次数, 'locations': [(行, 轮)] (至多 max_errors 个)}
+    method_sets: Dict[frozenset, Dict[str, Any]] = {}
+
+    def add_error(line_num, r_idx, message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < max_errors:
+            errors.append((line_num, r_idx, message))
+
+    for line_num, raw in enumerate(lines, 1):
+        if not raw.strip():
+            continue
+        sessions += 1
+        try:
+            line = raw.decode('utf-8')
+        except UnicodeDecodeError as e:
+            add_error(line_num, None, f"Invalid UTF-8 / 编码错误 - {e}")
+            continue
+        try:
+            session_data = serialization.loads(line)
+        except ValueError:
+            # 用标准库 json 重新解析，得到统一的错误信息
+            try:
+                session_data = json.loads(line)
+            except json.JSONDecodeError as e:
+                add_error(line_num, None, f"Invalid JSON / 无效JSON - {e}")
+                continue
+
+        session_errors, session_methods = _check_session(session_data)
+        for r_idx, message in session_errors:
+            add_error(line_num, r_idx, message)
+        for r_idx, keys in session_methods:
+            entry = method_sets.get(frozenset(keys))
+            if entry is None:
+                entry = method_sets[frozenset(keys)] = {'keys': keys, 'count': 0, 'locations': []}
+            entry['count'] += 1
+            if len(entry['locations']) < max_errors:
+                entry['locations'].append((line_num, r_idx))
+
+    return {
+        'lines': len(lines),
+        'sessions': sessions,
+        'errors': errors,
+        'error_count': error_count,
+        'method_sets': method_sets
+    }
+
+
+def _chunk_ranges(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """按行对齐把文件切分为 [start, end) 字节范围"""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                f.seek(end)
+                f.readline()  # 延伸到下一行行首
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def validate_file(path: str, workers: int = 1, chunk_size: int = CHUNK_SIZE,
+                  max_errors: int = MAX_ERRORS, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    校验 JSONL 会话文件
+
+    Args:
+        workers: 进程数 (默认 1，在当前进程内校验)。大于 1 时为本次调用创建进程池，
+                 只适合命令行等独立进程；web 请求处理中不要创建进程池 (fork 带锁的多线程进程)
+        executor: 已有的进程池 (web 服务启动时以 forkserver / spawn 方式创建的长期进程池)，
+                  提供时忽略 workers，多块文件在其中并行校验
+        chunk_size: 每块字节数
+        max_errors: 返回的错误条数上限
+    Returns:
+        {
+            'sessions': 会话数,
+            'methods': 方法列表 (第一轮 responses 的键顺序),
+            'errors': [{'line', 'round', 'message'}] (按行号排序，至多 max_errors 条),
+            'error_count': 错误总数,
+            'truncated': 错误是否被截断
+        }
+    """
+    ranges = _chunk_ranges(path, chunk_size)
+    args = ([path] * len(ranges), [r[0] for r in ranges], [r[1] for r in ranges], [max_errors] * len(ranges))
+    if len(ranges) <= 1 or (executor is None and workers <= 1):
+        chunks = [_check_chunk(path, start, end, max_errors) for start, end in ranges]
+    elif executor is not None:
+        chunks = list(executor.map(_check_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            chunks = list(pool.map(_check_chunk, *args))
+
+    errors = []
+    error_count = 0
+    sessions = 0
+    expected = None
+    mismatches = []
+    line_offset = 0
+    for chunk in chunks:
+        sessions += chunk['sessions']
+        error_count += chunk['error_count']
+        errors.extend((line_offset + line, r_idx, message) for line, r_idx, message in chunk['errors'])
+
+        # 方法一致性：全文件第一轮的方法集合为基准，其他集合的每次出现都是错误
+        if expected is None and chunk['method_sets']:
+            expected = min(chunk['method_sets'].values(), key=lambda entry: entry['locations'][0])['keys']
+        for keys, entry in chunk['method_sets'].items():
+            if expected is not None and keys != frozenset(expected):
+                error_count += entry['count']
+                mismatches.extend(
+                    (line_offset + line, r_idx,
+                     f"Inconsistent methods. Expected {sorted(expected)}, got {sorted(keys)} / 方法不一致")
+                    for line, r_idx in entry['locations']
+                )
+        line_offset += chunk['lines']
+
+    if sessions == 0 and error_count == 0:
+        errors.append((1, None, "Empty file / 空文件"))
+        error_count = 1
+
+    errors = sorted(errors + mismatches, key=lambda e: (e[0], e[1] or 0))[:max_errors]
+    return {
+        'sessions': sessions,
+        'methods': list(expected or []),
+        'errors': [{'line': line, 'round': r_idx, 'message': message} for line, r_idx, message in errors],
+        'error_count': error_count,
+        'truncated': error_count > len(errors)
+    }
+
+
+def format_error(error: Dict[str, Any]) -> str:
+    if error['round'] is not None:
+        return f"Line {error['line']}, Round {error['round']}: {error['message']}"
+    return f"Line {error['line']}: {error['message']}"
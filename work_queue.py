@@ -0,0 +1,389 @@
+"""
+PersonaSteer Benchmark - Work Queue
+
+多节点评测工作队列：协调者把上传文件拆分为 (session, method) 评测项写入 SQLite，
+多个 worker 通过租约 (lease) 领取评测项、定期续约 (heartbeat) 并回报结果；
+租约过期的评测项会被重新分配，领取次数超过 max_attempts 的评测项 (如每次都让 worker 崩溃的评测项) 记为失败。
+任务的评审配置 (评审模型 / 评分方式 / 历史策略) 在提交时写入 tasks 表，worker 评测与 aggregate 汇总都按它进行。
+全部完成后由 aggregate 汇总出与 BenchmarkEvaluator.evaluate_file 相同结构的 final_results；
+各 worker 的评审调用统计 (judge_stats) 写入 worker_stats 表，汇总时按计数求和
+(延迟分位数无法由各 worker 的分位数合并，不出现在汇总结果中)。
+
+注意：WAL 模式依赖同一主机上的共享内存。worker 分布在多台机器、
+通过共享文件系统访问数据库时，请使用 wal=False (回滚日志 + 文件锁)。
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+from evaluator import BenchmarkEvaluator, MethodResults, TaskContext, load_sessions
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    methods TEXT NOT NULL,
+    total_sessions INTEGER NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    task_id TEXT NOT NULL,
+    session_idx INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (task_id, session_idx)
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    session_idx INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS worker_stats (
+    task_id TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (task_id, worker_id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_status ON items (status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_items_task ON items (task_id, method, session_idx);
+'''
+
+
+class WorkQueue:
+    """基于 SQLite 的持久化评测项队列"""
+
+    def __init__(self, db_path: str, lease_seconds: float = 120, max_attempts: int = 3,
+                 wal: bool = True):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.wal = wal
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(tasks)')}
+            if 'settings' not in columns:
+                conn.execute('ALTER TABLE tasks ADD COLUMN settings TEXT')
+        self._settings: Dict[str, Dict[str, str]] = {}
+
+    @contextmanager
+    def _connect(self):
+        """每次操作独立连接，可安全地在多线程 / 多进程中使用"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout = 30000')
+        if self.wal:
+            conn.execute('PRAGMA journal_mode = WAL')
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Coordinator
+    # ------------------------------------------------------------------
+    def enqueue_file(self, filepath: str, methods: List[str], task_id: str,
+                     settings: Optional[Dict[str, str]] = None) -> int:
+        """
+        把数据文件拆分为 (session, method) 评测项，返回评测项数量
+
+        settings: 任务的评审配置 {'judge_model', 'scoring', 'history'}，见 BenchmarkEvaluator.settings
+        """
+        now = time.time()
+        total_sessions = 0
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for idx, session in enumerate(load_sessions(filepath)):
+                    total_sessions += 1
+                    conn.execute(
+                        'INSERT INTO sessions (task_id, session_idx, session_id, payload) VALUES (?, ?, ?, ?)',
+                        (task_id, idx, session.get('session_id', f'session_{idx}'),
+                         json.dumps(session, ensure_ascii=False))
+                    )
+                    conn.executemany(
+                        'INSERT INTO items (task_id, session_idx, method, updated_at) VALUES (?, ?, ?, ?)',
+                        [(task_id, idx, method, now) for method in methods]
+                    )
+                conn.execute(
+                    'INSERT INTO tasks (task_id, methods, total_sessions, source, created_at, settings) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (task_id, json.dumps(methods), total_sessions, os.path.abspath(filepath), now,
+                     json.dumps(settings) if settings else None)
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return total_sessions * len(methods)
+
+    def task_settings(self, task_id: str) -> Dict[str, str]:
+        """任务提交时的评审配置 (早期任务没有记录，返回空字典)；任务提交后不变，按进程缓存"""
+        settings = self._settings.get(task_id)
+        if settings is None:
+            with self._connect() as conn:
+                row = conn.execute('SELECT settings FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown task: {task_id}")
+            settings = self._settings[task_id] = json.loads(row['settings']) if row['settings'] else {}
+        return settings
+
+    def progress(self, task_id: str) -> Dict[str, int]:
+        """各状态评测项数量"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT status, COUNT(*) AS n FROM items WHERE task_id = ? GROUP BY status', (task_id,)
+            ).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update({row['status']: row['n'] for row in rows})
+        return counts
+
+    def is_finished(self, task_id: str) -> bool:
+        counts = self.progress(task_id)
+        return counts['pending'] == 0 and counts['leased'] == 0
+
+    def aggregate(self, task_id: str, evaluator: BenchmarkEvaluator) -> Dict[str, Any]:
+        """按会话顺序汇总已完成的评测项，生成 final_results (scoring / history 取自任务的评审配置)"""
+        with self._connect() as conn:
+            task = conn.execute('SELECT * FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+            if task is None:
+                raise KeyError(f"Unknown task: {task_id}")
+            methods = json.loads(task['methods'])
+            rows = conn.execute(
+                '''SELECT i.method, i.result, s.session_id FROM items i
+                   JOIN sessions s ON s.task_id = i.task_id AND s.session_idx = i.session_idx
+                   WHERE i.task_id = ? AND i.status = 'done'
+                   ORDER BY i.session_idx''', (task_id,)
+            ).fetchall()
+
+        all_results = {method: MethodResults() for method in methods}
+        for row in rows:
+            result = json.loads(row['result'])
+            if not result['scores']:
+                continue
+            all_results[row['method']].add_session(
+                row['session_id'], result['scores'], result['binary'], result['details']
+            )
+
+        settings = json.loads(task['settings']) if task['settings'] else {}
+        results = evaluator.configured(**settings).build_final_results(all_results, methods, task_id,
+                                                                       task['total_sessions'])
+        if 'judge_model' in settings:
+            results['judge_model'] = settings['judge_model']
+        results['judge_stats'] = merge_judge_stats(self.worker_stats(task_id))
+        return results
+
+    def worker_stats(self, task_id: str) -> List[Dict[str, Any]]:
+        """各 worker 上报的该任务 judge_stats"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT stats FROM worker_stats WHERE task_id = ? ORDER BY worker_id',
+                                (task_id,)).fetchall()
+        return [json.loads(row['stats']) for row in rows]
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def lease(self, worker_id: str, task_id: str = None) -> Optional[Dict[str, Any]]:
+        """
+        领取一个待评测项 (含租约过期的评测项)，没有可领取项时返回 None
+
+        租约过期且已领取 max_attempts 次的评测项不再分配，记为失败
+        """
+        now = time.time()
+        task_filter = 'AND task_id = ?' if task_id else ''
+        params = [now] + ([task_id] if task_id else [])
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    f'''UPDATE items SET status = 'failed', lease_owner = NULL, lease_expires = NULL,
+                           error = 'lease expired after ' || attempts || ' attempts', updated_at = ?
+                        WHERE status = 'leased' AND lease_expires < ? AND attempts >= ? {task_filter}''',
+                    [now, now, self.max_attempts] + ([task_id] if task_id else [])
+                )
+                row = conn.execute(
+                    f'''SELECT item_id, task_id, session_idx, method FROM items
+                        WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                        {task_filter}
+                        ORDER BY item_id LIMIT 1''', params
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute(
+                    '''UPDATE items SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                       attempts = attempts + 1, updated_at = ? WHERE item_id = ?''',
+                    (worker_id, now + self.lease_seconds, now, row['item_id'])
+                )
+                session = conn.execute(
+                    'SELECT payload FROM sessions WHERE task_id = ? AND session_idx = ?',
+                    (row['task_id'], row['session_idx'])
+                ).fetchone()
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return {
+            'item_id': row['item_id'],
+            'task_id': row['task_id'],
+            'method': row['method'],
+            'session': json.loads(session['payload'])
+        }
+
+    def heartbeat(self, item_id: int, worker_id: str) -> bool:
+        """续约；租约已被他人接管时返回 False"""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                '''UPDATE items SET lease_expires = ?, updated_at = ?
+                   WHERE item_id = ? AND lease_owner = ? AND status = 'leased' ''',
+                (now + self.lease_seconds, now, item_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def complete(self, item_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """回报结果；只有当前租约持有者的结果会被接受"""
+        with self._connect() as conn:
+            cur = conn.execute(
+                '''UPDATE items SET status = 'done', result = ?, lease_owner = NULL,
+                   lease_expires = NULL, updated_at = ?
+                   WHERE item_id = ? AND lease_owner = ? AND status = 'leased' ''',
+                (json.dumps(result, ensure_ascii=False), time.time(), item_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def report_stats(self, task_id: str, worker_id: str, stats: Dict[str, Any]):
+        """上报 worker 在该任务上的累计 judge_stats (覆盖此前的上报)"""
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO worker_stats (task_id, worker_id, stats, updated_at) VALUES (?, ?, ?, ?)',
+                (task_id, worker_id, json.dumps(stats), time.time())
+            )
+
+    def fail(self, item_id: int, worker_id: str, error: str):
+        """记录失败；未超过最大重试次数时退回队列"""
+        with self._connect() as conn:
+            conn.execute(
+                '''UPDATE items SET
+                       status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                       error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                   WHERE item_id = ? AND lease_owner = ? AND status = 'leased' ''',
+                (self.max_attempts, error[:500], time.time(), item_id, worker_id)
+            )
+
+
+def merge_judge_stats(worker_stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    合并各 worker 的 judge_stats：计数求和，派生比例按合计重算，端点平均延迟按调用数加权、吞吐量求和
+
+    每个 worker 的去重表只在自身进程内生效，跨 worker 的相同请求各自调用一次。
+    延迟分位数 (latency_p50 / latency_p99 等) 无法由各 worker 的分位数合并，不出现在结果中。
+    """
+    merged = dict.fromkeys(TaskContext('merge').stats, 0)
+    endpoints: Dict[str, List[float]] = {}
+    for stats in worker_stats:
+        for name, value in stats.items():
+            if name == 'endpoints':
+                for endpoint, entry in value.items():
+                    total = endpoints.setdefault(endpoint, [0, 0, 0.0, 0.0])   # calls, errors, latency_sum, throughput
+                    total[0] += entry['calls']
+                    total[1] += entry['errors']
+                    total[2] += (entry['avg_latency'] or 0) * entry['calls']
+                    total[3] += entry['throughput']
+            elif name in merged or name.startswith('prescreen_'):
+                merged[name] = merged.get(name, 0) + value
+    merged['calls_saved'] = merged['requests'] - merged['api_calls']
+    if merged['history_tokens_full']:
+        merged['history_token_savings'] = round(1 - merged['history_tokens'] / merged['history_tokens_full'], 4)
+    if endpoints:
+        merged['endpoints'] = {name: {
+            'calls': calls,
+            'errors': errors,
+            'avg_latency': round(latency_sum / calls, 3) if calls else None,
+            'throughput': round(throughput, 3)
+        } for name, (calls, errors, latency_sum, throughput) in endpoints.items()}
+    merged['workers'] = len(worker_stats)
+    return merged
+
+
+def run_worker(queue: WorkQueue, evaluator: BenchmarkEvaluator, worker_id: str = None,
+               task_id: str = None, concurrency: int = 1, poll_interval: float = 2.0,
+               exit_when_idle: bool = True) -> int:
+    """
+    运行评测 worker，返回本 worker 完成的评测项数量
+
+    每个线程循环：领取评测项 → 后台线程续约 → 评测 → 回报结果。
+    exit_when_idle=True 时队列中没有可领取项即退出，否则持续轮询。
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+    completed = [0]
+    counter_lock = threading.Lock()
+    # 每个任务一个上下文，同一 worker 内相同评审请求只调用一次；评审配置取自任务提交时的记录
+    contexts: Dict[str, TaskContext] = {}
+    evaluators: Dict[str, BenchmarkEvaluator] = {}
+
+    def loop(thread_idx: int):
+        owner = f"{worker_id}/{thread_idx}"
+        while True:
+            item = queue.lease(owner, task_id)
+            if item is None:
+                if exit_when_idle:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            stop = threading.Event()
+
+            def keep_alive():
+                while not stop.wait(queue.lease_seconds / 3):
+                    if not queue.heartbeat(item['item_id'], owner):
+                        return
+
+            heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+            heartbeat_thread.start()
+            try:
+                method = item['method']
+                with counter_lock:
+                    ctx = contexts.setdefault(item['task_id'], TaskContext(item['task_id']))
+                    task_evaluator = evaluators.get(item['task_id'])
+                    if task_evaluator is None:
+                        task_evaluator = evaluators[item['task_id']] = \
+                            evaluator.configured(**queue.task_settings(item['task_id']))
+                result = task_evaluator.evaluate_session(item['session'], [method], ctx)[method]
+                if queue.complete(item['item_id'], owner, result):
+                    with counter_lock:
+                        completed[0] += 1
+                    print(f"[{owner}] ✓ {item['session'].get('session_id')} / {method}")
+                else:
+                    print(f"[{owner}] lease lost for item {item['item_id']}, result discarded")
+            except Exception as e:
+                print(f"[{owner}] ✗ item {item['item_id']}: {e}")
+                queue.fail(item['item_id'], owner, str(e))
+            finally:
+                stop.set()
+                # 每个 worker 进程在各任务上的累计统计，汇总时合并
+                if item['task_id'] in contexts:
+                    queue.report_stats(item['task_id'], worker_id, contexts[item['task_id']].snapshot())
+
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(max(1, concurrency))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return completed[0]
@@ -0,0 +1,24 @@
+"""
+PersonaSteer Benchmark - WSGI Entry Point
+
+生产环境部署入口 (app.py 的 __main__ 只用于本地开发)，配置见 gunicorn.conf.py：
+
+    gunicorn wsgi:application        # 等同于 -w 1 -k gthread --threads 32
+
+- 必须使用多线程 worker：评审调度器按进程存在，同步 worker 下每个进程只运行一个评测，
+  任务之间没有公平调度，评测期间 /status、取消请求也无人响应 (gunicorn.conf.py 拒绝同步 worker)
+- 各 worker 共享 session 密钥：设置 PERSONASTEER_SECRET_KEY，或使用同一个
+  PERSONASTEER_SECRET_KEY_FILE (默认 .secret_key，首次启动时自动生成)
+- 任务状态登记在 results/tasks.db，任何 worker 都能回答 /status、/results；
+  相同的评测请求在所有 worker 中只运行一次
+- 评测请求在请求线程中同步执行；gthread worker 在此期间照常发送心跳，--timeout 不限制评测时长
+"""
+
+import os
+
+# uploads/、results/ 等相对路径以项目目录为准，与启动时的工作目录无关
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app as application  # noqa: E402
+
+app = application